@@ -31,192 +31,2528 @@ from __future__ import unicode_literals, absolute_import
 
 from inspect import ismodule, currentframe
 
+from keyword import iskeyword
+
+from re import compile as re_compile, UNICODE
+
 from random import random
 
-from .version import PY26
-from .runtime import safe_eval
+from time import time
+
+from io import open as io_open
+
+from timeit import default_timer
+
+from bisect import bisect_left
+
+from sys import modules, meta_path
+
+from os import getpid
+
+from os.path import getmtime, exists
+
+from collections import deque
+
+from weakref import ref as weakref, WeakValueDictionary
+
+from threading import Event, Lock, RLock, Thread, local
+
+from six.moves._thread import get_ident
+
+from six import string_types
+from six.moves import builtins
+
+from .version import PY26, OrderedDict
+from .runtime import safe_eval, SAFE_BUILTINS
+
+if PY26:
+    import_module = __import__
+
+else:
+    from importlib import import_module
+
+try:
+    import sqlite3
+
+except ImportError:
+    sqlite3 = None
+
+__all__ = [
+    'LookupCache', 'LRUCache', 'TTLCache', 'SyncCache', 'LookupScope',
+    'getcache', 'setcache',
+    'clearcache', 'incache', 'watchmodules', 'invalidate',
+    'lookup', 'lookup_many', 'alookup', 'alookup_many',
+    'addnamespace', 'removenamespace', 'getnamespaces',
+    'LatencyHistogram', 'LookupStats', 'PHASES', 'enablestats',
+    'disablestats', 'getstats', 'recordpaths', 'getrecorded',
+    'savemanifest', 'loadmanifest', 'preload', 'PathIndex',
+    'getpath',
+    'FrozenAliases', 'AliasRegistry', 'DEFAULT_REGISTRY', 'getregistry',
+    'delregistry', 'alias'
+]
+
+_MISSING = object()  #: default value for missing cache entries.
+
+
+class LookupCache(object):
+    """Lookup cache backend which saves resolved elements by path.
+
+    It counts hits, misses and evictions. If maxsize is not None, oldest
+    entries are evicted first when the cache is full. Otherwise, entries are
+    saved in a plain dict without ordering. Sub classes change the eviction
+    policy in overriding the methods _get and _set, and call _evict on
+    evicted entries."""
+
+    def __init__(self, maxsize=None, onevict=None):
+        """
+        :param int maxsize: maximal number of entries. Unbounded if None.
+        :param onevict: function called with the path of each evicted entry.
+            setcache uses it to forget evicted paths of watched modules.
+        """
+
+        super(LookupCache, self).__init__()
+
+        self.maxsize = maxsize
+        self.onevict = onevict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # unbounded caches do not need the insertion order
+        self._items = {} if maxsize is None else OrderedDict()
+
+    def _get(self, path, touch=True):
+        """Get an entry without updating counters.
+
+        :param str path: entry path.
+        :param bool touch: if True (default), notify the policy that the entry
+            is used.
+        :return: entry value or _MISSING."""
+
+        return self._items.get(path, _MISSING)
+
+    def _set(self, path, value):
+        """Save an entry without checking the cache size."""
+
+        self._items[path] = value
+
+    def _evict(self, path):
+        """Count an entry removed by the eviction policy and notify onevict.
+        """
+
+        self.evictions += 1
+
+        if self.onevict is not None:
+            self.onevict(path)
+
+    def get(self, path, default=None):
+        """Get a cached element and update hit/miss counters.
+
+        :param str path: element path.
+        :param default: value to return if path is not cached.
+        :return: cached element or default."""
+
+        result = self._get(path)
+
+        if result is _MISSING:
+            self.misses += 1
+            result = default
+
+        else:
+            self.hits += 1
+
+        return result
+
+    def __getitem__(self, path):
+
+        result = self._get(path)
+
+        if result is _MISSING:
+            raise KeyError(path)
+
+        return result
+
+    def __setitem__(self, path, value):
+
+        if self.maxsize is None:
+            self._set(path, value)
+
+        else:
+            self._items.pop(path, None)
+            self._set(path, value)
+
+            while len(self._items) > self.maxsize:
+                self._evict(self._items.popitem(last=False)[0])
+
+    def __delitem__(self, path):
+
+        del self._items[path]
+
+    def __contains__(self, path):
+
+        return self._get(path, touch=False) is not _MISSING
+
+    def __len__(self):
+
+        return len(self._items)
+
+    def pop(self, path, default=None):
+        """Remove an entry and return its value or default."""
+
+        result = self._get(path, touch=False)
+
+        if result is _MISSING:
+            result = default
+
+        else:
+            del self._items[path]
+
+        return result
+
+    def resolve(self, path, resolver):
+        """Resolve and save a missing entry.
+
+        :param str path: entry path.
+        :param resolver: function without parameters which returns the entry
+            value.
+        :return: entry value.
+        """
+
+        result = resolver()
+
+        self[path] = result
+
+        return result
+
+    def clear(self):
+        """Remove all entries. Counters are kept."""
+
+        self._items.clear()
+
+    def stats(self):
+        """Get cache statistics.
+
+        :return: hits, misses, evictions, size and maxsize by name.
+        :rtype: dict"""
+
+        return {
+            'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'size': len(self._items),
+            'maxsize': self.maxsize
+        }
+
+
+class LRUCache(LookupCache):
+    """Lookup cache which evicts least recently used entries first."""
+
+    def __init__(self, maxsize=1024, *args, **kwargs):
+
+        super(LRUCache, self).__init__(maxsize=maxsize, *args, **kwargs)
+
+    def _get(self, path, touch=True):
+
+        result = self._items.get(path, _MISSING)
+
+        # move the entry at the end, useless if the cache is unbounded
+        if touch and result is not _MISSING and self.maxsize is not None:
+            del self._items[path]
+            self._items[path] = result
+
+        return result
+
+
+class TTLCache(LRUCache):
+    """LRU lookup cache where entries expire after ttl seconds."""
+
+    def __init__(self, ttl=60, maxsize=None, *args, **kwargs):
+        """
+        :param float ttl: entry time to live in seconds.
+        :param int maxsize: maximal number of entries. Unbounded if None.
+        """
+
+        super(TTLCache, self).__init__(maxsize=maxsize, *args, **kwargs)
+
+        self.ttl = ttl
+
+    def _get(self, path, touch=True):
+
+        result = super(TTLCache, self)._get(path, touch=touch)
+
+        if result is not _MISSING:
+            value, expiration = result
+
+            if expiration < time():  # evict expired entry
+                del self._items[path]
+                self._evict(path)
+                result = _MISSING
+
+            else:
+                result = value
+
+        return result
+
+    def _set(self, path, value):
+
+        self._items[path] = value, time() + self.ttl
+
+
+class SyncCache(LookupCache):
+    """Thread safe lookup cache which protects a cache policy.
+
+    Writes, evictions and reads of policies which change entries on reads
+    (such as the LRU reordering or the TTL expiration) are protected by one
+    lock. Reads of a LookupCache are lock free. Concurrent resolutions of a
+    same missing path call the resolver only once. The lock is renewed in a
+    forked process.
+
+    Counters and onevict are those of the SyncCache instead of those of the
+    protected cache.
+
+    :Example:
+
+    >>> cache = SyncCache(cache=LRUCache(maxsize=128))
+    >>> cache.stats()['maxsize']
+    128
+    """
+
+    def __init__(self, maxsize=None, cache=None, onevict=None):
+        """
+        :param int maxsize: maximal number of entries if cache is None.
+            Unbounded if None.
+        :param LookupCache cache: protected cache policy, such as a LRUCache
+            or a TTLCache. Default is a LookupCache which evicts oldest
+            entries first if maxsize is not None.
+        :param onevict: function called with the path of each evicted entry.
+            Default is the onevict of cache.
+        """
+
+        if cache is None:
+            cache = LookupCache(maxsize=maxsize)
+
+        if onevict is None:
+            onevict = cache.onevict
+
+        super(SyncCache, self).__init__(
+            maxsize=cache.maxsize, onevict=onevict
+        )
+
+        self.cache = cache  #: protected cache policy.
+        self._items = cache._items
+        # expired entries of the policy are counted by this cache
+        cache.onevict = self._evict
+
+        # reads of a LookupCache do not change entries
+        self._lockfree = type(cache) is LookupCache
+
+        self._initlock()
+
+    def _initlock(self):
+        """Create the write lock and forget pending resolutions."""
+
+        self._pid = getpid()
+        self._lock = RLock()
+        self._pending = {}  # pending resolution (event, thread id) by path
+
+    def _getlock(self):
+        """Get the write lock, renewed if this process is a fork of the cache
+        creator."""
+
+        if self._pid != getpid():
+            self._initlock()
+
+        return self._lock
+
+    def _get(self, path, touch=True):
+
+        return self.cache._get(path, touch=touch)
+
+    def _set(self, path, value):
+
+        self.cache._set(path, value)
+
+    def get(self, path, default=None):
+
+        if self._lockfree:
+            result = super(SyncCache, self).get(path, default)
+
+        else:
+            with self._getlock():
+                result = super(SyncCache, self).get(path, default)
+
+        return result
+
+    def __getitem__(self, path):
+
+        if self._lockfree:
+            result = super(SyncCache, self).__getitem__(path)
+
+        else:
+            with self._getlock():
+                result = super(SyncCache, self).__getitem__(path)
+
+        return result
+
+    def __contains__(self, path):
+
+        if self._lockfree:
+            result = super(SyncCache, self).__contains__(path)
+
+        else:
+            with self._getlock():
+                result = super(SyncCache, self).__contains__(path)
+
+        return result
+
+    def __setitem__(self, path, value):
+
+        with self._getlock():
+            super(SyncCache, self).__setitem__(path, value)
+
+    def __delitem__(self, path):
+
+        with self._getlock():
+            super(SyncCache, self).__delitem__(path)
+
+    def pop(self, path, default=None):
+
+        with self._getlock():
+            result = super(SyncCache, self).pop(path, default)
+
+        return result
+
+    def clear(self):
+
+        with self._getlock():
+            super(SyncCache, self).clear()
+
+    def resolve(self, path, resolver):
+
+        ident = get_ident()
+
+        with self._getlock():
+            result = self._get(path)
+
+            if result is _MISSING:
+                pending = self._pending.get(path)
+
+                if pending is None:
+                    # this thread is in charge of resolving the path
+                    event = Event()
+                    self._pending[path] = event, ident
+
+        if result is _MISSING:
+
+            if pending is None:
+                try:
+                    result = resolver()
+                    self[path] = result
+
+                finally:
+                    with self._getlock():
+                        del self._pending[path]
+                    event.set()
+
+            elif pending[1] == ident:
+                # reentrant resolution of a path resolved by this thread
+                result = resolver()
+                self[path] = result
+
+            else:  # wait for the resolution of another thread
+                pending[0].wait()
+
+                with self._getlock():
+                    result = self._get(path)
+
+                if result is _MISSING:  # the other thread failed
+                    result = resolver()
+                    self[path] = result
+
+        return result
+
+
+class LookupScope(dict):
+    """Lookup scope which caches elements resolved from it.
+
+    Elements resolved by lookup functions from a dict scope are never cached,
+    because the cache is keyed by path. A LookupScope owns the cache of its
+    elements, which is cleared when the scope is modified, by clearcache, and
+    which is released with the scope.
+
+    :Example:
+
+    >>> scope = LookupScope(value=1, factor=2)
+    >>> lookup('value * factor', scope=scope)
+    2
+    >>> incache('value * factor', scope)
+    True
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        super(LookupScope, self).__init__(*args, **kwargs)
+
+        self.cache = {}  #: resolved elements by path.
+
+        _LOOKUP_SCOPES[id(self)] = self
+
+    def __setitem__(self, name, value):
+
+        super(LookupScope, self).__setitem__(name, value)
+        self.cache.clear()
+
+    def __delitem__(self, name):
+
+        super(LookupScope, self).__delitem__(name)
+        self.cache.clear()
+
+    def clear(self):
+
+        super(LookupScope, self).clear()
+        self.cache.clear()
+
+    def pop(self, *args):
+
+        result = super(LookupScope, self).pop(*args)
+        self.cache.clear()
+
+        return result
+
+    def popitem(self):
+
+        result = super(LookupScope, self).popitem()
+        self.cache.clear()
+
+        return result
+
+    def setdefault(self, name, default=None):
+
+        result = super(LookupScope, self).setdefault(name, default)
+        self.cache.clear()
+
+        return result
+
+    def update(self, *args, **kwargs):
+
+        super(LookupScope, self).update(*args, **kwargs)
+        self.cache.clear()
+
+    if hasattr(dict, '__ior__'):  # python >= 3.9
+
+        def __ior__(self, other):
+
+            self.update(other)
+
+            return self
+
+
+#: LookupScope instances by id
+_LOOKUP_SCOPES = WeakValueDictionary()
+
+
+def _scopecache(cache, scope):
+    """Get the cache of elements resolved from a scope.
+
+    :return: scope cache, or None if elements are not cached.
+    :rtype: dict"""
+
+    result = None
+
+    if cache and isinstance(scope, LookupScope):
+        result = scope.cache
+
+    return result
+
+
+#: lookup cache
+__LOOKUP_CACHE = LookupCache()
+
+#: compiled path expressions by path
+__EVAL_CACHE = LRUCache()
+
+#: dotted name regex
+_DOTTED_NAME = re_compile(r'^[^\W\d]\w*(\.[^\W\d]\w*)*$', UNICODE)
+
+#: cached paths by module name. Filled only if modules are watched
+__MODULE_PATHS = {}
+
+#: (module name, module weak reference) by cached path. Filled only if modules
+#: are watched
+__PATH_MODULES = {}
+
+#: meta path finder which invalidates entries of (re)imported modules
+__WATCHER = None
+
+
+def getcache():
+    """Get the lookup cache.
+
+    :rtype: LookupCache"""
+
+    return __LOOKUP_CACHE
+
+
+def setcache(cache=None):
+    """Change the lookup cache backend.
+
+    :param LookupCache cache: new lookup cache. If None, use an unbounded
+        LookupCache. If its onevict is None, it is set in order to forget
+        evicted paths of watched modules.
+    :return: old lookup cache.
+    :rtype: LookupCache
+
+    :Example:
+
+    >>> oldcache = setcache(LRUCache(maxsize=128))
+    >>> getcache().stats()['maxsize']
+    128
+    """
+
+    global __LOOKUP_CACHE
+
+    result = __LOOKUP_CACHE
+
+    __LOOKUP_CACHE = LookupCache() if cache is None else cache
+
+    if __LOOKUP_CACHE.onevict is None:
+        __LOOKUP_CACHE.onevict = _untrack
+
+    return result
+
+
+def clearcache(path=None):
+    """Clear cache memory for input path.
+
+    :param str path: element path to remove from cache. If None clear all cache
+
+    :Example:
+
+    >>> incache('b3j0f.utils')
+    False
+    >>> lookup('b3j0f.utils')
+    >>> incache('b3j0f.utils')
+    True
+    >>> clearcache('b3j0f.path')
+    >>> incache('b3j0f.utils')
+    False
+    >>> lookup('b3j0f.utils')
+    >>> incache('b3j0f.utils')
+    True
+    >>> clearcache()
+    >>> incache('b3j0f.utils')
+    False
+    """
+
+    if path is None:
+        __LOOKUP_CACHE.clear()
+        __MODULE_PATHS.clear()
+        __PATH_MODULES.clear()
+
+    else:
+        __LOOKUP_CACHE.pop(path, None)
+        _untrack(path)
+
+    for scope in list(_LOOKUP_SCOPES.values()):
+        if path is None:
+            scope.cache.clear()
+
+        else:
+            scope.cache.pop(path, None)
+
+
+def incache(path, scope=None):
+    """Check if input path is in cache.
+
+    :param str path: element path.
+    :param LookupScope scope: if given, check the cache of this scope.
+
+    :return: True if path is in cache
+    :rtype: bool
+
+    :Example:
+
+    >>> incache('b3j0f.utils')
+    False
+    >>> lookup('b3j0f.utils')
+    >>> incache('b3j0f.utils')
+    True
+    """
+
+    if scope is None:
+        result = path in __LOOKUP_CACHE
+
+    else:
+        scopecache = _scopecache(True, scope)
+        result = scopecache is not None and path in scopecache
+
+    return result
+
+
+def _setcached(path, element):
+    """Save an element in the lookup cache."""
+
+    __LOOKUP_CACHE[path] = element
+    _track(path)
+
+
+#: instrumented lookup phases.
+PHASES = ('eval', 'import', 'getattr')
+
+
+class LatencyHistogram(object):
+    """Histogram of durations in seconds with fixed bucket upper bounds."""
+
+    #: default bucket upper bounds, from 10 microseconds to 10 seconds.
+    BOUNDS = (
+        1e-5, 2.5e-5, 1e-4, 2.5e-4, 1e-3, 2.5e-3, 1e-2, 2.5e-2, 0.1, 0.25,
+        1, 2.5, 10
+    )
+
+    def __init__(self, bounds=None):
+        """
+        :param list bounds: bucket upper bounds. Default is BOUNDS. A last
+            bucket counts durations greater than all bounds.
+        """
+
+        super(LatencyHistogram, self).__init__()
+
+        self.bounds = tuple(sorted(self.BOUNDS if bounds is None else bounds))
+
+        self.clear()
+
+    def clear(self):
+        """Reset the histogram."""
+
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, duration):
+        """Add a duration.
+
+        :param float duration: duration in seconds.
+        """
+
+        self.counts[bisect_left(self.bounds, duration)] += 1
+        self.count += 1
+        self.total += duration
+
+        if duration > self.max:
+            self.max = duration
+
+    def quantile(self, ratio):
+        """Get the upper bound of the bucket which contains a quantile.
+
+        :param float ratio: quantile ratio between 0 and 1 (0.99 for the 99th
+            percentile).
+        :return: bucket upper bound, max duration if the quantile is greater
+            than all bounds, or 0 if the histogram is empty.
+        :rtype: float
+        """
+
+        result = 0.
+
+        if self.count:
+            rank = ratio * self.count
+            cumulated = 0
+
+            for index, count in enumerate(self.counts):
+                cumulated += count
+
+                if cumulated >= rank and count:
+                    if index < len(self.bounds):
+                        result = self.bounds[index]
+
+                    else:
+                        result = self.max
+
+                    break
+
+        return result
+
+    def stats(self):
+        """Get histogram statistics.
+
+        :return: count, total, mean, max, p50, p99 and buckets (list of
+            (upper bound, count), None as the upper bound of the last
+            bucket).
+        :rtype: dict
+        """
+
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': list(zip(self.bounds + (None,), self.counts))
+        }
+
+
+class LookupStats(object):
+    """Lookup instrumentation.
+
+    Records per path counters (hits, misses, errors, resolution time and
+    time by phase) and latency histograms of whole resolutions ('lookup') and
+    of eval, import and getattr phases, and notifies subscribers of each
+    lookup with ``callback(path, status, duration, phases)`` where status is
+    'hit', 'miss' or 'error', and phases are durations by phase.
+
+    A hit is an aliased or cached element, a miss is a resolved path and an
+    error is a path which can not be resolved. Phases of nested lookups (for
+    example from a module imported by a lookup) are recorded in the nested
+    lookup.
+
+    Instances are enabled with the function enablestats.
+    """
+
+    def __init__(self, bounds=None):
+        """
+        :param list bounds: histogram bucket upper bounds.
+        """
+
+        super(LookupStats, self).__init__()
+
+        self.bounds = bounds
+
+        self._lock = Lock()
+        self._local = local()  # stack of phase durations by thread
+        self._subscribers = []
+
+        #: number of subscriber errors.
+        self.callbackerrors = 0
+
+        self.clear()
+
+    def clear(self):
+        """Reset counters and histograms."""
+
+        with self._lock:
+            self.paths = {}  # counters by path
+            self.histograms = dict(
+                (name, LatencyHistogram(self.bounds))
+                for name in ('lookup',) + PHASES
+            )
+
+    def subscribe(self, callback):
+        """Subscribe to lookups.
+
+        :param callback: function which takes in parameters a path, a status
+            ('hit', 'miss' or 'error'), a duration in seconds and durations
+            by phase. Errors raised by callbacks are ignored and counted in
+            the attribute callbackerrors.
+        """
+
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Unsubscribe a callback.
+
+        :return: True if callback was subscribed.
+        :rtype: bool
+        """
+
+        result = callback in self._subscribers
+
+        if result:
+            self._subscribers.remove(callback)
+
+        return result
+
+    def _counters(self, path):
+        """Get counters of a path."""
+
+        result = self.paths.get(path)
+
+        if result is None:
+            result = self.paths[path] = {
+                'hits': 0, 'misses': 0, 'errors': 0, 'time': 0., 'max': 0.
+            }
+            result.update((phase, 0.) for phase in PHASES)
+
+        return result
+
+    def hit(self, path):
+        """Record an aliased or cached path."""
+
+        with self._lock:
+            self._counters(path)['hits'] += 1
+
+        if self._subscribers:
+            self._notify(path, 'hit', 0., {})
+
+    def phase(self, phase, duration):
+        """Record the duration of a lookup phase.
+
+        :param str phase: phase name among PHASES.
+        :param float duration: duration in seconds.
+        """
+
+        with self._lock:
+            self.histograms[phase].add(duration)
+
+        stack = getattr(self._local, 'stack', None)
+
+        if stack:
+            stack[-1][phase] += duration
+
+    def measure(self, path, resolver, *args):
+        """Record the resolution of a path.
+
+        :param str path: resolved path.
+        :param resolver: function to call with args.
+        :return: resolver result.
+        """
+
+        stack = getattr(self._local, 'stack', None)
+
+        if stack is None:
+            stack = self._local.stack = []
+
+        phases = dict((phase, 0.) for phase in PHASES)
+        stack.append(phases)
+
+        start = default_timer()
+
+        try:
+            result = resolver(*args)
+
+        except Exception:
+            stack.pop()
+            self._record(path, 'error', default_timer() - start, phases)
+            raise
+
+        stack.pop()
+        self._record(path, 'miss', default_timer() - start, phases)
+
+        return result
+
+    def _record(self, path, status, duration, phases):
+        """Record a path resolution."""
+
+        with self._lock:
+            counters = self._counters(path)
+            counters['misses' if status == 'miss' else 'errors'] += 1
+            counters['time'] += duration
+
+            if duration > counters['max']:
+                counters['max'] = duration
+
+            for phase in PHASES:
+                counters[phase] += phases[phase]
+
+            self.histograms['lookup'].add(duration)
+
+        if self._subscribers:
+            self._notify(path, status, duration, phases)
+
+    def _notify(self, path, status, duration, phases):
+        """Call subscribers."""
+
+        for callback in list(self._subscribers):
+            try:
+                callback(path, status, duration, phases)
+
+            except Exception:
+                self.callbackerrors += 1
+
+    def top(self, count=10, key='time'):
+        """Get the slowest paths.
+
+        :param int count: maximal number of paths.
+        :param str key: counter to sort on ('time' (default), 'max', 'misses'
+            or a phase name).
+        :return: list of (path, counters) in descending order of key.
+        :rtype: list
+        """
+
+        with self._lock:
+            items = [
+                (path, dict(counters)) for path, counters in self.paths.items()
+            ]
+
+        items.sort(key=lambda item: item[1][key], reverse=True)
+
+        return items[:count]
+
+    def report(self, count=10):
+        """Get a report of recorded lookups.
+
+        :param int count: number of slowest paths to report.
+        :return: hits, misses, errors, hit ratio, histogram statistics by
+            name and slowest paths.
+        :rtype: dict
+        """
+
+        with self._lock:
+            hits = sum(counters['hits'] for counters in self.paths.values())
+            misses = sum(
+                counters['misses'] for counters in self.paths.values()
+            )
+            errors = sum(
+                counters['errors'] for counters in self.paths.values()
+            )
+            histograms = dict(
+                (name, histogram.stats())
+                for name, histogram in self.histograms.items()
+            )
+
+        total = hits + misses + errors
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'errors': errors,
+            'ratio': hits / float(total) if total else 0.,
+            'histograms': histograms,
+            'top': self.top(count)
+        }
+
+
+#: enabled lookup instrumentation.
+__STATS = None
+
+
+def enablestats(stats=None):
+    """Enable lookup instrumentation.
+
+    When disabled (default), lookups only check that instrumentation is
+    disabled.
+
+    :param LookupStats stats: instrumentation to enable. Default is a new
+        LookupStats.
+    :return: enabled instrumentation.
+    :rtype: LookupStats
+
+    :Example:
+
+    >>> stats = enablestats()
+    >>> stats.subscribe(lambda path, status, duration, phases: None)
+    >>> utils = lookup('b3j0f.utils', cache=False)
+    >>> stats.report()['top'][0][0]
+    'b3j0f.utils'
+    """
+
+    global __STATS
+
+    __STATS = LookupStats() if stats is None else stats
+
+    return __STATS
+
+
+def disablestats():
+    """Disable lookup instrumentation.
+
+    :return: disabled instrumentation or None.
+    :rtype: LookupStats
+    """
+
+    global __STATS
+
+    result, __STATS = __STATS, None
+
+    return result
+
+
+def getstats():
+    """Get enabled lookup instrumentation.
+
+    :return: enabled instrumentation or None.
+    :rtype: LookupStats
+    """
+
+    return __STATS
+
+
+def _measured(path, resolver, *args):
+    """Call a path resolver and record it if instrumentation is enabled."""
+
+    stats = __STATS
+
+    if stats is None:
+        result = resolver(*args)
+
+    else:
+        result = stats.measure(path, resolver, *args)
+
+    return result
+
+
+def _timed(phase, func, *args):
+    """Call a function and record its duration as a lookup phase if
+    instrumentation is enabled."""
+
+    stats = __STATS
+
+    if stats is None:
+        result = func(*args)
+
+    else:
+        start = default_timer()
+
+        try:
+            result = func(*args)
+
+        finally:
+            stats.phase(phase, default_timer() - start)
+
+    return result
+
+
+class _ModuleWatcher(object):
+    """Meta path finder which invalidates cache entries of a module when it is
+    reloaded or imported again. It never finds modules itself."""
+
+    def find_spec(self, fullname, path=None, target=None):
+        """Invalidate cache entries of input module name."""
+
+        invalidate(fullname)
+
+    def find_module(self, fullname, path=None):
+        """Invalidate cache entries of input module name."""
+
+        invalidate(fullname)
+
+
+def watchmodules(enable=True):
+    """Enable or disable the invalidation of lookup cache entries by module.
+
+    When enabled, every entry saved by lookup functions is bound to the
+    deepest module of its path. Entries are dropped when their module is
+    reloaded, imported again or removed from sys.modules.
+
+    :param bool enable: if True (default), enable invalidation. Otherwise,
+        disable it and forget bindings between entries and modules.
+
+    :Example:
+
+    >>> watchmodules()
+    >>> lookup('b3j0f.utils.path.lookup')
+    >>> reload(lookup('b3j0f.utils.path'))
+    >>> incache('b3j0f.utils.path.lookup')
+    False
+    """
+
+    global __WATCHER
+
+    if enable:
+        if __WATCHER is None:
+            __WATCHER = _ModuleWatcher()
+            meta_path.insert(0, __WATCHER)
+
+    elif __WATCHER is not None:
+        if __WATCHER in meta_path:
+            meta_path.remove(__WATCHER)
+
+        __WATCHER = None
+        __MODULE_PATHS.clear()
+        __PATH_MODULES.clear()
+
+
+def invalidate(module=None):
+    """Drop lookup cache entries which depend on input module.
+
+    :param module: module or module name. If None, drop entries of all
+        modules which have been removed or replaced in sys.modules.
+    :return: dropped paths.
+    :rtype: set
+    """
+
+    result = set()
+
+    if module is None:
+        names = set(
+            name for name, moduleref in list(__PATH_MODULES.values())
+            if not _isloaded(name, moduleref)
+        )
+
+    else:
+        names = [module if isinstance(module, string_types) else
+                 module.__name__]
+
+    for name in names:
+        for path in __MODULE_PATHS.pop(name, ()):
+            __PATH_MODULES.pop(path, None)
+            __LOOKUP_CACHE.pop(path, None)
+            result.add(path)
+
+    return result
+
+
+def _deepestmodule(path):
+    """Get the deepest loaded module of a path.
+
+    :param str path: path to parse.
+    :return: module name, module and path components after the module name.
+        (None, None, None) if no module is found.
+    :rtype: tuple
+    """
+
+    result = None, None, None
+
+    components = path.split('.')
+
+    for index in range(len(components), 0, -1):
+        name = '.'.join(components[:index])
+        module = modules.get(name)
+
+        if module is not None:
+            result = name, module, components[index:]
+            break
+
+    return result
+
+
+def _moduleref(module):
+    """Get a weak reference to a module.
+
+    On python 2, where modules are not weakly referenceable, get a function
+    which returns the module."""
+
+    try:
+        result = weakref(module)
+
+    except TypeError:  # python 2
+        result = lambda: module
+
+    return result
+
+
+def _isloaded(name, moduleref):
+    """True if a referenced module is still loaded with its name."""
+
+    module = moduleref()
+
+    return module is not None and modules.get(name) is module
+
+
+def _track(path):
+    """Bind a cached path to the deepest module of its path if modules are
+    watched."""
+
+    if __WATCHER is not None:
+
+        name, module, _ = _deepestmodule(path)
+
+        if module is not None:
+            _untrack(path)
+            __MODULE_PATHS.setdefault(name, set()).add(path)
+            __PATH_MODULES[path] = name, _moduleref(module)
+
+
+def _untrack(path):
+    """Unbind a path from its module."""
+
+    name, _ = __PATH_MODULES.pop(path, (None, None))
+
+    if name is not None:
+        paths = __MODULE_PATHS.get(name)
+
+        if paths is not None:
+            paths.discard(path)
+
+            if not paths:
+                del __MODULE_PATHS[name]
+
+
+def _isvalid(path):
+    """True if the module of a cached path is still loaded. Otherwise,
+    invalidate the module entries."""
+
+    result = True
+
+    name, moduleref = __PATH_MODULES.get(path, (None, None))
+
+    if name is not None and not _isloaded(name, moduleref):
+        invalidate(name)
+        result = False
+
+    return result
+
+
+def _isdottedname(path):
+    """True if input path is a dotted name without keywords.
+
+    :param str path: path to check.
+    :rtype: bool
+    """
+
+    result = _DOTTED_NAME.match(path) is not None
+
+    if result:
+        for component in path.split('.'):
+            if iskeyword(component):
+                result = False
+                break
+
+    return result
+
+
+def _compilepath(path):
+    """Get compiled code of a path expression.
+
+    :param str path: path expression to compile.
+    :return: path code or None if path is not a python expression.
+    """
+
+    result = __EVAL_CACHE.get(path, _MISSING)
+
+    if result is _MISSING:
+        try:
+            result = compile(path, '<lookup>', 'eval')
+
+        except SyntaxError:
+            result = None
+
+        __EVAL_CACHE[path] = result
+
+    return result
+
+
+def lookup(
+        path, cache=True, scope=None, safe=False, fast=False, lazy=False,
+        aliases=None, frame=False
+):
+    """Get element reference from input element.
+
+    The element is resolved in this order from alias registries, the lookup
+    cache, the scope, builtins, registered namespaces (see addnamespace),
+    imports and optionally the caller frame.
+
+    :limitations: it does not resolve class methods or static values such as
+        True, False, numbers, string and keywords.
+    :param str path: full path to a python element.
+    :param bool cache: if True (default), permits to reduce time complexity for
+        lookup resolution in using cache memory to save resolved elements.
+        Elements resolved from a scope are cached only in a LookupScope.
+    :param dict scope: object scrope from where find path. For example, this
+        scope can be locals(). Default is globals().
+    :param bool safe: use lookup in a safe context. A safe context avoid to
+        reach builtins function with I/O consequences.
+    :param bool fast: if True (default False), dotted names such as
+        ``package.module.name`` are not evaluated but directly resolved from
+        scope, namespaces, builtins and imports.
+    :param bool lazy: if True (default False), return a LazyProxy which
+        resolves the path at its first use, without using the caller frame.
+        If cache, the resolved element replaces the proxy in the cache.
+    :param list aliases: alias registries or registry names where find path
+        before the cache, in this order. Default is the default registry.
+    :param bool frame: if True (default False), find the root name of path in
+        the caller frame locals and globals when it is not found elsewhere.
+        Frame introspection is slow and unavailable on some interpreters.
+    :return: python object which is accessible through input path
+        or raise an exception if the path is wrong.
+    :rtype: object
+    :raises ImportError: if path is wrong
+    """
+
+    result = _getcached(path, cache, aliases, scope) if path else _MISSING
+
+    if result is _MISSING:
+
+        if not path:
+            raise ImportError('Wrong path {0}'.format(path))
+
+        if lazy:
+            result = _lazylookup(path, cache, scope, safe, fast)
+
+        else:
+            # frame from where resolve names which are not found elsewhere
+            _frame = currentframe().f_back if frame else None
+
+            result = _resolvepath(path, cache, scope, safe, fast, _frame)
+
+    return result
+
+
+def _getcached(path, cache, aliases, scope=None):
+    """Get an aliased or cached element.
+
+    :return: element or _MISSING.
+    """
+
+    # avoid the alias resolution while the default registry is empty
+    if aliases is None and not __ALIAS_REGISTRIES[DEFAULT_REGISTRY]._aliases:
+        result = _MISSING
+
+    else:
+        result = _getalias(path, aliases)
+
+    if result is _MISSING and cache and scope is not None:
+        scopecache = _scopecache(cache, scope)
+
+        if scopecache is not None:
+            result = scopecache.get(path, _MISSING)
+
+    elif result is _MISSING and cache:
+        result = __LOOKUP_CACHE.get(path, _MISSING)
+
+        if result is not _MISSING:
+
+            if __WATCHER is not None and not _isvalid(path):
+                result = _MISSING
+
+            if __RECORDED is not None:
+                __RECORDED[path] = None
+
+    if result is not _MISSING and __STATS is not None:
+        __STATS.hit(path)
+
+    return result
+
+
+def _resolvepath(path, cache, scope, safe, fast, frame):
+    """Resolve a path which is not aliased or cached.
+
+    :return: resolved element.
+    :raises ImportError: if path is wrong.
+    """
+
+    if cache and scope is None:  # save in cache if found
+        result = __LOOKUP_CACHE.resolve(
+            path, lambda: _measured(
+                path, _lookup, path, scope, safe, fast, frame
+            )
+        )
+
+        _track(path)
+
+    else:
+        result = _measured(path, _lookup, path, scope, safe, fast, frame)
+
+        scopecache = _scopecache(cache, scope)
+
+        if scopecache is not None:
+            scopecache[path] = result
+
+    _registerpath(result, path)
+
+    if __RECORDED is not None and scope is None:
+        __RECORDED[path] = None
+
+    return result
+
+
+def _lazylookup(path, cache, scope, safe, fast):
+    """Get a LazyProxy which resolves a path at its first use.
+
+    If cache, the proxy is saved in the lookup cache, and replaced by the
+    resolved element.
+    """
+
+    from .proxy import LazyProxy  # avoid a cyclic import
+
+    cache = cache and scope is None
+
+    def resolve():
+        """Resolve the path and replace the proxy in the cache."""
+
+        result = _measured(path, _lookup, path, scope, safe, fast, None)
+
+        if cache and __LOOKUP_CACHE.get(path) is proxy:
+            _setcached(path, result)
+
+        _registerpath(result, path)
+
+        if __RECORDED is not None and scope is None:
+            __RECORDED[path] = None
+
+        return result
+
+    proxy = LazyProxy(resolve)
+
+    result = proxy
+
+    if cache:
+        result = __LOOKUP_CACHE.resolve(path, lambda: proxy)
+
+    return result
+
+
+def _lookup(path, scope, safe, fast, frame):
+    """Resolve a path without using the lookup cache.
+
+    :param str path: full path to a python element.
+    :param dict scope: object scope from where find path.
+    :param bool safe: use lookup in a safe context.
+    :param bool fast: if True, do not evaluate dotted names.
+    :param frame: frame from where find the root name if not found elsewhere.
+        Not used if None.
+    :return: resolved element.
+    :raises ImportError: if path is wrong.
+    """
+
+    result = None
+
+    found = False
+
+    if fast and _isdottedname(path):
+        # skip the evaluation step and resolve directly path nodes
+        components = path.split('.')
+        nodes = {}
+
+        result = _resolvenodes(components, nodes, scope, safe)
+
+        if frame is not None and nodes.get(components[0]) is _MISSING:
+            # resolve the root node from the previous frame
+            for names in (frame.f_locals, frame.f_globals):
+                if components[0] in names:
+                    nodes[components[0]] = names[components[0]]
+                    result = _resolvenodes(components, nodes, scope, safe)
+                    break
+
+        found = result is not _MISSING
+
+    else:
+        _eval = safe_eval if safe else eval
+
+        try:  # search among scope
+            code = _compilepath(path)
+
+            if code is None:
+                raise SyntaxError('Wrong expression {0}'.format(path))
+
+            result = _timed('eval', _eval, code, scope)
+
+        except (NameError, SyntaxError):
+
+            # we generate a result in order to accept a result such as None
+            generated_result = random()
+            result = generated_result
+
+            components = path.split('.')
+            index = 0
+            components_len = len(components)
+
+            module_name = components[0]
+
+            # try to resolve a registered namespace name
+            result = _namespaced(module_name, generated_result)
+
+            if result is generated_result:
+                # try to resolve an absolute path
+                try:
+                    result = _timed('import', import_module, module_name)
+
+                except ImportError:
+                    # resolve element globals or locals of the caller frame
+                    if frame is not None:
+
+                        if module_name in frame.f_locals:
+                            result = frame.f_locals[module_name]
+
+                        elif module_name in frame.f_globals:
+                            result = frame.f_globals[module_name]
+
+            found = result is not generated_result
+
+            if found:
+
+                if components_len > 1:
+
+                    index = 1
+
+                    # try to import all sub-modules/packages
+                    try:  # check if name is defined in an external module
+                        # find the right module
+                        while index < components_len:
+                            module_name = '{0}.{1}'.format(
+                                module_name, components[index]
+                            )
+                            result = _timed(
+                                'import', import_module, module_name
+                            )
+                            index += 1
+
+                    except ImportError:
+                        # path sub-module content
+                        try:
+                            if PY26:  # when __import__ is used
+                                index = 1  # restart count of pathing
+                            while index < components_len:
+                                result = _timed(
+                                    'getattr', getattr, result,
+                                    components[index]
+                                )
+                                index += 1
+
+                        except AttributeError:
+                            raise ImportError(
+                                'Wrong path {0} at {1}'.format(
+                                    path, components[:index]
+                                )
+                            )
+                    else:  # in case of PY26
+                        if PY26:
+                            index = 1
+                            while index < components_len:
+                                result = _timed(
+                                    'getattr', getattr, result,
+                                    components[index]
+                                )
+                                index += 1
+
+        else:
+            found = True
+
+    if not found:
+        raise ImportError('Wrong path {0}'.format(path))
+
+    return result
+
+
+#: registered namespaces where find root names of paths.
+__NAMESPACES = []
+
+
+def addnamespace(namespace):
+    """Register a namespace where find root names of lookup paths.
+
+    Namespaces are searched after the lookup scope and builtins, and before
+    imports, in the registration order. They are not copied, therefore names
+    added later to a namespace are resolved as well. Paths already saved in
+    the lookup cache are not resolved again.
+
+    :param namespace: dict or object (such as a module) whose attributes are
+        names to resolve.
+
+    :Example:
+
+    >>> addnamespace({'handlers': myapp.handlers})
+    >>> lookup('handlers.default') is myapp.handlers.default
+    True
+    """
+
+    if not isinstance(namespace, dict):
+        namespace = vars(namespace)
+
+    removenamespace(namespace)
+
+    __NAMESPACES.append(namespace)
+
+
+def removenamespace(namespace):
+    """Unregister a namespace.
+
+    :param namespace: namespace to unregister.
+    :return: True if namespace was registered.
+    :rtype: bool
+    """
+
+    if not isinstance(namespace, dict):
+        namespace = vars(namespace)
+
+    result = False
+
+    for index, registered in enumerate(__NAMESPACES):
+        if registered is namespace:
+            del __NAMESPACES[index]
+            result = True
+            break
+
+    return result
+
+
+def getnamespaces():
+    """Get registered namespaces in search order.
+
+    :rtype: tuple
+    """
+
+    return tuple(__NAMESPACES)
+
+
+def _namespaced(name, default=_MISSING):
+    """Find a name among registered namespaces."""
+
+    result = default
+
+    for namespace in __NAMESPACES:
+        if name in namespace:
+            result = namespace[name]
+            break
+
+    return result
+
+
+def _resolvenode(prefix, name, parent, scope=None, safe=False):
+    """Resolve one path node from its parent node.
+
+    :param str prefix: node path.
+    :param str name: node name.
+    :param parent: parent node element. _MISSING if the node is a root.
+    :param dict scope: scope from where find a root node.
+    :param bool safe: if True, do not find a root node among I/O builtins.
+    :return: node element or _MISSING if the node does not exist.
+    """
+
+    result = _MISSING
+
+    if parent is _MISSING:  # find root node among scope, builtins and
+        # namespaces
+        if scope is not None:
+            result = scope.get(name, _MISSING)
+
+        if result is _MISSING:
+            if safe:
+                result = SAFE_BUILTINS['__builtins__'].get(name, _MISSING)
+
+            else:
+                result = getattr(builtins, name, _MISSING)
+
+        if result is _MISSING:
+            result = _namespaced(name)
+
+    if result is _MISSING:
+        result = modules.get(prefix, _MISSING)
+
+    if result is _MISSING and parent is not _MISSING:
+        result = _timed('getattr', getattr, parent, name, _MISSING)
+
+    if result is _MISSING and (parent is _MISSING or ismodule(parent)):
+        try:
+            _timed('import', import_module, prefix)
+
+        except (ImportError, ValueError):
+            pass
+
+        else:
+            result = modules[prefix]
+
+    return result
+
+
+def _resolvenodes(components, nodes, scope=None, safe=False):
+    """Resolve path components from the deepest already resolved node.
+
+    :param list components: path components.
+    :param dict nodes: resolved elements by path prefix. Updated with new
+        resolved nodes.
+    :param dict scope: scope from where find the root node.
+    :param bool safe: if True, do not find the root node among I/O builtins.
+    :return: resolved element or _MISSING.
+    """
+
+    result = _MISSING
+
+    prefix = None
+
+    for component in components:
+
+        if prefix is None:
+            prefix = component
+
+        else:
+            prefix = '{0}.{1}'.format(prefix, component)
+
+        if prefix in nodes:
+            result = nodes[prefix]
+
+        else:
+            result = nodes[prefix] = _resolvenode(
+                prefix, component, result, scope, safe
+            )
+
+        if result is _MISSING:
+            break
+
+    return result
+
+
+def lookup_many(paths, cache=True, scope=None, safe=False, aliases=None):
+    """Get element references from several paths at once.
+
+    Paths are resolved in a prefix tree in order to import a shared module or
+    to get a shared attribute only once. Paths which are not dotted names are
+    evaluated such as in the function lookup, but they are never resolved from
+    the current execution stack.
+
+    :param list paths: full paths to python elements.
+    :param bool cache: if True (default), use the lookup cache.
+    :param dict scope: object scope from where find paths.
+    :param bool safe: use lookup in a safe context.
+    :param list aliases: alias registries or registry names where find paths
+        before the cache, in this order. Default is the default registry.
+    :return: resolved elements by path and errors by path.
+    :rtype: tuple
+
+    :Example:
+
+    >>> result, errors = lookup_many(['b3j0f.utils', 'b3j0f.utils.wrong'])
+    >>> result['b3j0f.utils'].__name__
+    'b3j0f.utils'
+    >>> list(errors)
+    ['b3j0f.utils.wrong']
+    """
+
+    result = {}
+    errors = {}
+
+    nodes = {}  # resolved elements by path prefix
+
+    _eval = safe_eval if safe else eval
+
+    for path in paths:
+
+        if path in result or path in errors:
+            continue
+
+        element = _getcached(path, cache, aliases, scope)
+
+        if element is not _MISSING:
+            result[path] = element
+            continue
+
+        try:
+            element = _measured(
+                path, _resolvemany, path, nodes, scope, safe, _eval
+            )
+
+        except Exception as ex:
+            errors[path] = ex
+
+        else:
+            result[path] = element
+            _registerpath(element, path)
+
+            if cache and scope is None:  # save in cache if found
+                _setcached(path, element)
+
+            elif _scopecache(cache, scope) is not None:
+                scope.cache[path] = element
+
+            if __RECORDED is not None and scope is None:
+                __RECORDED[path] = None
+
+    return result, errors
+
+
+def _resolvemany(path, nodes, scope, safe, _eval):
+    """Resolve a path of lookup_many.
+
+    :return: resolved element.
+    :raises ImportError: if path is wrong.
+    """
+
+    result = _resolvenodes(path.split('.'), nodes, scope, safe)
+
+    if result is _MISSING:
+        code = _compilepath(path)
+
+        try:
+            if code is None:
+                raise SyntaxError('Wrong expression {0}'.format(path))
+
+            result = _timed(
+                'eval', _eval, code, {} if scope is None else scope
+            )
+
+        except (NameError, SyntaxError):
+            raise ImportError('Wrong path {0}'.format(path))
+
+    return result
+
+
+#: pending asynchronous resolutions by (event loop, path and parameters)
+__PENDING_LOOKUPS = {}
+
+
+def _getloop():
+    """Get the current asyncio event loop."""
+
+    import asyncio
+
+    try:
+        result = asyncio.get_running_loop()
+
+    except (AttributeError, RuntimeError):  # python < 3.7 or no running loop
+        result = asyncio.get_event_loop()
+
+    return result
+
+
+def _newfuture(loop, result=_MISSING):
+    """Create a future of a loop, done with result if not _MISSING."""
+
+    try:
+        future = loop.create_future()
+
+    except AttributeError:  # python < 3.5.2
+        from asyncio import Future
+
+        future = Future(loop=loop)
+
+    if result is not _MISSING:
+        future.set_result(result)
+
+    return future
+
+
+def _pendinglookup(key, future):
+    """Register a pending resolution until its future is done."""
+
+    if key is not None:
+        __PENDING_LOOKUPS[key] = future
+        future.add_done_callback(lambda _: __PENDING_LOOKUPS.pop(key, None))
+
+
+def alookup(
+        path, cache=True, scope=None, safe=False, fast=False, aliases=None,
+        executor=None
+):
+    """Get element reference from input path without blocking the current
+    asyncio event loop.
+
+    Aliased and cached elements are returned immediately. Other paths are
+    resolved in an executor, and concurrent resolutions of a same path without
+    scope share the same executor call. Paths are never resolved from the
+    current execution stack.
+
+    :param str path: full path to a python element.
+    :param bool cache: if True (default), use the lookup cache.
+    :param dict scope: object scope from where find path.
+    :param bool safe: use lookup in a safe context.
+    :param bool fast: if True (default False), do not evaluate dotted names.
+    :param list aliases: alias registries or registry names.
+    :param executor: concurrent.futures executor. Default is the event loop
+        default executor.
+    :return: awaitable future of the resolved element.
+
+    :Example:
+
+    >>> async def handle(request):
+    ...     handler = await alookup('myapp.handlers.default')
+    ...     return handler(request)
+    """
+
+    from asyncio import shield
+
+    loop = _getloop()
+
+    element = _getcached(path, cache, aliases, scope) if path else _MISSING
+
+    if element is not _MISSING:
+        result = _newfuture(loop, element)
+
+    elif not path:
+        result = _newfuture(loop)
+        result.set_exception(ImportError('Wrong path {0}'.format(path)))
+
+    else:
+        key = None if scope is not None else (loop, path, cache, safe, fast)
+
+        result = __PENDING_LOOKUPS.get(key) if key is not None else None
+
+        if result is None:
+            result = loop.run_in_executor(
+                executor, _resolvepath, path, cache, scope, safe, fast, None
+            )
+            _pendinglookup(key, result)
+
+        # avoid to cancel the resolution of other awaiting coroutines
+        result = shield(result)
+
+    return result
+
+
+def alookup_many(
+        paths, cache=True, scope=None, safe=False, aliases=None,
+        executor=None
+):
+    """Get element references from several paths without blocking the current
+    asyncio event loop.
+
+    Aliased and cached elements are resolved immediately, and other paths are
+    resolved together with lookup_many in an executor. A path which is being
+    resolved by alookup or alookup_many is not resolved again.
+
+    :param list paths: full paths to python elements.
+    :param bool cache: if True (default), use the lookup cache.
+    :param dict scope: object scope from where find paths.
+    :param bool safe: use lookup in a safe context.
+    :param list aliases: alias registries or registry names.
+    :param executor: concurrent.futures executor. Default is the event loop
+        default executor.
+    :return: awaitable future of resolved elements by path and errors by
+        path.
+    """
+
+    from asyncio import gather
+
+    loop = _getloop()
+
+    result, errors = {}, {}
+
+    futures = {}  # pending futures by path
+    missing = []  # paths to resolve
+
+    for path in paths:
+
+        if path in futures:
+            continue
+
+        element = _getcached(path, cache, aliases, scope) if path else _MISSING
+
+        if element is not _MISSING:
+            result[path] = element
+            continue
+
+        key = None if scope is not None else (loop, path, cache, safe, False)
+        future = __PENDING_LOOKUPS.get(key) if key is not None else None
+
+        if future is None:
+            future = _newfuture(loop)
+            _pendinglookup(key, future)
+            missing.append(path)
+
+        futures[path] = future
+
+    if missing:
+
+        def _dispatch(batch):
+            """Set results of path futures from the batch future."""
+
+            try:
+                resolved, failed = batch.result()
+
+            except Exception as ex:
+                resolved, failed = {}, dict((path, ex) for path in missing)
+
+            for path in missing:
+                if path in resolved:
+                    futures[path].set_result(resolved[path])
+
+                else:
+                    futures[path].set_exception(failed[path])
+
+        loop.run_in_executor(
+            executor, lookup_many, missing, cache, scope, safe, aliases
+        ).add_done_callback(_dispatch)
+
+    future = _newfuture(loop)
+
+    def _done(_):
+        """Set the result of the returned future."""
+
+        for path in futures:
+            try:
+                result[path] = futures[path].result()
+
+            except Exception as ex:
+                errors[path] = ex
+
+        if not future.cancelled():
+            future.set_result((result, errors))
+
+    if futures:
+        gather(*futures.values(), return_exceptions=True).add_done_callback(
+            _done
+        )
+
+    else:
+        _done(None)
+
+    return future
+
+
+#: paths resolved without scope while recording (ordered set).
+__RECORDED = None
+
+
+def recordpaths(enable=True):
+    """Enable or disable the recording of paths resolved without scope by
+    lookup functions, in order to save a manifest of paths to preload.
+
+    Cached paths resolved again are recorded as well.
+
+    :param bool enable: if True (default), start to record paths if not
+        already started. Otherwise, stop to record paths.
+    :return: paths recorded until now in resolution order.
+    :rtype: list
+
+    :Example:
+
+    >>> recordpaths()
+    >>> run_application()
+    >>> savemanifest('paths.txt', recordpaths(False))
+    """
+
+    global __RECORDED
+
+    result = getrecorded()
+
+    if enable:
+        if __RECORDED is None:
+            __RECORDED = OrderedDict()
+
+    else:
+        __RECORDED = None
+
+    return result
+
+
+def getrecorded():
+    """Get recorded paths.
+
+    :return: paths in resolution order.
+    :rtype: list
+    """
+
+    return [] if __RECORDED is None else list(__RECORDED)
+
+
+def savemanifest(filename, paths=None):
+    """Save a manifest of paths to preload, one path per line.
+
+    :param str filename: manifest file name.
+    :param list paths: paths to save. Default is recorded paths.
+    """
+
+    if paths is None:
+        paths = getrecorded()
+
+    with io_open(filename, 'w', encoding='utf-8') as manifest:
+        for path in paths:
+            manifest.write('{0}\n'.format(path))
+
+
+def loadmanifest(filename):
+    """Load paths of a manifest.
+
+    Empty lines and lines starting with '#' are ignored.
+
+    :param str filename: manifest file name.
+    :return: paths.
+    :rtype: list
+    """
+
+    result = []
+
+    with io_open(filename, encoding='utf-8') as manifest:
+        for line in manifest:
+            line = line.strip()
+
+            if line and not line.startswith('#'):
+                result.append(line)
+
+    return result
+
+
+def preload(paths, threads=4, cache=True):
+    """Resolve paths before their first use, for example with paths of a
+    manifest at startup.
+
+    Paths are grouped by root name, and groups are resolved with lookup_many
+    in parallel threads, such as independent packages are imported
+    concurrently. Use a SyncCache if the lookup cache is bounded.
+
+    :param list paths: paths to resolve, or a manifest file name.
+    :param int threads: maximal number of threads (default 4). If lower than
+        2, paths are resolved in the current thread.
+    :param bool cache: if True (default), save resolved elements in the
+        lookup cache.
+    :return: errors by path which can not be resolved.
+    :rtype: dict
+
+    :Example:
+
+    >>> errors = preload('paths.txt')
+    >>> for path, error in errors.items():
+    ...     print(path, error)
+    """
+
+    if isinstance(paths, string_types):
+        paths = loadmanifest(paths)
+
+    groups = OrderedDict()
+
+    for path in paths:
+        groups.setdefault(path.split('.', 1)[0], []).append(path)
+
+    pending = deque(groups.values())
+
+    result = {}
+
+    def work():
+        """Resolve groups until there is no pending group."""
+
+        while True:
+            try:
+                group = pending.popleft()
+
+            except IndexError:
+                break
+
+            _, errors = lookup_many(group, cache=cache)
+            result.update(errors)
+
+    threads = min(threads, len(pending))
+
+    if threads < 2:
+        work()
+
+    else:
+        workers = [Thread(target=work) for _ in range(threads)]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+    return result
+
+
+def _sourcefile(module):
+    """Get the source file of a module.
+
+    :return: module source file or None if module is builtin.
+    :rtype: str
+    """
+
+    result = getattr(module, '__file__', None)
+
+    if result is not None and result[-4:] in ('.pyc', '.pyo'):
+        if exists(result[:-1]):
+            result = result[:-1]
+
+    return result
+
+
+class PathIndex(object):
+    """Persistent index of resolvable paths saved in a SQLite database.
+
+    The index maps a path to its module name, attribute chain, module source
+    file and source modification time. Indexed paths are resolved in importing
+    directly their module, without trying to import path prefixes. An indexed
+    path is stale if its module source file has been modified since indexing.
+
+    :Example:
+
+    >>> index = PathIndex('paths.db')
+    >>> result, errors = index.lookup_many(['b3j0f.utils.path.lookup'])
+    >>> index.validate(['b3j0f.utils.path.lookup'])
+    (['b3j0f.utils.path.lookup'], [])
+    """
 
-if PY26:
-    import_module = __import__
+    def __init__(self, filename=':memory:'):
+        """
+        :param str filename: database file name.
+        :raises ImportError: if sqlite3 is not available.
+        """
 
-else:
-    from importlib import import_module
+        super(PathIndex, self).__init__()
 
-__all__ = ['clearcache', 'incache', 'lookup', 'getpath', 'alias']
+        if sqlite3 is None:
+            raise ImportError('sqlite3 is required by PathIndex')
 
-#: lookup cache
-__LOOKUP_CACHE = {}
+        self.filename = filename
 
+        self._lock = Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS paths ('
+            'path TEXT PRIMARY KEY, module TEXT NOT NULL, attrs TEXT NOT NULL,'
+            ' source TEXT, mtime REAL)'
+        )
+        self._conn.commit()
 
-def clearcache(path=None):
-    """Clear cache memory for input path.
+    def close(self):
+        """Close the database connection."""
 
-    :param str path: element path to remove from cache. If None clear all cache
-    :param dict cache: cache to clear. Default is __LOOKUP_CACHE.
+        self._conn.close()
 
-    :Example:
+    def __len__(self):
 
-    >>> incache('b3j0f.utils')
-    False
-    >>> lookup('b3j0f.utils')
-    >>> incache('b3j0f.utils')
-    True
-    >>> clearcache('b3j0f.path')
-    >>> incache('b3j0f.utils')
-    False
-    >>> lookup('b3j0f.utils')
-    >>> incache('b3j0f.utils')
-    True
-    >>> clearcache()
-    >>> incache('b3j0f.utils')
-    False
-    """
+        with self._lock:
+            cursor = self._conn.execute('SELECT COUNT(*) FROM paths')
 
-    if path is None:
-        __LOOKUP_CACHE.clear()
+            return cursor.fetchone()[0]
 
-    else:
-        __LOOKUP_CACHE.pop(path, None)
+    def __contains__(self, path):
 
+        return path in self.get([path])
 
-def incache(path):
-    """Check if input path is in cache.
+    def get(self, paths=None):
+        """Get index entries.
 
-    :return: True if path is in cache
-    :rtype: bool
+        :param list paths: paths to get. If None, get all entries.
+        :return: (module name, attribute names, source file, source mtime) by
+            path.
+        :rtype: dict
+        """
 
-    :Example:
+        result = {}
 
-    >>> incache('b3j0f.utils')
-    False
-    >>> lookup('b3j0f.utils')
-    >>> incache('b3j0f.utils')
-    True
-    """
+        with self._lock:
 
-    return path in __LOOKUP_CACHE
+            if paths is None:
+                rows = self._conn.execute('SELECT * FROM paths').fetchall()
 
+            else:
+                rows = []
+                paths = list(paths)
 
-def lookup(path, cache=True, scope=None, safe=False):
-    """Get element reference from input element.
+                # split requests for the sqlite variable number limit
+                for index in range(0, len(paths), 500):
+                    chunk = paths[index:index + 500]
+                    rows += self._conn.execute(
+                        'SELECT * FROM paths WHERE path IN ({0})'.format(
+                            ', '.join('?' * len(chunk))
+                        ), chunk
+                    ).fetchall()
 
-    The element can be a builtin/globals/scope object or is resolved from the
-    current execution stack.
+        for path, module, attrs, source, mtime in rows:
+            result[path] = (
+                module, attrs.split('.') if attrs else [], source, mtime
+            )
 
-    :limitations: it does not resolve class methods or static values such as
-        True, False, numbers, string and keywords.
-    :param str path: full path to a python element.
-    :param bool cache: if True (default), permits to reduce time complexity for
-        lookup resolution in using cache memory to save resolved elements.
-    :param dict scope: object scrope from where find path. For example, this
-        scope can be locals(). Default is globals().
-    :param bool safe: use lookup in a safe context. A safe context avoid to
-        reach builtins function with I/O consequences.
-    :return: python object which is accessible through input path
-        or raise an exception if the path is wrong.
-    :rtype: object
-    :raises ImportError: if path is wrong
-    """
+        return result
 
-    result = None
+    def add(self, paths):
+        """Index paths.
 
-    found = path and cache and path in __LOOKUP_CACHE
+        Paths are resolved with the function lookup_many.
 
-    if found:
-        result = __LOOKUP_CACHE[path]
+        :param list paths: paths to index.
+        :return: errors by path which are not indexed.
+        :rtype: dict
+        """
 
-    elif path:
+        _, errors = lookup_many(paths, cache=False)
 
-        _eval = safe_eval if safe else eval
+        resolved = [path for path in paths if path not in errors]
 
-        try:  # search among scope
-            result = _eval(path, scope)
+        for path in self._index(resolved):
+            errors[path] = ImportError(
+                'No module found in path {0}'.format(path)
+            )
 
-        except (NameError, SyntaxError):
+        return errors
 
-            # we generate a result in order to accept the result such as a None
-            generated_result = random()
-            result = generated_result
+    def _index(self, paths):
+        """Index paths of loaded modules.
 
-            components = path.split('.')
-            index = 0
-            components_len = len(components)
+        :param list paths: paths to index.
+        :return: paths which are not indexed because they are not in a module.
+        :rtype: list
+        """
 
-            module_name = components[0]
+        result = []
 
-            # try to resolve an absolute path
-            try:
-                result = import_module(module_name)
+        rows = []
 
-            except ImportError:
-                # resolve element globals or locals of the from previous frame
-                previous_frame = currentframe().f_back
+        for path in paths:
+            name, module, attrs = _deepestmodule(path)
 
-                if module_name in previous_frame.f_locals:
-                    result = previous_frame.f_locals[module_name]
+            if module is None:
+                result.append(path)
 
-                elif module_name in previous_frame.f_globals:
-                    result = previous_frame.f_globals[module_name]
+            else:
+                source = _sourcefile(module)
+                mtime = None if source is None else getmtime(source)
+                rows.append((path, name, '.'.join(attrs), source, mtime))
 
-            found = result is not generated_result
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO paths VALUES (?, ?, ?, ?, ?)', rows
+            )
+            self._conn.commit()
 
-            if found:
+        return result
 
-                if components_len > 1:
+    def remove(self, paths=None):
+        """Remove index entries.
 
-                    index = 1
+        :param list paths: paths to remove. If None, remove all entries.
+        """
 
-                    # try to import all sub-modules/packages
-                    try:  # check if name is defined from an external module
-                        # find the right module
-                        while index < components_len:
-                            module_name = '{0}.{1}'.format(
-                                module_name, components[index]
-                            )
-                            result = import_module(module_name)
-                            index += 1
+        with self._lock:
+            if paths is None:
+                self._conn.execute('DELETE FROM paths')
 
-                    except ImportError:
-                        # path sub-module content
+            else:
+                self._conn.executemany(
+                    'DELETE FROM paths WHERE path = ?',
+                    [(path,) for path in paths]
+                )
+
+            self._conn.commit()
+
+    def validate(self, paths=None):
+        """Check index entries without importing modules.
+
+        :param list paths: paths to check. If None, check all entries.
+        :return: valid paths and stale or not indexed paths.
+        :rtype: tuple
+        """
+
+        valid, stale = [], []
+
+        entries = self.get(paths)
+        mtimes = {}  # source mtimes by source file
+
+        for path in entries if paths is None else paths:
+            entry = entries.get(path)
+            isvalid = entry is not None
+
+            if isvalid:
+                source, mtime = entry[2:]
+
+                if source is not None:
+                    if source not in mtimes:
                         try:
-                            if PY26:  # when __import__ is used
-                                index = 1  # restart count of pathing
-                            while index < components_len:
-                                result = getattr(result, components[index])
-                                index += 1
+                            mtimes[source] = getmtime(source)
 
-                        except AttributeError:
-                            raise ImportError(
-                                'Wrong path {0} at {1}'.format(
-                                    path, components[:index]
-                                )
-                            )
-                    else:  # in case of PY26
-                        if PY26:
-                            index = 1
-                            while index < components_len:
-                                result = getattr(result, components[index])
-                                index += 1
+                        except OSError:
+                            mtimes[source] = None
+
+                    isvalid = mtimes[source] == mtime
+
+            (valid if isvalid else stale).append(path)
+
+        return valid, stale
+
+    def lookup_many(self, paths, cache=True):
+        """Resolve paths with this index.
+
+        Valid indexed paths are resolved without trying to import their
+        prefixes. Other paths are resolved with the function lookup_many and
+        indexed.
+
+        :param list paths: paths to resolve.
+        :param bool cache: if True (default), use the lookup cache.
+        :return: resolved elements by path and errors by path.
+        :rtype: tuple
+        """
+
+        result, errors = {}, {}
+
+        lookupcache = getcache()
+
+        valid, stale = self.validate(paths)
+        entries = self.get(valid)
+
+        for path in valid:
+
+            if cache:
+                element = lookupcache.get(path, _MISSING)
+
+                if element is not _MISSING:
+                    result[path] = element
+                    continue
+
+            name, attrs = entries[path][:2]
+
+            try:
+                import_module(name)
+                element = modules[name]
+
+                for attr in attrs:
+                    element = getattr(element, attr)
+
+            except (ImportError, AttributeError):
+                stale.append(path)
+
+            else:
+                result[path] = element
+
+                if cache:
+                    lookupcache[path] = element
+                    _track(path)
+
+        if stale:
+            resolved, errors = lookup_many(stale, cache=cache)
+            result.update(resolved)
+            self._index(list(resolved))
+
+        return result, errors
+
+
+#: (element weak reference, path) by element id
+__GETPATH_CACHE = {}
+
+
+def _canonicalpath(element):
+    """Get the path of an element from its module and qualified name.
+
+    :return: element path and True if the path is exact (module, or qualified
+        name which does not come from a local scope). The path is None if the
+        element has no attribute __name__.
+    :rtype: tuple
+    """
+
+    result = None, False
+
+    name = getattr(element, '__name__', None)
+
+    if name is not None:
+
+        if ismodule(element):
+            result = name, True
 
         else:
-            found = True
+            qualname = getattr(element, '__qualname__', None)
+            exact = qualname is not None and '<locals>' not in qualname
 
-    if found:
-        if cache:  # save in cache if found
-            __LOOKUP_CACHE[path] = result
+            if qualname is None:
+                cls = getattr(element, 'im_class', None)  # python2 methods
 
-    else:
-        raise ImportError('Wrong path {0}'.format(path))
+                if cls is not None:
+                    qualname = '{0}.{1}'.format(cls.__name__, name)
+                    exact = True
+
+            if not exact:
+                qualname = name
+
+            result = '{0}.{1}'.format(element.__module__, qualname), exact
 
     return result
 
 
+def _bindpath(element, path):
+    """Save the path of an element in the getpath cache.
+
+    Nothing is saved if element is not weakly referenceable.
+    """
+
+    key = id(element)
+
+    try:
+        ref = weakref(element, lambda _: __GETPATH_CACHE.pop(key, None))
+
+    except TypeError:
+        pass
+
+    else:
+        __GETPATH_CACHE[key] = ref, path
+
+
+def _registerpath(element, path):
+    """Register the path from where an element has been resolved.
+
+    The path is used by getpath only if the element has no exact path.
+    """
+
+    entry = __GETPATH_CACHE.get(id(element))
+
+    if entry is None or entry[0]() is not element:
+        canonical, exact = _canonicalpath(element)
+        _bindpath(element, canonical if exact else path)
+
+
 def getpath(element):
     """Get full path of a given element such as the opposite of the
     resolve_path behaviour.
 
-    :param element: must be directly defined into a module or a package and has
-        the attribute '__name__'.
+    The path is made of the element module and qualified name, such as
+    ``module.Class.method``. If the element comes from a local scope, or has
+    no qualified name (python2 nested classes), the path used to resolve it
+    with lookup or alias is prefered. Results are memoized by element.
+
+    :param element: must be defined into a module or a package and has
+        the attribute '__name__', or be resolved with lookup or alias.
 
     :return: element absolute path.
     :rtype: str
@@ -227,41 +2563,289 @@ def getpath(element):
 
     >>> getpath(getpath)
     b3j0f.utils.path.getpath
+    >>> getpath(LookupCache.get)
+    b3j0f.utils.path.LookupCache.get
+    """
+
+    entry = __GETPATH_CACHE.get(id(element))
+
+    if entry is not None and entry[0]() is element:
+        result = entry[1]
+
+    else:
+        result, _ = _canonicalpath(element)
+
+        if result is None:
+            raise AttributeError(
+                'element {0} must have the attribute __name__'.format(element)
+            )
+
+        _bindpath(element, result)
+
+    return result
+
+
+class FrozenAliases(dict):
+    """Read-only dictionary of aliases."""
+
+    def _readonly(self, *args, **kwargs):
+        """Raise a TypeError."""
+
+        raise TypeError('{0} is read-only'.format(type(self).__name__))
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _readonly
+
+
+class AliasRegistry(object):
+    """Named registry of aliases.
+
+    Aliases are resolved by lookup before the lookup cache, and are not
+    removed by clearcache. Lookup reads a frozen snapshot of the registry
+    which is renewed after every change.
+
+    :Example:
+
+    >>> registry = getregistry('tenant')
+    >>> registry.update({'max': min})
+    >>> lookup('max', aliases=['tenant'])([1, 2])
+    1
+    """
+
+    def __init__(self, name):
+        """
+        :param str name: registry name.
+        """
+
+        super(AliasRegistry, self).__init__()
+
+        self.name = name
+
+        self._aliases = {}
+        self._snapshot = FrozenAliases()
+
+    def snapshot(self):
+        """Get a frozen copy of aliases.
+
+        :rtype: FrozenAliases
+        """
+
+        result = self._snapshot
+
+        if result is None:
+            result = self._snapshot = FrozenAliases(self._aliases)
+
+        return result
+
+    def register(self, _id, elt):
+        """Register an element with an alias identifier.
+
+        :param str _id: alias identifier.
+        :param elt: element to register.
+        """
+
+        self._aliases[_id] = elt
+        self._snapshot = None
+        _registerpath(elt, _id)
+
+    def update(self, aliases):
+        """Register several elements.
+
+        :param dict aliases: elements by alias identifier.
+        """
+
+        for _id in aliases:
+            self.register(_id, aliases[_id])
+
+    def load(self, group, lazy=False):
+        """Register entry points of a group by entry point name.
+
+        :param str group: entry point group name.
+        :param bool lazy: if True (default False), register LazyProxies which
+            load entry points at their first use.
+        :return: entry point names.
+        :rtype: list
+        """
+
+        if lazy:
+            from .proxy import LazyProxy  # avoid a cyclic import
+
+        result = []
+
+        for entrypoint in _entrypoints(group):
+
+            if lazy:
+                # register the path without resolving the proxy
+                elt = LazyProxy(entrypoint.load)
+                self._aliases[entrypoint.name] = elt
+                self._snapshot = None
+                _bindpath(elt, entrypoint.name)
+
+            else:
+                self.register(entrypoint.name, entrypoint.load())
+
+            result.append(entrypoint.name)
+
+        return result
+
+    def unregister(self, _id):
+        """Unregister an alias.
+
+        :param str _id: alias identifier.
+        :return: unregistered element or None.
+        """
+
+        result = self._aliases.pop(_id, None)
+        self._snapshot = None
+
+        return result
+
+    def clear(self):
+        """Unregister all aliases."""
+
+        self._aliases.clear()
+        self._snapshot = None
+
+    def get(self, _id, default=None):
+        """Get an aliased element or default."""
+
+        return self.snapshot().get(_id, default)
+
+    def __getitem__(self, _id):
+
+        return self.snapshot()[_id]
+
+    def __contains__(self, _id):
+
+        return _id in self.snapshot()
+
+    def __len__(self):
+
+        return len(self._aliases)
+
+    def __iter__(self):
+
+        return iter(self.snapshot())
+
+
+def _entrypoints(group):
+    """Get entry points of a group."""
+
+    try:
+        from importlib.metadata import entry_points
+
+    except ImportError:
+        from pkg_resources import iter_entry_points
+
+        result = list(iter_entry_points(group))
+
+    else:
+        result = entry_points()
+
+        if hasattr(result, 'select'):
+            result = list(result.select(group=group))
+
+        else:
+            result = list(result.get(group, ()))
+
+    return result
+
+
+DEFAULT_REGISTRY = 'default'  #: default alias registry name.
+
+#: alias registries by name
+__ALIAS_REGISTRIES = {DEFAULT_REGISTRY: AliasRegistry(DEFAULT_REGISTRY)}
+
+
+def getregistry(name=DEFAULT_REGISTRY):
+    """Get an alias registry by name. It is created if it does not exist.
+
+    :param str name: registry name. Default is the default registry.
+    :rtype: AliasRegistry
+    """
+
+    result = __ALIAS_REGISTRIES.get(name)
+
+    if result is None:
+        result = __ALIAS_REGISTRIES.setdefault(name, AliasRegistry(name))
+
+    return result
+
+
+def delregistry(name):
+    """Delete an alias registry.
+
+    :param str name: registry name.
+    :return: deleted registry or None.
+    :rtype: AliasRegistry
+    """
+
+    result = __ALIAS_REGISTRIES.pop(name, None)
+
+    if name == DEFAULT_REGISTRY:  # the default registry always exists
+        __ALIAS_REGISTRIES[name] = AliasRegistry(name)
+
+    return result
+
+
+def _getalias(path, aliases=None):
+    """Find an aliased element in registries.
+
+    :param str path: alias identifier.
+    :param list aliases: registries or registry names. Default is the default
+        registry.
+    :return: aliased element or _MISSING.
     """
 
-    if not hasattr(element, '__name__'):
-        raise AttributeError(
-            'element {0} must have the attribute __name__'.format(element)
+    if aliases is None:
+        result = __ALIAS_REGISTRIES[DEFAULT_REGISTRY].snapshot().get(
+            path, _MISSING
         )
 
-    result = element.__name__ if ismodule(element) else \
-        '{0}.{1}'.format(element.__module__, element.__name__)
+    else:
+        result = _MISSING
+
+        for registry in aliases:
+            if isinstance(registry, string_types):
+                registry = getregistry(registry)
+
+            result = registry.snapshot().get(path, _MISSING)
+
+            if result is not _MISSING:
+                break
 
     return result
 
 
-def alias(_id):
+def alias(_id, registry=DEFAULT_REGISTRY):
     """Decorator dedicated to make an alias of a decorated element in order to
-    register it in the lookup cache.
+    register it in an alias registry.
 
     :param str _id: alias identifier.
+    :param registry: alias registry or registry name. Default is the default
+        registry.
 
     :Example:
 
-    >>> alias('halfsonofzeus', 'hercules')
+    >>> alias('halfsonofzeus')('hercules')
     'hercules'
     >>> lookup('halfsonofzeus')
     'hercules'
     >>> @alias('cube')
     >>> def cube(value): return value ** value ** value
-    >>> lookpath('cube')(2)
-    8
+    >>> lookup('cube')(2)
+    16
     """
 
     def _register_elt(elt):
-        """Register a specific element in the lookup cache."""
+        """Register a specific element in the alias registry."""
+
+        _registry = registry
+
+        if isinstance(_registry, string_types):
+            _registry = getregistry(_registry)
 
-        __LOOKUP_CACHE[_id] = elt
+        _registry.register(_id, elt)
 
         return elt
 
@@ -33,7 +33,8 @@ implementation.
 from __future__ import absolute_import
 
 __all__ = [
-    'get_proxy', 'proxify_routine', 'proxify_elt', 'is_proxy', 'proxified_elt'
+    'get_proxy', 'proxify_routine', 'proxify_elt', 'is_proxy', 'proxified_elt',
+    'LazyProxy'
 ]
 
 from time import time
@@ -47,9 +48,25 @@ from random import randint
 from sys import maxsize
 
 from inspect import (
-    getmembers, isroutine, ismethod, getargspec, getfile, isbuiltin, isclass
+    getmembers, isroutine, ismethod, getfile, isbuiltin, isclass
 )
 
+try:  # python >= 3.0, getargspec is removed in python 3.11
+    from inspect import getfullargspec
+
+except ImportError:
+    from inspect import getargspec
+
+else:
+    def getargspec(func):
+        """Get names and default values of a function arguments.
+
+        :return: args, varargs, keywords and defaults.
+        :rtype: tuple
+        """
+
+        return getfullargspec(func)[:4]
+
 from six import (
     get_function_closure, get_function_code, get_function_defaults,
     get_function_globals, get_method_function, get_method_self, exec_, PY2, PY3,
@@ -75,6 +92,8 @@ __PROXY_CLASS__ = 'Proxy'
 __PROXIFIED__ = '__proxified__'
 #: instance method name for delegating proxy generation to the elt to proxify
 __GETPROXY__ = '__getproxy__'
+#: default value of a not resolved lazy proxy element
+_UNRESOLVED = object()
 
 
 def proxify_elt(elt, bases=None, _dict=None, public=False):
@@ -468,3 +487,133 @@ def is_proxy(elt):
     result = hasattr(elt, __PROXIFIED__)
 
     return result
+
+
+class LazyProxy(object):
+    """Proxy of an element which is resolved at its first use.
+
+    The proxified element is resolved by a function without parameters when
+    an attribute is get/set/deleted, when the proxy is called or when an
+    operator is applied. Then, the proxy delegates everything to the resolved
+    element.
+
+    :Example:
+
+    >>> proxy = LazyProxy(lambda: min)
+    >>> proxy([1, 2])
+    1
+    >>> proxified_elt(proxy) is min
+    True
+    """
+
+    __slots__ = ('_resolver', '_elt', '__weakref__')
+
+    def __init__(self, resolver):
+        """
+        :param resolver: function without parameters which returns the
+            proxified element.
+        """
+
+        object.__setattr__(self, '_resolver', resolver)
+        object.__setattr__(self, '_elt', _UNRESOLVED)
+
+    def _resolve(self):
+        """Get the proxified element and resolve it if necessary."""
+
+        result = object.__getattribute__(self, '_elt')
+
+        if result is _UNRESOLVED:
+            result = object.__getattribute__(self, '_resolver')()
+            object.__setattr__(self, '_elt', result)
+            object.__setattr__(self, '_resolver', None)
+
+        return result
+
+    @property
+    def __proxified__(self):
+        """Proxified element."""
+
+        return self._resolve()
+
+    @property
+    def __class__(self):
+
+        return self._resolve().__class__
+
+    def __getattr__(self, name):
+
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+
+        setattr(self._resolve(), name, value)
+
+    def __delattr__(self, name):
+
+        delattr(self._resolve(), name)
+
+    def __dir__(self):
+
+        return dir(self._resolve())
+
+    def __call__(self, *args, **kwargs):
+
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+
+        elt = object.__getattribute__(self, '_elt')
+
+        if elt is _UNRESOLVED:
+            result = '<LazyProxy at {0}>'.format(hex(id(self)))
+
+        else:
+            result = repr(elt)
+
+        return result
+
+    def __str__(self):
+
+        return str(self._resolve())
+
+    def __hash__(self):
+
+        return hash(self._resolve())
+
+    def __eq__(self, other):
+
+        return self._resolve() == other
+
+    def __ne__(self, other):
+
+        return self._resolve() != other
+
+    def __bool__(self):
+
+        return bool(self._resolve())
+
+    __nonzero__ = __bool__
+
+    def __len__(self):
+
+        return len(self._resolve())
+
+    def __iter__(self):
+
+        return iter(self._resolve())
+
+    def __contains__(self, item):
+
+        return item in self._resolve()
+
+    def __getitem__(self, key):
+
+        return self._resolve()[key]
+
+    def __setitem__(self, key, value):
+
+        self._resolve()[key] = value
+
+    def __delitem__(self, key):
+
+        del self._resolve()[key]
@@ -38,281 +38,2426 @@ Modifications:
     avoid to update globals.
 - Modify verbose argument which is None or use a function with one argument
     which can be bound to a print function or a logging function.
-- Set attributes from originary function such as __dict__, __module__, etc."""
+- Set attributes from originary function such as __dict__, __module__, etc.
+- Rewrite instructions for all bytecode formats (3 bytes instructions,
+    python >= 3.6 wordcode and python >= 3.11 inline caches) without padding,
+    update jumps, line numbers and exception tables, and do not fold
+    instructions targeted by jumps."""
 
-from opcode import opmap, HAVE_ARGUMENT, EXTENDED_ARG
+from opcode import (
+    opmap, opname, HAVE_ARGUMENT, EXTENDED_ARG, hasjrel, hasjabs
+)
 
-from types import FunctionType, ModuleType
+from dis import findlabels, findlinestarts
 
-from functools import reduce
+try:  # python >= 3.4
+    from dis import stack_effect
 
-from six import exec_, PY3
-from six.moves import builtins
+except ImportError:
+    stack_effect = None
 
+from inspect import getmro
+
+from types import FunctionType, ModuleType, CodeType
+
+from itertools import islice
+
+from threading import Lock, RLock, Thread, Event
+
+from pkgutil import walk_packages
+
+from importlib import import_module
+
+from warnings import catch_warnings, simplefilter, warn
+
+from sys import gettrace, settrace, version_info, modules, _current_frames
+
+from timeit import default_timer
+
+from pickle import dumps
+
+from weakref import ref
+
+import ast
+
+from six import exec_, PY3, string_types
+from six.moves import builtins, zip
+from six.moves._thread import get_ident
+
+from .version import OrderedDict
+
+try:  # python >= 3.11
+    from opcode import _inline_cache_entries
+
+except ImportError:
+    _inline_cache_entries = None
+
+try:  # python >= 3.11
+    from dis import _parse_exception_table
+
+except ImportError:
+    _parse_exception_table = None
+
+try:  # python >= 3.3
+    from collections import ChainMap
+
+except ImportError:
+    ChainMap = None
+
+try:  # python >= 3.3
+    from types import MappingProxyType
+
+except ImportError:
+    MappingProxyType = None
+
+try:
+    import resource
+
+except ImportError:  # not available on windows
+    resource = None
 
 
 __all__ = [
-    'SAFE_BUILTINS', 'safe_eval', 'safe_exec', 'bind_all', 'make_constants',
-    'singleton_per_scope', 'getcodeobj'
+    'SAFE_BUILTINS', 'Sandbox', 'getsandbox', 'safe_eval', 'safe_exec',
+    'safe_compile', 'SAFE_NODES', 'INTROSPECTION_BUILTINS',
+    'UnsafeSourceError', 'safe_eval_many', 'safe_eval_columns',
+    'ResourceLimitError', 'LineLimitError', 'TimeLimitError',
+    'MemoryLimitError', 'safe_exec_process', 'bind_all', 'profile_bind_all',
+    'analyze_constants', 'analyze_bind_all',
+    'make_constants', 'checkguards', 'unguard', 'REOPTIMIZE', 'DEOPTIMIZE',
+    'MUTABLE_ATTRIBUTES',
+    'singleton_per_scope', 'asingleton_per_scope', 'close_scope',
+    'add_disposer', 'remove_disposer', 'getcodeobj'
 ]
 
 
-BUILTIN_IO_PROPS = [
-    'open', '__name__', '__debug__', '__doc__', '__import__', '__package__',
-    'compile', 'copyright', 'credits', 'eval', 'execfile', 'exit', 'file',
-    'globals', 'help', 'input', 'intern', 'license', 'locals', 'open', 'print',
-    'quit', 'raw_input', 'reload'
-]  #: set of builtin objects to remove from a safe builtin.
+_MISSING = object()
+
+
+BUILTIN_IO_PROPS = [
+    'open', '__name__', '__debug__', '__doc__', '__import__', '__package__',
+    'compile', 'copyright', 'credits', 'eval', 'execfile', 'exit', 'file',
+    'globals', 'help', 'input', 'intern', 'license', 'locals', 'open', 'print',
+    'quit', 'raw_input', 'reload'
+]  #: set of builtin objects to remove from a safe builtin.
+
+INTROSPECTION_BUILTINS = [
+    'getattr', 'setattr', 'delattr', 'hasattr', 'vars', 'dir', 'type',
+    'super', 'object', 'format'
+]  #: builtin objects removed from the namespace of validated code.
+
+#: string formatting methods which read attributes named in the template.
+_FORMAT_METHODS = ('format', 'format_map')
+
+
+#: singletons by class by scope. Weak scopes are keyed by a weak reference.
+SINGLETONS_PER_SCOPES = {}
+
+#: reentrant because weak scopes are closed by garbage collection callbacks,
+#: which may run in a thread which holds the lock.
+_SINGLETONS_LOCK = RLock()
+_SINGLETON_LOCKS = {}  #: pending construction locks by (scope key, class).
+_DISPOSERS = {}  #: disposal hooks by class.
+_PENDING_SINGLETONS = {}  #: asynchronous constructions by (loop, key, class).
+
+
+def _scopekey(scope, weak):
+    """Get the key of a scope in SINGLETONS_PER_SCOPES.
+
+    :param scope: hashable scope.
+    :param bool weak: if True, the key is a weak reference to the scope which
+        closes the scope once it is garbage collected."""
+
+    return ref(scope, _close) if weak else scope
+
+
+def _singletonlock(key, _cls):
+    """Get the construction lock of a (scope key, class)."""
+
+    with _SINGLETONS_LOCK:
+        result = _SINGLETON_LOCKS.get((key, _cls))
+
+        if result is None:
+            result = _SINGLETON_LOCKS[(key, _cls)] = Lock()
+
+    return result
+
+
+def _store(key, _cls, instance, renew):
+    """Store a singleton unless another one has been stored meanwhile.
+
+    :return: stored singleton and the discarded instance (_MISSING if none).
+    :rtype: tuple"""
+
+    with _SINGLETONS_LOCK:
+        singletons = SINGLETONS_PER_SCOPES.setdefault(key, {})
+        old = singletons.get(_cls, _MISSING)
+
+        if renew or old is _MISSING:
+            singletons[_cls] = instance
+            result = instance, old
+
+        else:
+            result = old, instance
+
+    return result
+
+
+def _dispose(*instances):
+    """Call disposal hooks of instances.
+
+    All hooks are called, then the first hook error is raised."""
+
+    error = None
+
+    for instance in instances:
+        if instance is _MISSING:
+            continue
+
+        for cls in getmro(instance.__class__):
+            for hook in list(_DISPOSERS.get(cls, ())):
+                try:
+                    hook(instance)
+
+                except Exception as ex:
+                    if error is None:
+                        error = ex
+
+    if error is not None:
+        raise error
+
+
+def _close(key):
+    """Remove and dispose singletons of a scope key.
+
+    :return: number of removed singletons.
+    :rtype: int"""
+
+    with _SINGLETONS_LOCK:
+        singletons = SINGLETONS_PER_SCOPES.pop(key, {})
+
+    _dispose(*singletons.values())
+
+    return len(singletons)
+
+
+def singleton_per_scope(_cls, _scope=None, _renew=False, *args, **kwargs):
+    """Instanciate a singleton per scope.
+
+    Construction is thread safe: concurrent calls for a same scope and class
+    build the singleton once (double-checked locking per scope and class).
+
+    :param _cls: singleton class or factory.
+    :param _scope: hashable scope. Default is the global scope.
+    :param bool _renew: if True, replace the singleton and dispose the old
+        one.
+    :param args: construction arguments.
+    :param kwargs: construction keyword arguments. The keyword `_weak`
+        (default False) references the scope weakly: its singletons are
+        disposed and released once the scope is garbage collected.
+    :return: scope singleton.
+
+    :Example:
+
+    >>> pool = singleton_per_scope(Pool, request, _weak=True, size=4)
+    >>> pool is singleton_per_scope(Pool, request, _weak=True, size=4)
+    True
+    """
+
+    key = _scopekey(_scope, kwargs.pop('_weak', False))
+
+    singletons = SINGLETONS_PER_SCOPES.get(key, {})
+
+    result = _MISSING if _renew else singletons.get(_cls, _MISSING)
+
+    if result is _MISSING:
+        lock = _singletonlock(key, _cls)
+
+        try:
+            with lock:
+                singletons = SINGLETONS_PER_SCOPES.get(key, {})
+
+                if not _renew:
+                    result = singletons.get(_cls, _MISSING)
+
+                if result is _MISSING:
+                    result, discarded = _store(
+                        key, _cls, _cls(*args, **kwargs), _renew
+                    )
+                    _dispose(discarded)
+
+        finally:  # the lock is useless once the singleton is stored
+            with _SINGLETONS_LOCK:
+                if _SINGLETON_LOCKS.get((key, _cls)) is lock:
+                    del _SINGLETON_LOCKS[(key, _cls)]
+
+    return result
+
+
+def asingleton_per_scope(_cls, _scope=None, _renew=False, *args, **kwargs):
+    """Get a singleton per scope without blocking the current asyncio event
+    loop.
+
+    _cls may be a factory which returns an awaitable, such as a coroutine
+    function, in which case the singleton is the awaited result. Concurrent
+    calls for a same scope and class in an event loop share the same
+    construction.
+
+    :param _cls: singleton class or factory.
+    :param _scope: hashable scope. Default is the global scope.
+    :param bool _renew: if True, replace the singleton and dispose the old
+        one.
+    :param args: construction arguments.
+    :param kwargs: construction keyword arguments, with `_weak` like in
+        singleton_per_scope.
+    :return: awaitable future of the scope singleton.
+
+    :Example:
+
+    >>> async def handle(request):
+    ...     pool = await asingleton_per_scope(createpool, request, _weak=True)
+    """
+
+    from asyncio import ensure_future, shield
+    from inspect import isawaitable
+    from .path import _getloop, _newfuture  # avoid a cyclic import
+
+    key = _scopekey(_scope, kwargs.pop('_weak', False))
+    loop = _getloop()
+    pendingkey = (loop, key, _cls)
+
+    singleton = SINGLETONS_PER_SCOPES.get(key, {}).get(_cls, _MISSING)
+    pending = _PENDING_SINGLETONS.get(pendingkey)
+
+    if not _renew and singleton is not _MISSING:
+        result = _newfuture(loop, singleton)
+
+    elif not _renew and pending is not None:
+        result = shield(pending)
+
+    else:
+        instance = _cls(*args, **kwargs)
+
+        if isawaitable(instance):
+            future = _newfuture(loop)
+            _PENDING_SINGLETONS[pendingkey] = future
+
+            def built(task):
+                """Store the awaited singleton."""
+
+                if _PENDING_SINGLETONS.get(pendingkey) is future:
+                    del _PENDING_SINGLETONS[pendingkey]
+
+                if task.cancelled():
+                    future.cancel()
+
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+
+                else:
+                    singleton, discarded = _store(
+                        key, _cls, task.result(), _renew
+                    )
+                    future.set_result(singleton)
+                    _dispose(discarded)
+
+            ensure_future(instance, loop=loop).add_done_callback(built)
+
+            # avoid to cancel the construction of other awaiting coroutines
+            result = shield(future)
+
+        else:
+            singleton, discarded = _store(key, _cls, instance, _renew)
+            result = _newfuture(loop, singleton)
+            _dispose(discarded)
+
+    return result
+
+
+def close_scope(scope=None):
+    """Release singletons of a scope and call their disposal hooks.
+
+    :param scope: scope to close. Default is the global scope.
+    :return: number of released singletons.
+    :rtype: int
+    :raises: the first error raised by a disposal hook, once all hooks are
+        called."""
+
+    result = _close(scope)
+
+    try:
+        weakkey = ref(scope)
+
+    except TypeError:  # scope is not weakly referenceable
+        pass
+
+    else:
+        result += _close(weakkey)
+
+    return result
+
+
+def add_disposer(_cls, hook):
+    """Register a disposal hook of singletons of a class and its sub-classes.
+
+    :param type _cls: singleton class.
+    :param hook: function called with a singleton when it is released by
+        close_scope, garbage collection of a weak scope, or renewal.
+    """
+
+    with _SINGLETONS_LOCK:
+        _DISPOSERS.setdefault(_cls, []).append(hook)
+
+
+def remove_disposer(_cls, hook):
+    """Unregister a disposal hook.
+
+    :return: True if the hook was registered.
+    :rtype: bool"""
+
+    with _SINGLETONS_LOCK:
+        hooks = _DISPOSERS.get(_cls, [])
+
+        result = hook in hooks
+
+        if result:
+            hooks.remove(hook)
+
+            if not hooks:
+                del _DISPOSERS[_cls]
+
+    return result
+
+
+def _safebuiltins(allow=None, deny=None):
+    """Construct a safe builtin environment without I/O functions.
+
+    :param allow: if given, names of builtin objects to keep, including I/O
+        functions.
+    :param deny: names of builtin objects to remove.
+    :rtype: dict"""
+
+    result = {}
+
+    if allow is None:
+        objectnames = [
+            objectname for objectname in dir(builtins)
+            if objectname not in BUILTIN_IO_PROPS
+        ]
+
+    else:
+        objectnames = [
+            objectname for objectname in allow if hasattr(builtins, objectname)
+        ]
+
+    if deny is not None:
+        objectnames = [
+            objectname for objectname in objectnames if objectname not in deny
+        ]
+
+    for objectname in objectnames:
+        result[objectname] = getattr(builtins, objectname)
+
+    return result
+
+
+class _Overlay(dict):
+    """Global namespace of a safe execution.
+
+    Its own items are builtins and names defined by the execution, and
+    missing names are read from layers (such as caller globals) which are
+    neither copied nor modified."""
+
+    __slots__ = ('layers',)
+
+    def __init__(self, builtins_, *layers):
+
+        super(_Overlay, self).__init__()
+
+        self['__builtins__'] = builtins_
+        self.layers = layers
+
+    def __missing__(self, key):
+
+        for layer in self.layers:
+            try:
+                return layer[key]
+
+            except KeyError:
+                pass
+
+        raise KeyError(key)
+
+
+class Sandbox(object):
+    """Namespace of safe evaluations and executions.
+
+    It owns a frozen builtins mapping (read-only on python 3) computed once
+    from an allow/deny profile, and layers caller globals under the
+    execution namespace instead of copying them (python >= 3.3, otherwise
+    caller globals are copied).
+
+    Each namespace gets its own dict copy of builtins, because the
+    interpreter requires a dict (for example for import statements) and
+    executed code must not modify builtins of other executions.
+
+    Use getsandbox in order to share sandboxes of a same profile.
+    """
+
+    __slots__ = ('allow', 'deny', 'builtins')
+
+    def __init__(self, allow=None, deny=None):
+        """
+        :param allow: names of allowed builtin objects. Default is all
+            builtins except I/O functions (BUILTIN_IO_PROPS).
+        :param deny: names of denied builtin objects.
+        """
+
+        super(Sandbox, self).__init__()
+
+        self.allow = None if allow is None else frozenset(allow)
+        self.deny = None if deny is None else frozenset(deny)
+
+        self.builtins = _safebuiltins(self.allow, self.deny)
+
+        if MappingProxyType is not None:
+            self.builtins = MappingProxyType(self.builtins)
+
+    def __reduce__(self):
+
+        return getsandbox, (self.allow, self.deny)
+
+    def namespaces(self, _globals=None, _locals=None, copy=False):
+        """Get global and local namespaces of an evaluation or an execution.
+
+        Names defined by an execution are set in the global namespace or in
+        _locals, never in _globals. The item __builtins__ of the global
+        namespace is a new dict copy of builtins.
+
+        :param dict _globals: global objects by name.
+        :param dict _locals: local objects by name.
+        :param bool copy: if True, copy _globals in the global namespace
+            instead of layering them. Such a namespace can be shared by
+            evaluations with different local namespaces.
+        :return: global namespace (dict) and local namespace (mapping, or
+            None if _locals is None).
+        :rtype: tuple"""
+
+        builtins_ = dict(self.builtins)
+
+        if _globals is None:
+            result = {'__builtins__': builtins_}, _locals
+
+        elif copy or ChainMap is None:  # no ChainMap on python < 3.3
+            namespace = dict(_globals)
+            namespace['__builtins__'] = builtins_
+            result = namespace, _locals
+
+        else:
+            namespace = _Overlay(builtins_, _globals)
+            # top-level names are read from locals before globals items
+            result = namespace, (
+                None if _locals is None else ChainMap(_locals, namespace)
+            )
+
+        return result
+
+
+_SANDBOXES = {}  #: sandboxes by (allow, deny) profile.
+
+
+def getsandbox(allow=None, deny=None):
+    """Get the sandbox of an allow/deny builtins profile.
+
+    Sandboxes are computed once per profile.
+
+    :param allow: names of allowed builtin objects. Default is all builtins
+        except I/O functions.
+    :param deny: names of denied builtin objects.
+    :rtype: Sandbox
+
+    :Example:
+
+    >>> sandbox = getsandbox(deny=['getattr', 'type'])
+    >>> safe_eval('len(name)', {'name': 'a'}, sandbox=sandbox)
+    1
+    """
+
+    key = (
+        None if allow is None else frozenset(allow),
+        None if deny is None else frozenset(deny)
+    )
+
+    result = _SANDBOXES.get(key)
+
+    if result is None:
+        result = _SANDBOXES.setdefault(key, Sandbox(allow, deny))
+
+    return result
+
+
+#: safe builtins.
+SAFE_BUILTINS = {'__builtins__': dict(getsandbox().builtins)}
+
+_VALIDATED = '<safe>'  #: file name of code objects validated by safe_compile.
+
+
+def _defaultsandbox(source):
+    """Get the default sandbox of a source or a code object.
+
+    Code objects validated by safe_compile are executed without introspection
+    builtins (INTROSPECTION_BUILTINS), which give access to private attributes
+    with names unknown at compile time.
+
+    :rtype: Sandbox"""
+
+    if getattr(source, 'co_filename', None) == _VALIDATED:
+        result = getsandbox(deny=INTROSPECTION_BUILTINS)
+
+    else:
+        result = getsandbox()
+
+    return result
+
+
+def safe_eval(source, _globals=None, _locals=None, sandbox=None):
+    """Process a safe evaluation.
+
+    The evaluation uses a sandbox namespace where _globals items are
+    readable, therefore _globals is not modified.
+
+    :param source: expression or code object (see safe_compile). Expressions
+        are compiled once.
+    :param dict _globals: global objects by name.
+    :param dict _locals: local objects by name.
+    :param Sandbox sandbox: sandbox to use. Default is getsandbox(), without
+        INTROSPECTION_BUILTINS if source comes from safe_compile.
+    :return: evaluation result."""
+
+    if isinstance(source, string_types):
+        source = _compile(source, 'eval', False)
+
+    if sandbox is None:
+        sandbox = _defaultsandbox(source)
+
+    namespace, _locals = sandbox.namespaces(_globals, _locals)
+
+    return eval(source, namespace, _locals)
+
+
+class ResourceLimitError(BaseException):
+    """Raised when a safe execution exceeds a resource limit.
+
+    Such as KeyboardInterrupt, it does not inherit from Exception in order to
+    not be caught by executed code which catches Exception."""
+
+    resource = None  #: resource name.
+
+    def __init__(self, limit, used=None, message=None):
+        """
+        :param limit: resource limit.
+        :param used: used resource when the execution has been stopped.
+        :param str message: error message.
+        """
+
+        if message is None:
+            message = '{0} limit {1} exceeded'.format(self.resource, limit)
+
+            if used is not None:
+                message = '{0} ({1})'.format(message, used)
+
+        super(ResourceLimitError, self).__init__(message)
+
+        self.limit = limit
+        self.used = used
+        self.message = message
+
+    def __reduce__(self):
+
+        return type(self), (self.limit, self.used, self.message)
+
+
+class LineLimitError(ResourceLimitError):
+    """Raised when a safe execution exceeds its number of executed lines."""
+
+    resource = 'lines'
+
+
+class TimeLimitError(ResourceLimitError):
+    """Raised when a safe execution exceeds its duration in seconds."""
+
+    resource = 'time'
+
+
+class MemoryLimitError(ResourceLimitError):
+    """Raised when a safe execution exceeds its memory in bytes."""
+
+    resource = 'memory'
+
+
+class _Budget(object):
+    """Trace function which stops an execution after a number of executed
+    lines or a duration.
+
+    Only lines of frames which use the execution globals are counted."""
+
+    def __init__(self, namespace, lines=None, timeout=None):
+
+        super(_Budget, self).__init__()
+
+        self.namespace = namespace
+        self.lines = lines
+        self.timeout = timeout
+        self.start = default_timer()
+        self.count = 0
+
+    def __call__(self, frame, event, arg):
+
+        result = self
+
+        if event == 'call':
+            if self.timeout is None and frame.f_globals is not self.namespace:
+                result = None
+
+        elif event == 'line':
+            if frame.f_globals is self.namespace:
+                self.count += 1
+
+                if self.lines is not None and self.count > self.lines:
+                    raise LineLimitError(self.lines, self.count)
+
+            if self.timeout is not None:
+                duration = default_timer() - self.start
+
+                if duration > self.timeout:
+                    raise TimeLimitError(self.timeout, duration)
+
+        return result
+
+
+def safe_exec(
+        source, _globals=None, _locals=None, lines=None, timeout=None,
+        sandbox=None
+):
+    """Do a safe python execution.
+
+    The execution uses a sandbox namespace where _globals items are
+    readable. Names defined by the execution are set in _globals (or
+    _locals) afterwards, and functions defined by the execution keep the
+    sandbox namespace.
+
+    Limits of lines and time are checked by a trace function of the current
+    thread at each executed line. Lines of functions defined by the executed
+    code are counted, and the duration is checked in all called python
+    functions. Tracing stops once a limit error is raised, therefore code
+    which catches BaseException, or long calls of C functions, can not be
+    interrupted (see safe_exec_process).
+
+    :param source: source or code object to execute.
+    :param dict _globals: global objects by name.
+    :param dict _locals: local objects by name.
+    :param int lines: maximal number of executed lines.
+    :param float timeout: maximal duration in seconds.
+    :param Sandbox sandbox: sandbox to use. Default is getsandbox(), without
+        INTROSPECTION_BUILTINS if source comes from safe_compile.
+    :raises LineLimitError: if more than lines lines are executed.
+    :raises TimeLimitError: if the execution lasts more than timeout."""
+
+    if sandbox is None:
+        sandbox = _defaultsandbox(source)
+
+    if _globals is None:
+        _globals = {}
+
+    namespace, namespacelocals = sandbox.namespaces(_globals, _locals)
+
+    budget = None
+
+    if lines is not None or timeout is not None:
+        budget = _Budget(namespace, lines, timeout)
+        trace = gettrace()
+        settrace(budget)
+
+    try:
+        exec_(source, namespace, namespacelocals)
+
+    finally:
+        if budget is not None:
+            settrace(trace)
+
+        for name, value in namespace.items():
+            if name != '__builtins__':
+                _globals[name] = value
+
+
+def _safe_exec_child(connection, source, _globals, lines, memory):
+    """Execute a source in a child process and send the result.
+
+    The result is ('result', picklable defined objects by name) or ('error',
+    exception)."""
+
+    try:
+        if memory is not None:
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+
+        _globals = {} if _globals is None else dict(_globals)
+
+        safe_exec(source, _globals, lines=lines)
+
+        result = {}
+
+        for name, value in _globals.items():
+            if name != '__builtins__':
+                try:
+                    dumps(value)
+
+                except Exception:
+                    continue
+
+                result[name] = value
+
+        response = 'result', result
+
+    except MemoryError:
+        response = 'error', MemoryLimitError(memory)
+
+    except (Exception, ResourceLimitError) as ex:
+        response = 'error', ex
+
+    try:
+        connection.send(response)
+
+    except Exception:  # error not picklable
+        connection.send(('error', RuntimeError(repr(response[1]))))
+
+    connection.close()
+
+
+def safe_exec_process(
+        source, _globals=None, lines=None, timeout=None, memory=None
+):
+    """Do a safe python execution in a child process.
+
+    The child process is killed after timeout seconds, even during a long
+    call of a C function.
+
+    :param str source: source to execute.
+    :param dict _globals: picklable global objects by name.
+    :param int lines: maximal number of executed lines.
+    :param float timeout: maximal duration in seconds.
+    :param int memory: maximal size in bytes of the child process virtual
+        memory (requires the module resource).
+    :return: picklable objects defined by the execution by name.
+    :rtype: dict
+    :raises LineLimitError: if more than lines lines are executed.
+    :raises TimeLimitError: if the execution lasts more than timeout.
+    :raises MemoryLimitError: if the execution allocates too much memory.
+    :raises ResourceLimitError: if the child process stopped without result.
+
+    :Example:
+
+    >>> safe_exec_process('a = sum(range(10))', timeout=1, memory=1 << 28)
+    {'a': 45}
+    """
+
+    from multiprocessing import Pipe, Process
+
+    if memory is not None and resource is None:
+        raise ValueError('Memory limit requires the module resource.')
+
+    reader, writer = Pipe(False)
+
+    process = Process(
+        target=_safe_exec_child,
+        args=(writer, source, _globals, lines, memory)
+    )
+    process.daemon = True
+
+    start = default_timer()
+    process.start()
+    writer.close()
+
+    try:
+        if not reader.poll(timeout):
+            raise TimeLimitError(timeout, default_timer() - start)
+
+        try:
+            status, result = reader.recv()
+
+        except EOFError:
+            process.join()
+            raise ResourceLimitError(
+                None, message='Child process stopped with exit code {0}'
+                .format(process.exitcode)
+            )
+
+    finally:
+        reader.close()
+
+        if process.is_alive():
+            process.terminate()
+
+        process.join()
+
+    if status == 'error':
+        raise result
+
+    return result
+
+
+class UnsafeSourceError(SyntaxError):
+    """Raised by safe_compile on a source which uses forbidden syntax."""
+
+
+def _astnodes(*names):
+    """Get AST node types by name which exist in the current python version.
+    """
+
+    with catch_warnings():  # deprecated node types such as Num
+        simplefilter('ignore', DeprecationWarning)
+
+        result = frozenset(
+            getattr(ast, name) for name in names if hasattr(ast, name)
+        )
+
+    return result
+
+
+#: AST node types allowed by safe_compile.
+SAFE_NODES = _astnodes(
+    'Expression', 'BoolOp', 'And', 'Or', 'BinOp', 'Add', 'Sub', 'Mult',
+    'MatMult', 'Div', 'FloorDiv', 'Mod', 'Pow', 'LShift', 'RShift',
+    'BitOr', 'BitXor', 'BitAnd', 'UnaryOp', 'Not', 'Invert', 'UAdd',
+    'USub', 'Compare', 'Eq', 'NotEq', 'Lt', 'LtE', 'Gt', 'GtE', 'Is',
+    'IsNot', 'In', 'NotIn', 'IfExp', 'Call', 'keyword', 'Starred',
+    'Attribute', 'Subscript', 'Index', 'Slice', 'ExtSlice', 'Name',
+    'Load', 'Store', 'Constant', 'Num', 'Str', 'Bytes', 'NameConstant',
+    'JoinedStr', 'FormattedValue', 'Tuple', 'List', 'Dict', 'Set',
+    'ListComp', 'SetComp', 'DictComp', 'GeneratorExp', 'comprehension'
+)
+
+#: maximal number of code objects cached by safe_compile and safe_eval.
+SAFE_CODES_SIZE = 1024
+
+#: code objects by (source, mode, allowed node types or None).
+_SAFE_CODES = OrderedDict()
+_SAFE_CODES_LOCK = Lock()
+
+
+def _validate(tree, nodes):
+    """Check that an AST uses only allowed node types, public names and no
+    string formatting method (a template such as '{0.__class__}' reads
+    private attributes).
+
+    :raises UnsafeSourceError: on a forbidden node, a private name or a
+        string formatting method."""
+
+    for node in ast.walk(tree):
+
+        if type(node) not in nodes:
+            raise UnsafeSourceError(
+                'Forbidden syntax {0}'.format(type(node).__name__)
+            )
+
+        if isinstance(node, ast.Attribute) and (
+                node.attr.startswith('_') or node.attr in _FORMAT_METHODS
+        ):
+            raise UnsafeSourceError(
+                'Forbidden attribute {0}'.format(node.attr)
+            )
+
+        if isinstance(node, ast.Name) and node.id.startswith('__'):
+            raise UnsafeSourceError('Forbidden name {0}'.format(node.id))
+
+
+def _compile(source, mode, validate, nodes=SAFE_NODES):
+    """Compile a source with the bounded code cache."""
+
+    key = source, mode, frozenset(nodes) if validate else None
+
+    with _SAFE_CODES_LOCK:
+        result = _SAFE_CODES.pop(key, None)
+
+        if result is not None:
+            _SAFE_CODES[key] = result
+
+    if result is None:
+        if validate:
+            tree = ast.parse(source, _VALIDATED, mode)
+            _validate(tree, nodes)
+            result = compile(tree, _VALIDATED, mode)
+
+        else:
+            result = compile(source, '<string>', mode)
+
+        with _SAFE_CODES_LOCK:
+            _SAFE_CODES[key] = result
+
+            while len(_SAFE_CODES) > SAFE_CODES_SIZE:
+                _SAFE_CODES.popitem(last=False)
+
+    return result
+
+
+def safe_compile(source, nodes=None):
+    """Compile an expression once for safe_eval.
+
+    The expression is parsed and validated against an allow-list of AST node
+    types without lambdas, assignments, private names (starting with '_'
+    for attributes and '__' for names) and string formatting methods (format
+    and format_map). Code objects are saved in a bounded
+    cache of SAFE_CODES_SIZE entries by source and allowed node types.
+
+    Validated code objects are evaluated without INTROSPECTION_BUILTINS,
+    unless a sandbox is given.
+
+    :param str source: expression to compile.
+    :param set nodes: allowed AST node types. Default is SAFE_NODES.
+    :return: code object to evaluate with safe_eval.
+    :raises UnsafeSourceError: if source uses forbidden syntax.
+    :raises SyntaxError: if source is not an expression.
+
+    :Example:
+
+    >>> rule = safe_compile('price * quantity > limit')
+    >>> safe_eval(rule, {'price': 2, 'quantity': 3, 'limit': 5})
+    True
+    """
+
+    if nodes is None:
+        nodes = SAFE_NODES
+
+    return _compile(source, 'eval', True, nodes)
+
+
+def _safe_eval_records(source, records, _globals, nodes, sandbox):
+    """Evaluate a safe expression on records.
+
+    :return: generator of (result, error)."""
+
+    code = safe_compile(source, nodes)
+
+    if sandbox is None:
+        sandbox = _defaultsandbox(code)
+
+    namespace, _ = sandbox.namespaces(_globals, copy=True)
+
+    for record in records:
+        try:
+            result = eval(code, namespace, record)
+
+        except Exception as ex:
+            yield None, ex
+
+        else:
+            yield result, None
+
+
+def _safe_eval_chunk(args):
+    """Evaluate a safe expression on a chunk of records in a worker process.
+
+    :param tuple args: source, records, globals, allowed node types and
+        sandbox.
+    :return: list of (result, error)."""
+
+    return list(_safe_eval_records(*args))
+
+
+def safe_eval_many(
+        source, records, _globals=None, processes=None, chunksize=1000,
+        nodes=None, sandbox=None
+):
+    """Evaluate a safe expression on several records.
+
+    The expression is compiled once with safe_compile, and evaluated with each
+    record as locals. Errors raised by a record evaluation do not stop the
+    evaluation of next records.
+
+    :param str source: expression to evaluate.
+    :param records: iterable of mappings of local objects by name.
+    :param dict _globals: global objects by name shared by all records.
+    :param int processes: if given, number of processes which evaluate chunks
+        of records. Records, globals, results and errors must be picklable.
+    :param int chunksize: number of records per process task.
+    :param set nodes: allowed AST node types (see safe_compile).
+    :param Sandbox sandbox: sandbox to use. Default is getsandbox() without
+        INTROSPECTION_BUILTINS.
+    :return: generator of (result, error) in records order, where error is
+        None if the evaluation succeeded.
+    :raises UnsafeSourceError: if source uses forbidden syntax.
+
+    :Example:
+
+    >>> records = [{'price': 2, 'quantity': 3}, {'price': 2}]
+    >>> list(safe_eval_many('price * quantity', records))
+    [(6, None), (None, NameError("name 'quantity' is not defined"))]
+    """
+
+    safe_compile(source, nodes)  # raise syntax errors before to iterate
+
+    if processes:
+        result = _safe_eval_pool(
+            source, records, _globals, processes, chunksize, nodes, sandbox
+        )
+
+    else:
+        result = _safe_eval_records(source, records, _globals, nodes, sandbox)
+
+    return result
+
+
+def _safe_eval_pool(
+        source, records, _globals, processes, chunksize, nodes, sandbox
+):
+    """Evaluate a safe expression on chunks of records in a process pool.
+
+    :return: generator of (result, error)."""
+
+    from multiprocessing import Pool
+
+    records = iter(records)
+
+    chunks = iter(lambda: list(islice(records, chunksize)), [])
+
+    pool = Pool(processes)
+
+    try:
+        for results in pool.imap(
+                _safe_eval_chunk,
+                (
+                    (source, chunk, _globals, nodes, sandbox)
+                    for chunk in chunks
+                )
+        ):
+            for result in results:
+                yield result
+
+    finally:
+        pool.terminate()
+
+
+def safe_eval_columns(
+        source, columns, _globals=None, nodes=None, sandbox=None
+):
+    """Evaluate a safe expression on columns of records.
+
+    If numpy is available, the expression is evaluated once on columns
+    converted to arrays, where integer columns are arrays of python integers
+    which do not overflow. If numpy is not available or if this evaluation
+    fails with an arithmetic error (such as a division by zero, floating
+    point errors are raised) or with an array ambiguity (for example with
+    boolean operators on arrays), the expression is evaluated on each record
+    with safe_eval_many in order to get errors by record.
+
+    :param str source: expression to evaluate.
+    :param dict columns: sequences of values by name. All sequences have the
+        same length.
+    :param dict _globals: global objects by name.
+    :param set nodes: allowed AST node types (see safe_compile).
+    :param Sandbox sandbox: sandbox to use. Default is getsandbox() without
+        INTROSPECTION_BUILTINS.
+    :return: results (numpy array if numpy is available, otherwise list) and
+        errors by record index.
+    :rtype: tuple
+    :raises UnsafeSourceError: if source uses forbidden syntax.
+    :raises Exception: other errors of the evaluation on numpy arrays (such
+        as a NameError).
+
+    :Example:
+
+    >>> result, errors = safe_eval_columns(
+    ...     'price * quantity', {'price': [1, 2], 'quantity': [3, 4]}
+    ... )
+    >>> list(result), errors
+    ([3, 8], {})
+    """
+
+    code = safe_compile(source, nodes)
+
+    try:
+        import numpy
+
+    except ImportError:
+        numpy = None
+
+    length = len(next(iter(columns.values()))) if columns else 0
+
+    result = None
+    errors = {}
+
+    if sandbox is None:
+        sandbox = _defaultsandbox(code)
+
+    if numpy is not None:
+        namespace, _ = sandbox.namespaces(_globals, copy=True)
+
+        arrays = {}
+
+        for name, column in columns.items():
+            array = numpy.asarray(column)
+
+            if array.dtype.kind in 'iu':  # int64 overflows silently
+                array = array.astype(object)
+
+            arrays[name] = array
+
+        try:
+            with numpy.errstate(all='raise'):
+                value = eval(code, namespace, arrays)
+
+        except ArithmeticError:
+            pass  # such as a division by zero, evaluated by record
+
+        except (ValueError, TypeError):
+            pass  # such as the truth value of an array
+
+        else:
+            if numpy.shape(value) == (length,):
+                result = numpy.asarray(value)
+
+    if result is None:
+        names = list(columns)
+
+        records = (
+            dict(zip(names, values))
+            for values in zip(*[columns[name] for name in names])
+        )
+
+        result = []
+
+        for index, (value, error) in enumerate(
+                safe_eval_many(
+                    source, records, _globals, nodes=nodes, sandbox=sandbox
+                )
+        ):
+            result.append(value)
+
+            if error is not None:
+                errors[index] = error
+
+        if numpy is not None:
+            array = numpy.empty(len(result), dtype=object)
+            array[:] = result
+            result = array
+
+    return result, errors
+
+
+STORE_GLOBAL = opmap['STORE_GLOBAL']
+DELETE_GLOBAL = opmap['DELETE_GLOBAL']
+LOAD_GLOBAL = opmap['LOAD_GLOBAL']
+LOAD_CONST = opmap['LOAD_CONST']
+LOAD_ATTR = opmap['LOAD_ATTR']
+BUILD_TUPLE = opmap['BUILD_TUPLE']
+JUMP_FORWARD = opmap['JUMP_FORWARD']
+NOP = opmap['NOP']
+PUSH_NULL = opmap.get('PUSH_NULL')  #: python >= 3.11.
+LOAD_METHOD = opmap.get('LOAD_METHOD')  #: python 3.7 to 3.11.
+CALL_METHOD = opmap.get('CALL_METHOD')  #: python 3.7 to 3.10.
+CALL_FUNCTION = opmap.get('CALL_FUNCTION')  #: python < 3.11.
+
+#: instructions are two bytes long (python >= 3.6).
+WORDCODE = version_info >= (3, 6)
+#: jump arguments are counted in instructions instead of bytes (python >=
+#: 3.10).
+_JUMP_UNIT = 2 if version_info >= (3, 10) else 1
+#: the lowest bit of LOAD_GLOBAL argument pushes NULL (python >= 3.11).
+_GLOBAL_NULL = version_info >= (3, 11)
+#: NULL is pushed after the global instead of before (python >= 3.13).
+_NULL_AFTER = version_info >= (3, 13)
+#: the lowest bit of LOAD_ATTR argument loads a method (python >= 3.12).
+_ATTR_METHOD = version_info >= (3, 12)
+
+_JUMPS = set(hasjrel + hasjabs)
+
+#: dotted attribute paths which are commonly rebound and never folded.
+MUTABLE_ATTRIBUTES = (
+    'sys.stdin', 'sys.stdout', 'sys.stderr', 'sys.argv', 'sys.path',
+    'sys.modules', 'sys.meta_path', 'sys.path_hooks', 'os.environ'
+)
+
+WRAPPER_ASSIGNMENTS = (
+    '__doc__', '__annotations__', '__dict__', '__module__', '__kwdefaults__',
+    '__qualname__'
+)
+
+
+def _cachesize(opcode):
+    """Get the number of inline cache entries of an opcode (python >= 3.11).
+    """
+
+    if _inline_cache_entries is None:
+        result = 0
+
+    elif isinstance(_inline_cache_entries, dict):  # python >= 3.13
+        result = _inline_cache_entries.get(opname[opcode], 0)
+
+    else:
+        result = _inline_cache_entries[opcode]
+
+    return result
+
+
+class _Instruction(object):
+    """Bytecode instruction with its EXTENDED_ARG prefixes and inline cache
+    entries."""
+
+    __slots__ = (
+        'offset', 'size', 'opcode', 'arg', 'extended', 'target', 'ops'
+    )
+
+    def __init__(self, offset, size, opcode, arg, extended, target):
+
+        super(_Instruction, self).__init__()
+
+        self.offset = offset  #: offset of the first byte.
+        self.size = size  #: number of bytes.
+        self.opcode = opcode
+        self.arg = arg
+        self.extended = extended  #: True if prefixed by EXTENDED_ARG.
+        self.target = target  #: True if a jump or an exception targets it.
+        self.ops = None  #: list of new (opcode, arg) or None if unchanged.
+
+    def current(self):
+        """Get current (opcode, arg) instructions."""
+
+        return [(self.opcode, self.arg)] if self.ops is None else self.ops
+
+    def replace(self, ops):
+        """Replace this instruction with new instructions."""
+
+        self.ops = ops
+
+
+def _labels(code):
+    """Get offsets targeted by jumps and exception handlers."""
+
+    result = set(findlabels(code.co_code))
+
+    if _parse_exception_table is not None:  # python >= 3.11
+        result.update(entry.target for entry in _parse_exception_table(code))
+
+    return result
+
+
+def _instructions(code):
+    """Decode instructions of a code object.
+
+    :rtype: list"""
+
+    result = []
+
+    codestr = bytearray(code.co_code)
+    labels = _labels(code)
+
+    offset = index = extended_arg = 0
+    codelen = len(codestr)
+
+    while index < codelen:
+        opcode = codestr[index]
+
+        if WORDCODE:
+            arg = codestr[index + 1] | extended_arg
+            index += 2
+
+        elif opcode >= HAVE_ARGUMENT:
+            arg = codestr[index + 1] | (codestr[index + 2] << 8) | extended_arg
+            index += 3
+
+        else:
+            arg = None
+            index += 1
+
+        if opcode == EXTENDED_ARG:
+            extended_arg = arg << (8 if WORDCODE else 16)
+            continue
+
+        extended_arg = 0
+        index += 2 * _cachesize(opcode)
+
+        result.append(
+            _Instruction(
+                offset, index - offset, opcode, arg,
+                index - offset > (2 if WORDCODE else 3) * (
+                    1 + _cachesize(opcode)
+                ),
+                any(offset <= label < index for label in labels)
+            )
+        )
+
+        offset = index
+
+    return result
+
+
+def _encode(ops):
+    """Encode instructions.
+
+    :param list ops: (opcode, arg) to encode.
+    :return: bytes as integers.
+    :rtype: list"""
+
+    result = []
+
+    for opcode, arg in ops:
+
+        if WORDCODE:
+            for shift in (24, 16, 8):
+                if arg >> shift:
+                    result += [EXTENDED_ARG, (arg >> shift) & 0xFF]
+
+            result += [opcode, (arg or 0) & 0xFF]
+            result += [0, 0] * _cachesize(opcode)
+
+        elif opcode >= HAVE_ARGUMENT:
+            if arg >> 16:
+                result += [EXTENDED_ARG, (arg >> 16) & 0xFF, arg >> 24]
+
+            result += [opcode, arg & 0xFF, (arg >> 8) & 0xFF]
+
+        else:
+            result.append(opcode)
+
+    return result
+
+
+def _backward(opcode):
+    """True if a relative jump goes backward (python >= 3.11)."""
+
+    return 'JUMP_BACKWARD' in opname[opcode]
+
+
+def _jumptarget(instruction):
+    """Get the offset targeted by a jump instruction."""
+
+    arg = instruction.arg * _JUMP_UNIT
+
+    if instruction.opcode in hasjabs:
+        result = arg
+
+    else:
+        if _backward(instruction.opcode):
+            arg = -arg
+
+        result = instruction.offset + instruction.size + arg
+
+    return result
+
+
+def _jumparg(opcode, target, end):
+    """Get the argument of a jump instruction which ends at the offset end."""
+
+    if opcode in hasjabs:
+        result = target
+
+    else:
+        result = end - target if _backward(opcode) else target - end
+
+    return result // _JUMP_UNIT
+
+
+def _assemble(code, instructions):
+    """Encode instructions of a code object.
+
+    Replaced instructions are encoded without padding and jump arguments are
+    updated with new offsets. Jumps keep at least their size with EXTENDED_ARG
+    prefixes, and are extended while their new arguments need more prefixes
+    (replacements such as a LOAD_CONST with an EXTENDED_ARG prefix can be
+    longer than replaced instructions).
+
+    :return: bytes as integers, and new offsets by old offset (of each byte
+        and of the code end).
+    :rtype: tuple"""
+
+    codestr = bytearray(code.co_code)
+
+    sizes = dict(
+        (
+            instruction,
+            instruction.size if instruction.ops is None else
+            len(_encode(instruction.ops))
+        ) for instruction in instructions
+    )
+
+    jumps = [
+        instruction for instruction in instructions
+        if instruction.ops is None and instruction.opcode in _JUMPS
+    ]
+
+    while True:  # until jump sizes are stable
+        offsets = {}
+        offset = 0
+
+        for instruction in instructions:
+            start = instruction.offset
+
+            for old in range(start, start + instruction.size):
+                offsets[old] = offset
+
+            offset += sizes[instruction]
+
+        offsets[len(codestr)] = offset
+
+        extended = False
+
+        for instruction in jumps:
+            size = len(_encode([(instruction.opcode, _jumparg(
+                instruction.opcode, offsets[_jumptarget(instruction)],
+                offsets[instruction.offset] + sizes[instruction]
+            ))]))
+
+            if size > sizes[instruction]:
+                sizes[instruction] = size
+                extended = True
+
+        if not extended:
+            break
+
+    result = []
+
+    prefix = [EXTENDED_ARG, 0] if WORDCODE else [EXTENDED_ARG, 0, 0]
+
+    for instruction in instructions:
+        start = instruction.offset
+
+        if instruction.ops is not None:
+            result += _encode(instruction.ops)
+
+        elif instruction.opcode in _JUMPS:
+            opcode = instruction.opcode
+            arg = _jumparg(
+                opcode, offsets[_jumptarget(instruction)],
+                offsets[start] + sizes[instruction]
+            )
+            ops = _encode([(opcode, arg)])
+            result += prefix * (
+                (sizes[instruction] - len(ops)) // len(prefix)
+            ) + ops
+
+        else:
+            result += codestr[start: start + instruction.size]
+
+    return result, offsets
+
+
+def _lnotab(code, offsets):
+    """Get the co_lnotab of assembled instructions (python < 3.10).
+
+    :rtype: bytes"""
+
+    result = []
+
+    maxline = 127 if WORDCODE else 255  # line increments are signed
+
+    prevoffset, prevline = 0, code.co_firstlineno
+
+    for offset, line in findlinestarts(code):
+        offset = offsets[offset]
+        doffset, dline = offset - prevoffset, line - prevline
+        prevoffset, prevline = offset, line
+
+        while doffset > 255:
+            result += [255, 0]
+            doffset -= 255
+
+        while dline > maxline:
+            result += [doffset, maxline]
+            doffset = 0
+            dline -= maxline
+
+        while dline < -128:
+            result += [doffset, 0x80]
+            doffset = 0
+            dline += 128
+
+        if doffset or dline:
+            result += [doffset, dline & 0xFF]
+
+    return bytes(bytearray(result))
+
+
+def _linetable(code, offsets):
+    """Get the co_linetable of assembled instructions (python 3.10).
+
+    :rtype: bytes"""
+
+    result = []
+
+    prevline = code.co_firstlineno
+
+    for start, end, line in code.co_lines():
+        size = offsets[end] - offsets[start]
+
+        if not size:
+            continue
+
+        if line is None:
+            dline = -128
+
+        else:
+            dline = line - prevline
+            prevline = line
+
+            while dline > 127:
+                result += [0, 127]
+                dline -= 127
+
+            while dline < -127:
+                result += [0, -127 & 0xFF]
+                dline += 127
+
+        while size > 254:
+            result += [254, dline & 0xFF]
+            dline = -128 if line is None else 0
+            size -= 254
+
+        result += [size, dline & 0xFF]
+
+    return bytes(bytearray(result))
+
+
+def _locationint(value, signed=False):
+    """Encode an integer of a location table (python >= 3.11).
+
+    :rtype: list"""
+
+    if signed:
+        value = (-value << 1) | 1 if value < 0 else value << 1
+
+    result = []
+
+    while value >= 64:
+        result.append(64 | (value & 63))
+        value >>= 6
+
+    result.append(value)
+
+    return result
+
+
+def _locationtable(code, offsets):
+    """Get the co_linetable of assembled instructions (python >= 3.11).
+
+    :rtype: bytes"""
+
+    result = []
+
+    runs = []  # [start, end, position] of code units with a same position
+
+    for index, position in enumerate(code.co_positions()):
+        if runs and runs[-1][2] == position:
+            runs[-1][1] += 2
+
+        else:
+            runs.append([2 * index, 2 * index + 2, position])
+
+    prevline = code.co_firstlineno
+
+    for start, end, position in runs:
+        line, endline, column, endcolumn = position
+
+        units = (offsets[end] - offsets[start]) // 2
+
+        while units:
+            length = min(units, 8)
+            units -= length
+
+            if line is None:  # no location
+                result.append(0x80 | (15 << 3) | (length - 1))
+
+            elif column is None or endcolumn is None:  # no column
+                result.append(0x80 | (13 << 3) | (length - 1))
+                result += _locationint(line - prevline, True)
+                prevline = line
+
+            else:  # long form
+                result.append(0x80 | (14 << 3) | (length - 1))
+                result += _locationint(line - prevline, True)
+                result += _locationint((endline or line) - line)
+                result += _locationint(column + 1)
+                result += _locationint(endcolumn + 1)
+                prevline = line
+
+    return bytes(bytearray(result))
+
+
+def _exceptiontable(code, offsets):
+    """Get the co_exceptiontable of assembled instructions (python >= 3.11).
+
+    :rtype: bytes"""
+
+    result = []
+
+    for entry in _parse_exception_table(code):
+        start, end = offsets[entry.start], offsets[entry.end]
+
+        if start < end:  # the protected instructions still exist
+            values = (
+                start // 2, (end - start) // 2, offsets[entry.target] // 2,
+                (entry.depth << 1) | entry.lasti
+            )
+
+            for index, value in enumerate(values):
+                chunks = []
+
+                while True:
+                    chunks.insert(0, value & 63)
+                    value >>= 6
+
+                    if not value:
+                        break
+
+                chunks = [chunk | 64 for chunk in chunks[:-1]] + chunks[-1:]
+
+                if not index:  # entry start
+                    chunks[0] |= 128
+
+                result += chunks
+
+    return bytes(bytearray(result))
+
+
+def _constindex(consts, value):
+    """Get the index of a value in constants, added if missing."""
+
+    for result, const in enumerate(consts):
+        if const is value:
+            break
+
+    else:
+        result = len(consts)
+        consts.append(value)
+
+    return result
+
+
+def _mutated(code):
+    """Get names of globals stored or deleted by a code object and its nested
+    code objects.
+
+    :rtype: set"""
+
+    result = set()
+
+    for instruction in _instructions(code):
+        if instruction.opcode in (STORE_GLOBAL, DELETE_GLOBAL):
+            result.add(code.co_names[instruction.arg])
+
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            result |= _mutated(const)
+
+    return result
+
+
+def _methodcall(instructions, index):
+    """Get the CALL_METHOD instruction which calls the method loaded by a
+    LOAD_METHOD instruction (python 3.7 to 3.10).
+
+    :param list instructions: code instructions.
+    :param int index: index of the LOAD_METHOD instruction.
+    :return: CALL_METHOD instruction, or None if it is not found in a
+        sequence without jumps."""
+
+    result = None
+
+    depth = 2  # method and self, or NULL and callable
+
+    for instruction in islice(instructions, index + 1, None):
+        opcode = instruction.opcode
+
+        if instruction.target or opcode in _JUMPS:
+            break
+
+        if opcode == CALL_METHOD and depth == instruction.arg + 2:
+            result = instruction
+            break
+
+        depth += stack_effect(
+            opcode, instruction.arg if opcode >= HAVE_ARGUMENT else None
+        )
+
+        if depth < 2:
+            break
+
+    return result
+
+
+def _bindcode(code, env, stoplist, verbose=None, bound=None, report=None):
+    """Change LOAD_GLOBAL statements of a code object and of its nested code
+    objects (inner functions, lambdas, comprehensions, etc.) to LOAD_CONST
+    statements.
+
+    Replaced instructions are not padded, therefore jumps, line numbers and
+    exception tables are updated with new offsets. An instruction is left
+    unchanged if its name is in the stoplist. Replacements can be longer than
+    replaced instructions (such as a LOAD_CONST which needs an EXTENDED_ARG
+    prefix in place of a LOAD_GLOBAL without prefix).
+
+    :param code: code object to transform.
+    :param dict env: values by global name.
+    :param dict stoplist: reasons to not transform by global name.
+    :param function verbose: logger function which takes in parameter a message
+    :param dict bound: if given, filled with values by transformed global
+        name and by folded attribute chain of globals (such as 'os.getcwd').
+    :param dict report: if given, filled with transformed global names (one
+        per instruction), final folded attribute chains, numbers of folded
+        attribute lookups and tuples, and skip reasons by global name.
+    :return: new code object, or code if nothing has been transformed."""
+
+    result = code
+
+    instructions = _instructions(code)
+    newconsts = list(code.co_consts)
+    names = code.co_names
+
+    changed = False
+
+    # Nested code objects are transformed first
+    for index, const in enumerate(newconsts):
+        if isinstance(const, CodeType):
+            newconst = _bindcode(
+                const, env, stoplist, verbose, bound, report
+            )
+            if newconst is not const:
+                newconsts[index] = newconst
+                changed = True
+
+    paths = {}  # folded global or attribute chain by instruction
+
+    # First pass converts global lookups into constants
+    for instruction in instructions:
+        if instruction.opcode == LOAD_GLOBAL:
+            oparg = instruction.arg
+            pushnull = False
+            if _GLOBAL_NULL:
+                pushnull = oparg & 1
+                oparg >>= 1
+            name = names[oparg]
+            reason = None
+            if name in stoplist:
+                reason = stoplist[name]
+            elif name not in env:
+                reason = 'undefined'  # resolved dynamically
+            else:
+                value = env[name]
+                ops = [(LOAD_CONST, _constindex(newconsts, value))]
+                if pushnull:
+                    ops.insert(1 if _NULL_AFTER else 0, (PUSH_NULL, 0))
+                instruction.replace(ops)
+                changed = True
+                paths[instruction] = name
+                if bound is not None:
+                    bound[name] = value
+                if report is not None:
+                    report['globals'].append(name)
+                if verbose is not None:
+                    verbose("{0} --> {1}".format(name, value))
+            if reason is not None and report is not None:
+                report['skipped'].setdefault(name, reason)
+
+    # Second pass folds tuples of constants and constant attribute lookups
+    consts = []  # consecutive LOAD_CONST instructions
+    chains = []  # folded attribute lookups
+    for index, instruction in enumerate(instructions):
+
+        if instruction.target:  # do not fold a jump target with previous
+            consts = []
+
+        ops = instruction.current()
+
+        if not ops or ops[0][0] == NOP:
+            continue
+
+        opcode, oparg = ops[-1]
+
+        if opcode == LOAD_CONST:
+            if len(ops) > 1:  # such as PUSH_NULL, LOAD_CONST
+                consts = []
+            consts.append(instruction)
+            continue
+
+        if len(ops) > 1:
+            consts = []
+            continue
+
+        folded = []
+        ops = [(LOAD_CONST, len(newconsts))]
+        method = call = None
+        if opcode in (LOAD_ATTR, LOAD_METHOD) and consts:
+            method = opcode == LOAD_METHOD
+            if _ATTR_METHOD:
+                method = oparg & 1  # method load
+                oparg >>= 1
+            obj = newconsts[consts[-1].current()[-1][1]]
+            name = names[oparg]
+            path = '{0}.{1}'.format(paths.get(consts[-1], repr(obj)), name)
+            reason = stoplist.get(path)
+            if reason is None and isinstance(obj, ModuleType):
+                reason = stoplist.get('{0}.{1}'.format(obj.__name__, name))
+            if reason is not None:
+                if report is not None:
+                    report['skipped'].setdefault(path, reason)
+            elif method and not isinstance(obj, (ModuleType, type)):
+                pass  # only methods of modules and classes are stable
+            elif method and not _GLOBAL_NULL and (
+                    _methodcall(instructions, index) is None
+            ):
+                pass  # CALL_METHOD is not found
+            else:
+                try:
+                    value = getattr(obj, name)
+                except AttributeError:
+                    pass
+                else:
+                    folded = consts[-1:]
+                    paths[instruction] = path
+                    if bound is not None and consts[-1] in paths:
+                        bound[path] = value
+                    if method and _GLOBAL_NULL:
+                        ops.insert(1 if _NULL_AFTER else 0, (PUSH_NULL, 0))
+                    elif method:  # LOAD_METHOD can not push NULL
+                        call = _methodcall(instructions, index)
+
+        elif opcode == BUILD_TUPLE and 0 < oparg <= len(consts):
+            folded = consts[-oparg:]
+            value = tuple(
+                newconsts[const.current()[-1][1]] for const in folded
+            )
+
+        if folded:
+            instruction.replace(ops)
+            newconsts.append(value)
+            for const in folded:  # keep instructions such as PUSH_NULL
+                const.ops = const.current()[:-1]
+            if call is not None:  # the method is a simple callable
+                call.replace([(CALL_FUNCTION, call.arg)])
+            if method:  # a loaded method is not folded again
+                consts = []
+            else:
+                consts = consts[:-len(folded)] + [instruction]
+            changed = True
+            if method is not None:
+                chains.append(instruction)
+            if report is not None:
+                key = 'tuples' if method is None else 'attributelookups'
+                report[key] += 1
+            if verbose is not None:
+                verbose("new folded constant:{0}".format(value))
+
+        else:
+            consts = []
+
+    if report is not None:  # chains which are not folded in longer chains
+        report['attributes'] += [
+            paths[instruction] for instruction in chains
+            if LOAD_CONST in [op for op, _ in instruction.current()]
+        ]
+
+    if changed:
+        codestr, offsets = _assemble(code, instructions)
+
+        if _parse_exception_table is not None:  # python >= 3.11
+            linetable = _locationtable(code, offsets)
+            exceptiontable = _exceptiontable(code, offsets)
+
+        else:
+            exceptiontable = None
+
+            if hasattr(code, 'co_lines'):  # python 3.10
+                linetable = _linetable(code, offsets)
+
+            else:
+                linetable = _lnotab(code, offsets)
+
+        result = getcodeobj(
+            newconsts, codestr, code, code, linetable, exceptiontable
+        )
+
+    return result
+
+
+def _make_constants(
+        func, builtin_only=False, stoplist=None, verbose=None, bound=None,
+        report=None
+):
+    """Generate new function where code is an input function code with all
+    LOAD_GLOBAL statements changed to LOAD_CONST statements, including in
+    nested code objects.
+
+    Instructions are rewritten without padding, and jump offsets, line
+    numbers and exception tables are updated. Sequences which are targeted by
+    a jump are not folded. Globals stored or deleted by the function are not
+    transformed.
+
+    :param function func: code function to transform.
+    :param bool builtin_only: only transform builtin objects.
+    :param list stoplist: attribute names to not transform.
+    :param function verbose: logger function which takes in parameter a message
+    :param dict bound: if given, filled with transformed global names and
+        values.
+    :param dict report: if given, filled like in _bindcode.
+
+    .. warning::
+        Be sure global attributes to transform are not resolved dynamically."""
+
+    result = func
+
+    if stoplist is None:
+        stoplist = []
+
+    try:
+        fcode = func.__code__
+    except AttributeError:
+        return func        # Jython doesn't have a __code__ attribute.
+
+    reasons = dict.fromkeys(MUTABLE_ATTRIBUTES, 'mutable')
+    reasons.update(dict.fromkeys(stoplist, 'stoplist'))
+    reasons.update(dict.fromkeys(_mutated(fcode), 'stored'))
+    stoplist = reasons  # reasons to not transform by name
+
+    env = vars(builtins).copy()
+    if builtin_only:
+        for name in func.__globals__:
+            stoplist.setdefault(name, 'builtin_only')
+    else:
+        env.update(func.__globals__)
+
+    codeobj = _bindcode(fcode, env, stoplist, verbose, bound, report)
+
+    if codeobj is not fcode:
+
+        result = type(func)(
+            codeobj,
+            func.__globals__, func.__name__, func.__defaults__, func.__closure__
+        )
+
+        # set func attributes to result
+        for prop in WRAPPER_ASSIGNMENTS:
+            try:
+                attr = getattr(func, prop)
+            except AttributeError:
+                pass
+            else:
+                setattr(result, prop, attr)
+
+    return result
+
+
+def getcodeobj(
+        consts, intcode, newcodeobj, oldcodeobj, linetable=None,
+        exceptiontable=None
+):
+    """Get code object from decompiled code.
+
+    :param list consts: constants to add in the result.
+    :param list intcode: list of byte code to use.
+    :param newcodeobj: new code object with empty body.
+    :param oldcodeobj: old code object.
+    :param bytes linetable: line number table (co_lnotab, or co_linetable
+        since python 3.10). Default is the newcodeobj one.
+    :param bytes exceptiontable: exception table (python >= 3.11). Default is
+        the newcodeobj one.
+    :return: new code object to produce."""
+
+    # get code string
+    codestr = bytes(bytearray(intcode))
+
+    if hasattr(newcodeobj, 'replace'):  # python >= 3.8
+        tables = {}
+
+        if linetable is not None:
+            if hasattr(newcodeobj, 'co_linetable'):  # python >= 3.10
+                tables['co_linetable'] = linetable
+
+            else:
+                tables['co_lnotab'] = linetable
+
+        if exceptiontable is not None:
+            tables['co_exceptiontable'] = exceptiontable
+
+        result = newcodeobj.replace(
+            co_code=codestr, co_consts=tuple(consts),
+            co_freevars=oldcodeobj.co_freevars, **tables
+        )
+
+    else:
+        # get vargs
+        vargs = [
+            newcodeobj.co_argcount, newcodeobj.co_nlocals,
+            newcodeobj.co_stacksize, newcodeobj.co_flags, codestr,
+            tuple(consts), newcodeobj.co_names, newcodeobj.co_varnames,
+            newcodeobj.co_filename, newcodeobj.co_name,
+            newcodeobj.co_firstlineno,
+            newcodeobj.co_lnotab if linetable is None else linetable,
+            oldcodeobj.co_freevars, newcodeobj.co_cellvars
+        ]
+        if PY3:
+            vargs.insert(1, newcodeobj.co_kwonlyargcount)
+
+        # instanciate a new newcodeobj object
+        result = type(newcodeobj)(*vargs)
+
+    return result
+
+
+_bindcode = _make_constants(_bindcode)
+_make_constants = _make_constants(_make_constants)  # optimize thyself!
+
+
+#: guard mode which re-optimizes functions when a guarded global changes.
+REOPTIMIZE = 'reoptimize'
+#: guard mode which restores original function code when a guarded global
+#: changes.
+DEOPTIMIZE = 'deoptimize'
+
+_GUARDS = {}  #: guards by watched name by id of namespace.
+_GUARDS_LOCK = Lock()
+_GUARDED_CLASSES = {}  #: guarded module classes by module class.
+
+
+def _resolve(_globals, path):
+    """Get the current value of a global name or of an attribute chain of a
+    global (_MISSING if it does not exist).
 
+    :param dict _globals: function globals.
+    :param str path: global name or dotted attribute chain."""
 
-SINGLETONS_PER_SCOPES = {}
+    names = path.split('.')
 
-def singleton_per_scope(_cls, _scope=None, _renew=False, *args, **kwargs):
-    """Instanciate a singleton per scope."""
+    result = _globals.get(names[0], _MISSING)
+    if result is _MISSING:
+        result = vars(builtins).get(names[0], _MISSING)
 
-    result = None
+    for name in names[1:]:
+        result = getattr(result, name, _MISSING)
 
-    singletons = SINGLETONS_PER_SCOPES.setdefault(_scope, {})
+    return result
 
-    if _renew or _cls not in singletons:
-        singletons[_cls] = _cls(*args, **kwargs)
 
-    result = singletons[_cls]
+class _Guard(object):
+    """Keep an optimized function consistent with the globals it binds.
 
-    return result
+    The guard stamps the values of bound globals and folded attribute chains.
+    When one of them is rebound, the optimized function code is replaced with
+    a re-optimized code or with the original code. The function object is
+    kept, therefore references to it stay valid and calls do not pay any
+    check."""
 
+    __slots__ = (
+        'function', 'original', 'bound', 'builtin_only', 'stoplist',
+        'verbose', 'mode', 'watched', '__weakref__'
+    )
 
-def _safebuiltins():
-    """Construct a safe builtin environment without I/O functions.
+    def __init__(
+            self, function, original, bound, builtin_only, stoplist, verbose,
+            mode
+    ):
+        """
+        :param function function: optimized function.
+        :param function original: original function.
+        :param dict bound: values by bound global name and by folded
+            attribute chain.
+        :param bool builtin_only: builtin_only make_constants parameter.
+        :param list stoplist: stoplist make_constants parameter.
+        :param function verbose: verbose make_constants parameter.
+        :param str mode: REOPTIMIZE or DEOPTIMIZE.
+        """
 
-    :rtype: dict"""
+        super(_Guard, self).__init__()
 
-    result = {}
+        self.function = ref(function)
+        self.original = original
+        self.bound = bound
+        self.builtin_only = builtin_only
+        self.stoplist = stoplist
+        self.verbose = verbose
+        self.mode = mode
+        #: (namespace, name) of bound globals and of chain attributes of
+        #: modules.
+        self.watched = []
 
-    objectnames = [
-        objectname for objectname in dir(builtins)
-        if objectname not in BUILTIN_IO_PROPS
-    ]
+    def changed(self):
+        """Check if a bound global or a folded attribute chain has been
+        rebound since the optimization.
 
-    for objectname in objectnames:
-        result[objectname] = getattr(builtins, objectname)
+        :rtype: bool"""
 
-    return result
+        _globals = self.original.__globals__
 
-SAFE_BUILTINS = {'__builtins__': _safebuiltins()}  #: safe builtins.
+        for path, value in self.bound.items():
+            if _resolve(_globals, path) is not value:
+                return True
 
+        return False
 
-def _safe_processing(nsafefn, source, _globals=None, _locals=None):
-    """Do a safe processing of input fn in using SAFE_BUILTINS.
+    def update(self):
+        """Replace the function code with respect to current globals.
 
-    :param fn: function to call with input parameters.
-    :param source: source object to process with fn.
-    :param dict _globals: global objects by name.
-    :param dict _locals: local objects by name.
-    :return: fn processing result"""
+        :return: False if the function does not exist anymore.
+        :rtype: bool"""
 
-    if _globals is None:
-        _globals = SAFE_BUILTINS
+        _unguard(self)
 
-    else:
-        _globals.update(SAFE_BUILTINS)
+        function = self.function()
 
-    return nsafefn(source, _globals, _locals)
+        result = function is not None
 
+        if result:
+            self.bound = {}
+            code = self.original.__code__
 
-def safe_eval(source, _globals=None, _locals=None):
-    """Process a safe evaluation."""
+            if self.mode == REOPTIMIZE:
+                optimized = _make_constants(
+                    self.original, self.builtin_only, self.stoplist,
+                    self.verbose, self.bound
+                )
+                code = optimized.__code__
 
-    return _safe_processing(eval, source, _globals, _locals)
+            function.__code__ = code
 
+            if self.bound:
+                _guard(self)
 
-def safe_exec(source, _globals=None, _locals=None):
-    """Do a safe python execution."""
+        return result
 
-    return _safe_processing(exec_, source, _globals, _locals)
 
+def _guardedclass(cls):
+    """Get a module class which updates guards of the module globals on
+    setattr and delattr.
 
-STORE_GLOBAL = opmap['STORE_GLOBAL']
-LOAD_GLOBAL = opmap['LOAD_GLOBAL']
-LOAD_CONST = opmap['LOAD_CONST']
-LOAD_ATTR = opmap['LOAD_ATTR']
-BUILD_TUPLE = opmap['BUILD_TUPLE']
-JUMP_FORWARD = opmap['JUMP_FORWARD']
+    :param type cls: module class.
+    :rtype: type"""
 
-WRAPPER_ASSIGNMENTS = ('__doc__', '__annotations__', '__dict__', '__module__')
+    class GuardedModule(cls):
+        """Module class which updates guards of the module globals."""
 
+        __slots__ = ()
 
-def _make_constants(func, builtin_only=False, stoplist=None, verbose=None):
-    """Generate new function where code is an input function code with all
-    LOAD_GLOBAL statements changed to LOAD_CONST statements.
+        def __setattr__(self, name, value):
 
-    :param function func: code function to transform.
-    :param bool builtin_only: only transform builtin objects.
-    :param list stoplist: attribute names to not transform.
-    :param function verbose: logger function which takes in parameter a message
+            super(GuardedModule, self).__setattr__(name, value)
+            _globalchanged(vars(self), name)
 
-    .. warning::
-        Be sure global attributes to transform are not resolved dynamically."""
+        def __delattr__(self, name):
 
-    result = func
+            super(GuardedModule, self).__delattr__(name)
+            _globalchanged(vars(self), name)
 
-    if stoplist is None:
-        stoplist = []
+    GuardedModule.__name__ = str('Guarded{0}'.format(cls.__name__))
 
-    try:
-        fcode = func.__code__
-    except AttributeError:
-        return func        # Jython doesn't have a __code__ attribute.
-    newcode = list(fcode.co_code) if PY3 else [ord(co) for co in fcode.co_code]
-    newconsts = list(fcode.co_consts)
-    names = fcode.co_names
-    codelen = len(newcode)
+    return GuardedModule
 
-    env = vars(builtins).copy()
-    if builtin_only:
-        stoplist = dict.fromkeys(stoplist)
-        stoplist.update(func.__globals__)
-    else:
-        env.update(func.__globals__)
 
-    # First pass converts global lookups into constants
-    changed = False
-    i = 0
-    while i < codelen:
-        opcode = newcode[i]
-        if opcode in (EXTENDED_ARG, STORE_GLOBAL):
-            return func    # for simplicity, only optimize common cases
-        if opcode == LOAD_GLOBAL:
-            oparg = newcode[i + 1] + (newcode[i + 2] << 8)
-            name = fcode.co_names[oparg]
-            if name in env and name not in stoplist:
-                value = env[name]
-                for pos, val in enumerate(newconsts):
-                    if val is value:
-                        break
-                else:
-                    pos = len(newconsts)
-                    newconsts.append(value)
-                newcode[i] = LOAD_CONST
-                newcode[i + 1] = pos & 0xFF
-                newcode[i + 2] = pos >> 8
-                changed = True
-                if verbose is not None:
-                    verbose("{0} --> {1}".format(name, value))
-        i += 1
-        if opcode >= HAVE_ARGUMENT:
-            i += 2
+def _module(namespace):
+    """Get the module of a namespace, or None."""
 
-    # Second pass folds tuples of constants and constant attribute lookups
-    i = 0
-    while i < codelen:
-
-        newtuple = []
-        while newcode[i] == LOAD_CONST:
-            oparg = newcode[i + 1] + (newcode[i + 2] << 8)
-            newtuple.append(newconsts[oparg])
-            i += 3
-
-        opcode = newcode[i]
-        if not newtuple:
-            i += 1
-            if opcode >= HAVE_ARGUMENT:
-                i += 2
-            continue
+    result = modules.get(namespace.get('__name__'))
 
-        if opcode == LOAD_ATTR:
-            obj = newtuple[-1]
-            oparg = newcode[i + 1] + (newcode[i + 2] << 8)
-            name = names[oparg]
-            try:
-                value = getattr(obj, name)
-            except AttributeError:
-                continue
-            deletions = 1
+    if result is not None and vars(result) is not namespace:
+        result = None
 
-        elif opcode == BUILD_TUPLE:
-            oparg = newcode[i + 1] + (newcode[i + 2] << 8)
-            if oparg != len(newtuple):
-                continue
-            deletions = len(newtuple)
-            value = tuple(newtuple)
+    return result
 
-        else:
-            continue
 
-        reljump = deletions * 3
-        newcode[i - reljump] = JUMP_FORWARD
-        newcode[i - reljump + 1] = (reljump - 3) & 0xFF
-        newcode[i - reljump + 2] = (reljump - 3) >> 8
-
-        nclen = len(newconsts)
-        newconsts.append(value)
-        newcode[i] = LOAD_CONST
-        newcode[i + 1] = nclen & 0xFF
-        newcode[i + 2] = nclen >> 8
-        i += 3
-        changed = True
-        if verbose is not None:
-            verbose("new folded constant:{0}".format(value))
+def _watch(namespace):
+    """Detect global rebinding with setattr on the module of a namespace.
 
-    if changed:
+    It uses module __class__ assignment (python >= 3.5). Otherwise, or for
+    globals written directly, checkguards must be called.
 
-        codeobj = getcodeobj(newconsts, newcode, fcode, fcode)
+    :param dict namespace: function globals or module namespace."""
 
-        result = type(func)(
-            codeobj,
-            func.__globals__, func.__name__, func.__defaults__, func.__closure__
-        )
+    module = _module(namespace)
 
-        # set func attributes to result
-        for prop in WRAPPER_ASSIGNMENTS:
-            try:
-                attr = getattr(func, prop)
-            except AttributeError:
+    if module is not None:
+        cls = type(module)
+
+        if cls not in _GUARDED_CLASSES.values():
+            guardedcls = _GUARDED_CLASSES.get(cls)
+
+            if guardedcls is None:
+                guardedcls = _GUARDED_CLASSES[cls] = _guardedclass(cls)
+
+            try:  # bypass guarded __setattr__ of module class subclasses
+                object.__setattr__(module, '__class__', guardedcls)
+
+            except TypeError:  # python < 3.5
                 pass
-            else:
-                setattr(result, prop, attr)
+
+
+def _unwatch(namespace):
+    """Restore the module class of a namespace which is not guarded anymore.
+
+    :param dict namespace: function globals or module namespace."""
+
+    module = _module(namespace)
+
+    if module is not None:
+        for cls, guardedcls in list(_GUARDED_CLASSES.items()):
+            if type(module) is guardedcls:  # bypass guarded __setattr__
+                object.__setattr__(module, '__class__', cls)
+                break
+
+
+def _guard(guard):
+    """Register a guard.
+
+    Bound globals are watched in function globals, and attributes of folded
+    chains are watched in the namespace of their module."""
+
+    _globals = guard.original.__globals__
+
+    watched = guard.watched = []
+
+    for path in guard.bound:
+        names = path.split('.')
+        watched.append((_globals, names[0]))
+
+        owner = _resolve(_globals, names[0])
+
+        for name in names[1:]:
+            if isinstance(owner, ModuleType):
+                watched.append((vars(owner), name))
+
+            owner = getattr(owner, name, _MISSING)
+
+    with _GUARDS_LOCK:
+        for namespace, name in watched:
+            guards = _GUARDS.setdefault(id(namespace), (namespace, {}))[1]
+            guards.setdefault(name, set()).add(guard)
+            _watch(namespace)
+
+
+def _unguard(guard):
+    """Unregister a guard, and restore classes of modules which are not
+    guarded anymore."""
+
+    with _GUARDS_LOCK:
+        for namespace, name in guard.watched:
+            guards = _GUARDS.get(id(namespace), (None, {}))[1]
+            namedguards = guards.get(name)
+
+            if namedguards is not None:
+                namedguards.discard(guard)
+
+                if not namedguards:
+                    del guards[name]
+
+            if not guards and _GUARDS.pop(id(namespace), None) is not None:
+                _unwatch(namespace)
+
+        guard.watched = []
+
+
+def _globalchanged(_globals, name):
+    """Update guards of a rebound global or module attribute.
+
+    :param dict _globals: globals or module namespace where the name has been
+        rebound.
+    :param str name: rebound name."""
+
+    with _GUARDS_LOCK:
+        guards = _GUARDS.get(id(_globals), (None, {}))[1].get(name)
+        guards = list(guards) if guards else []
+
+    for guard in guards:
+        if guard.changed():
+            guard.update()
+
+
+def checkguards():
+    """Update guarded functions where bound globals or folded attribute
+    chains have been rebound.
+
+    Rebinding module attributes with setattr (monkeypatching, mock) updates
+    guarded functions automatically since python 3.5, until unguard is
+    called. This function is
+    required after other rebindings such as direct writes in module globals,
+    builtins rebinding or module reload.
+
+    :return: number of updated functions.
+    :rtype: int"""
+
+    result = 0
+
+    with _GUARDS_LOCK:
+        guards = set()
+        for _, namedguards in _GUARDS.values():
+            for nameguards in namedguards.values():
+                guards.update(nameguards)
+
+    for guard in guards:
+        if guard.changed() and guard.update():
+            result += 1
 
     return result
 
 
-def getcodeobj(consts, intcode, newcodeobj, oldcodeobj):
-    """Get code object from decompiled code.
+def unguard(function=None):
+    """Remove guards of an optimized function, or all guards.
 
-    :param list consts: constants to add in the result.
-    :param list intcode: list of byte code to use.
-    :param newcodeobj: new code object with empty body.
-    :param oldcodeobj: old code object.
-    :return: new code object to produce."""
+    The optimized code is kept, and classes of modules which are not guarded
+    anymore are restored.
 
-    # get code string
-    if PY3:
-        codestr = bytes(intcode)
+    :param function function: optimized function. Default is all guarded
+        functions.
+    :return: number of removed guards.
+    :rtype: int"""
 
-    else:
-        codestr = reduce(lambda x, y: x + y, (chr(b) for b in intcode))
-
-    # get vargs
-    vargs = [
-        newcodeobj.co_argcount, newcodeobj.co_nlocals, newcodeobj.co_stacksize,
-        newcodeobj.co_flags, codestr, tuple(consts), newcodeobj.co_names,
-        newcodeobj.co_varnames, newcodeobj.co_filename, newcodeobj.co_name,
-        newcodeobj.co_firstlineno, newcodeobj.co_lnotab,
-        oldcodeobj.co_freevars, newcodeobj.co_cellvars
-    ]
-    if PY3:
-        vargs.insert(1, newcodeobj.co_kwonlyargcount)
+    with _GUARDS_LOCK:
+        guards = set()
+        for _, namedguards in _GUARDS.values():
+            for nameguards in namedguards.values():
+                guards.update(nameguards)
+
+    result = 0
 
-    # instanciate a new newcodeobj object
-    result = type(newcodeobj)(*vargs)
+    for guard in guards:
+        if function is None or guard.function() is function:
+            _unguard(guard)
+            result += 1
 
     return result
 
 
-_make_constants = _make_constants(_make_constants)  # optimize thyself!
+def _optimize(func, builtin_only, stoplist, verbose, guard):
+    """Apply _make_constants on a function and guard the result.
+
+    :param bool guard: if True or REOPTIMIZE or DEOPTIMIZE, guard bound
+        globals. True means REOPTIMIZE.
+    :return: optimized function."""
+
+    if not guard:
+        result = _make_constants(func, builtin_only, stoplist, verbose)
+
+    else:
+        if guard is True:
+            guard = REOPTIMIZE
+
+        elif guard not in (REOPTIMIZE, DEOPTIMIZE):
+            raise ValueError(
+                'Wrong guard {0}. {1} or {2} expected.'.format(
+                    guard, REOPTIMIZE, DEOPTIMIZE
+                )
+            )
+
+        bound = {}
+        result = _make_constants(func, builtin_only, stoplist, verbose, bound)
+
+        if bound:
+            _guard(
+                _Guard(
+                    result, func, bound, builtin_only, stoplist, verbose, guard
+                )
+            )
+
+    return result
 
 
-def bind_all(morc, builtin_only=False, stoplist=None, verbose=None):
+def bind_all(
+        morc, builtin_only=False, stoplist=None, verbose=None, guard=False
+):
     """Recursively apply constant binding to functions in a module or class.
 
     Use as the last line of the module (after everything is defined, but
@@ -323,12 +2468,18 @@ def bind_all(morc, builtin_only=False, stoplist=None, verbose=None):
     :param bool builtin_only: only transform builtin objects.
     :param list stoplist: attribute names to not transform.
     :param function verbose: logger function which takes in parameter a message
+    :param guard: if True, REOPTIMIZE or DEOPTIMIZE, re-optimize functions
+        or restore their original code when a bound global or a folded
+        attribute chain is rebound (True means REOPTIMIZE). See checkguards.
     """
 
     if stoplist is None:
         stoplist = []
 
-    def _bind_all(morc, builtin_only=False, stoplist=None, verbose=False):
+    def _bind_all(
+            morc, builtin_only=False, stoplist=None, verbose=False,
+            guard=False
+    ):
         """Internal bind all decorator function.
         """
         if stoplist is None:
@@ -337,26 +2488,386 @@ def bind_all(morc, builtin_only=False, stoplist=None, verbose=None):
         if isinstance(morc, (ModuleType, type)):
             for k, val in list(vars(morc).items()):
                 if isinstance(val, FunctionType):
-                    newv = _make_constants(
-                        val, builtin_only, stoplist, verbose
+                    newv = _optimize(
+                        val, builtin_only, stoplist, verbose, guard
                     )
                     setattr(morc, k, newv)
                 elif isinstance(val, type):
-                    _bind_all(val, builtin_only, stoplist, verbose)
+                    _bind_all(val, builtin_only, stoplist, verbose, guard)
 
     if isinstance(morc, dict):  # allow: bind_all(globals())
         for k, val in list(morc.items()):
             if isinstance(val, FunctionType):
-                newv = _make_constants(val, builtin_only, stoplist, verbose)
+                newv = _optimize(val, builtin_only, stoplist, verbose, guard)
                 morc[k] = newv
             elif isinstance(val, type):
-                _bind_all(val, builtin_only, stoplist, verbose)
+                _bind_all(val, builtin_only, stoplist, verbose, guard)
+    else:
+        _bind_all(morc, builtin_only, stoplist, verbose, guard)
+
+
+def _loadglobals(code):
+    """Count LOAD_GLOBAL instructions of a code object and of its nested code
+    objects.
+
+    :rtype: int"""
+
+    result = sum(
+        1 for instruction in _instructions(code)
+        if instruction.opcode == LOAD_GLOBAL
+    )
+
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            result += _loadglobals(const)
+
+    return result
+
+
+def _walk(morc, packages=True, _visited=None):
+    """Get functions defined in a module, a package or a class.
+
+    Sub-modules of packages are imported and nested classes are walked.
+
+    :param morc: module, package or class.
+    :param bool packages: if False, do not walk sub-modules of packages.
+    :return: list of (owner, name, function).
+    :rtype: list"""
+
+    if _visited is None:
+        _visited = set()
+
+    result = []
+
+    if id(morc) in _visited:
+        return result
+
+    _visited.add(id(morc))
+
+    if isinstance(morc, ModuleType):
+        _globals = vars(morc)
+
+        for name, val in list(_globals.items()):
+            if isinstance(val, FunctionType):
+                if val.__globals__ is _globals:
+                    result.append((morc, name, val))
+
+            elif isinstance(val, type) and val.__module__ == morc.__name__:
+                result += _walk(val, packages, _visited)
+
+        path = getattr(morc, '__path__', []) if packages else []
+
+        for _, subname, _ in walk_packages(
+                path, '{0}.'.format(morc.__name__), onerror=lambda name: None
+        ):
+            try:
+                submodule = import_module(subname)
+
+            except ImportError:
+                pass
+
+            else:
+                result += _walk(submodule, packages, _visited)
+
+    elif isinstance(morc, type):
+        for name, val in list(vars(morc).items()):
+            if isinstance(val, FunctionType):
+                result.append((morc, name, val))
+
+            elif isinstance(val, type):
+                result += _walk(val, packages, _visited)
+
+    return result
+
+
+def _sample(workload, codes, interval):
+    """Execute a workload and sample frames of its thread.
+
+    Each sample is given to the innermost frame which executes a code among
+    codes.
+
+    :param workload: function to execute without parameters.
+    :param codes: code objects to sample.
+    :param float interval: duration between two samples in seconds.
+    :return: number of samples by code object.
+    :rtype: dict"""
+
+    result = {}
+
+    ident = get_ident()
+    stop = Event()
+
+    def sampler():
+        """Sample frames of the workload thread until stop is set."""
+
+        while not stop.wait(interval):
+            frame = _current_frames().get(ident)
+
+            while frame is not None:
+                code = frame.f_code
+
+                if code in codes:
+                    result[code] = result.get(code, 0) + 1
+                    break
+
+                frame = frame.f_back
+
+    thread = Thread(target=sampler)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        workload()
+
+    finally:
+        stop.set()
+        thread.join()
+
+    return result
+
+
+def _best(workload, repeat):
+    """Get the best duration of a workload in seconds."""
+
+    times = []
+
+    for _ in range(repeat):
+        start = default_timer()
+        workload()
+        times.append(default_timer() - start)
+
+    return min(times)
+
+
+def profile_bind_all(
+        morc, workload, count=10, interval=0.001, repeat=3,
+        builtin_only=False, stoplist=None, verbose=None, guard=False,
+        sampler=_sample
+):
+    """Apply constant binding to the hottest functions of a workload.
+
+    Functions are searched in a module or a class, and recursively in
+    sub-packages and nested classes. The workload is executed repeat times in
+    order to measure it, once with a sampling profiler, and repeat times once
+    hot functions are optimized. Cold functions are left undisturbed.
+
+    A RuntimeWarning is emitted if no sample is collected, for example if the
+    workload is shorter than the sampling interval.
+
+    :param morc: module, package or class to transform.
+    :param workload: function without parameters to profile.
+    :param int count: maximal number of functions to transform.
+    :param float interval: sampling interval in seconds.
+    :param int repeat: number of workload executions per measure.
+    :param bool builtin_only: only transform builtin objects.
+    :param list stoplist: attribute names to not transform.
+    :param function verbose: logger function which takes in parameter a message
+    :param guard: guard parameter of make_constants.
+    :param sampler: function which executes a workload and returns a number
+        of samples by code object, with the workload, the code objects to
+        sample and the interval in parameters. Default is a sampling profiler.
+    :return: transformed functions ordered by samples (with name, samples and
+        LOAD_GLOBAL counts before and after), best workload durations before
+        and after the transformation and speedup.
+    :rtype: dict
+    """
+
+    if stoplist is None:
+        stoplist = []
+
+    functions = dict(
+        (function.__code__, (owner, name, function))
+        for owner, name, function in _walk(morc)
+    )
+
+    before = _best(workload, repeat)
+
+    samples = sampler(workload, functions, interval)
+
+    if not samples:
+        warn(
+            'No sample collected, try a shorter interval than {0}s.'.format(
+                interval
+            ),
+            RuntimeWarning
+        )
+
+    hottest = sorted(samples, key=lambda code: samples[code], reverse=True)
+
+    transformed = []
+
+    for code in hottest[:count]:
+        owner, name, function = functions[code]
+
+        newfunction = _optimize(
+            function, builtin_only, stoplist, verbose, guard
+        )
+
+        loadglobals = _loadglobals(code)
+        remaining = _loadglobals(newfunction.__code__)
+
+        if newfunction is not function:
+            setattr(owner, name, newfunction)
+
+        transformed.append(
+            {
+                'name': '{0}.{1}'.format(
+                    getattr(owner, '__name__', owner), name
+                ),
+                'samples': samples[code],
+                'loadglobals': loadglobals,
+                'eliminated': loadglobals - remaining
+            }
+        )
+
+    after = _best(workload, repeat)
+
+    return {
+        'functions': transformed,
+        'samples': sum(samples.values()),
+        'before': before,
+        'after': after,
+        'speedup': before / after if after else 0.
+    }
+
+
+def _reassigned(_globals):
+    """Get global names stored or deleted by functions of a module.
+
+    :param dict _globals: module globals.
+    :rtype: set"""
+
+    result = set()
+
+    module = modules.get(_globals.get('__name__'))
+
+    if module is not None and vars(module) is _globals:
+        for _, _, function in _walk(module, False):
+            result |= _mutated(function.__code__)
+
+    return result
+
+
+def _analyze(func, builtin_only, stoplist, reassigned):
+    """Analyze what _make_constants would transform in a function.
+
+    :param set reassigned: global names stored or deleted by functions of the
+        module of func.
+    :rtype: dict"""
+
+    report = {
+        'globals': [], 'attributes': [], 'attributelookups': 0, 'tuples': 0,
+        'skipped': {}
+    }
+
+    _make_constants(func, builtin_only, stoplist, None, None, report)
+
+    folded = set(report['globals'])
+    _globals = getattr(func, '__globals__', {})
+
+    # one lookup for a global and two for a builtin (globals, then builtins)
+    eliminated = sum(
+        1 if name in _globals else 2 for name in report['globals']
+    ) + report['attributelookups']
+
+    return {
+        'name': getattr(func, '__name__', None),
+        'globals': sorted(folded),
+        'attributes': report['attributes'],
+        'tuples': report['tuples'],
+        'skipped': report['skipped'],
+        'eliminated': eliminated,
+        'risky': sorted(folded & reassigned)
+    }
+
+
+def analyze_constants(func, builtin_only=False, stoplist=None):
+    """Analyze what make_constants would transform in a function, without
+    transforming it.
+
+    :param function func: function to analyze.
+    :param bool builtin_only: only transform builtin objects.
+    :param list stoplist: attribute names to not transform.
+    :return: report with:
+
+        - name: function name.
+        - globals: folded global names.
+        - attributes: folded attribute chains (such as 'random.random').
+        - tuples: number of folded tuples of constants.
+        - skipped: skip reason by global name which is not folded:
+            'stoplist', 'builtin_only', 'stored' (the function stores or
+            deletes the global) or 'undefined' (the name is resolved
+            dynamically).
+        - eliminated: estimated number of eliminated dict lookups when each
+            instruction is executed once (one per global, two per builtin
+            and one per attribute).
+        - risky: folded global names which are stored or deleted by other
+            functions of the function module. Rebindings from other modules
+            are not detected (see the guard parameter of make_constants).
+    :rtype: dict
+
+    :Example:
+
+    >>> analyze_constants(sample)['attributes']
+    ['random.random']
+    """
+
+    return _analyze(
+        func, builtin_only, stoplist,
+        _reassigned(getattr(func, '__globals__', {}))
+    )
+
+
+def analyze_bind_all(morc, builtin_only=False, stoplist=None):
+    """Analyze what bind_all would transform, without transforming anything.
+
+    :param morc: module, class or dict of globals to analyze.
+    :param bool builtin_only: only transform builtin objects.
+    :param list stoplist: attribute names to not transform.
+    :return: reports of analyze_constants, where names are qualified by
+        module and class names.
+    :rtype: list
+    """
+
+    result = []
+
+    reassigned = {}  # reassigned global names by id of globals
+    visited = set()
+
+    def analyze(items, prefix):
+        """Analyze functions and classes of items."""
+
+        for name, val in items:
+            qualname = '{0}.{1}'.format(prefix, name) if prefix else name
+
+            if isinstance(val, FunctionType):
+                key = id(val.__globals__)
+                if key not in reassigned:
+                    reassigned[key] = _reassigned(val.__globals__)
+
+                report = _analyze(
+                    val, builtin_only, stoplist, reassigned[key]
+                )
+                report['name'] = qualname
+                result.append(report)
+
+            elif isinstance(val, type) and id(val) not in visited:
+                visited.add(id(val))
+                analyze(list(vars(val).items()), qualname)
+
+    if isinstance(morc, dict):
+        analyze(list(morc.items()), None)
+
     else:
-        _bind_all(morc, builtin_only, stoplist, verbose)
+        analyze(list(vars(morc).items()), morc.__name__)
+
+    return result
 
 
 @_make_constants
-def make_constants(builtin_only=False, stoplist=None, verbose=None):
+def make_constants(
+        builtin_only=False, stoplist=None, verbose=None, guard=False
+):
     """Return a decorator for optimizing global references.
 
     Replaces global references with their currently defined values.
@@ -365,10 +2876,15 @@ def make_constants(builtin_only=False, stoplist=None, verbose=None):
     Variable names in the stoplist are also left undisturbed.
     Also, folds constant attr lookups and tuples of constants.
     If verbose is True, prints each substitution as is occurs.
+    If guard is set, the optimized function is updated when a bound global or
+    a folded attribute chain (such as os.path.join) is rebound: its code is
+    re-optimized with the new values (REOPTIMIZE) or restored (DEOPTIMIZE).
 
     :param bool builtin_only: only transform builtin objects.
     :param list stoplist: attribute names to not transform.
     :param function verbose: logger function which takes in parameter a message
+    :param guard: if True, REOPTIMIZE or DEOPTIMIZE, guard bound globals (True
+        means REOPTIMIZE). See checkguards.
     """
 
     if stoplist is None:
@@ -377,4 +2893,6 @@ def make_constants(builtin_only=False, stoplist=None, verbose=None):
     if isinstance(builtin_only, type(make_constants)):
         raise ValueError("The bind_constants decorator must have arguments.")
 
-    return lambda func: _make_constants(func, builtin_only, stoplist, verbose)
+    return lambda func: _optimize(
+        func, builtin_only, stoplist, verbose, guard
+    )
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# --------------------------------------------------------------------
+# The MIT License (MIT)
+#
+# Copyright (c) 2014 Jonathan Labéjof <jonathan.labejof@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# --------------------------------------------------------------------
+
+"""Benchmarks of the path module.
+
+Benchmarks resolve paths of a synthetic package tree of configurable depth
+and breadth:
+
+- cold: lookup of leaf modules which are not imported.
+- warm: lookup of cached paths.
+- deep: lookup of nested class chains of imported modules, without cache.
+- scope: lookup of expressions evaluated from a scope, without cache.
+- threads: lookup of cached leaf paths from several threads with a SyncCache.
+- coldthreads: lookup of leaf modules which are not imported from several
+  threads with a SyncCache, which includes the import lock contention.
+
+Results are printed or saved as JSON in order to compare them between
+versions::
+
+    python -m b3j0f.utils.test.bench --depth 3 --breadth 4 -o new.json
+    python -m b3j0f.utils.test.bench --compare old.json new.json
+"""
+
+from __future__ import unicode_literals, absolute_import, print_function
+
+from json import dump, load
+
+from optparse import OptionParser
+
+from os import mkdir
+
+from os.path import join
+
+from platform import python_implementation, python_version, platform
+
+from shutil import rmtree
+
+from sys import path as syspath, modules, stdout
+
+from tempfile import mkdtemp
+
+from threading import Thread
+
+from time import time
+
+from timeit import default_timer
+
+from ..version import __version__
+from ..path import lookup, clearcache, getcache, setcache, SyncCache
+
+__all__ = ['maketree', 'bench', 'run', 'compare', 'main']
+
+#: default root package name of synthetic package trees.
+PREFIX = 'b3j0f_bench'
+
+
+def maketree(dirname, depth=3, breadth=3, chain=5, prefix=PREFIX):
+    """Write a synthetic package tree.
+
+    The root package contains breadth sub-packages, which contain breadth
+    sub-packages, etc. Packages of the last level contain breadth modules.
+    Each module defines a chain of nested classes ``N0.N1...``.
+
+    :param str dirname: directory where write the tree.
+    :param int depth: number of package levels (0 for one module).
+    :param int breadth: number of children per package.
+    :param int chain: length of nested class chains.
+    :param str prefix: root package name.
+    :return: leaf module paths.
+    :rtype: list
+    """
+
+    lines = []
+
+    for index in range(chain):
+        lines.append(
+            '{0}class N{1}(object):\n'.format('    ' * index, index)
+        )
+
+    lines.append('{0}value = 1\n'.format('    ' * chain))
+
+    source = ''.join(lines)
+
+    result = []
+
+    def write(path, name, level):
+        """Write a package or a leaf module."""
+
+        if level < depth:
+            path = join(path, name)
+            mkdir(path)
+
+            with open(join(path, '__init__.py'), 'w') as f:
+                f.write(source)
+
+            for index in range(breadth):
+                write(path, 'n{0}'.format(index), level + 1)
+
+        else:
+            with open(join(path, '{0}.py'.format(name)), 'w') as f:
+                f.write(source)
+
+    write(dirname, prefix, 0)
+
+    if depth == 0:
+        result.append(prefix)
+
+    else:
+        names = [prefix]
+
+        for _ in range(depth):
+            names = [
+                '{0}.n{1}'.format(name, index)
+                for name in names for index in range(breadth)
+            ]
+
+        result = names
+
+    return result
+
+
+def _purge(prefix):
+    """Remove modules of a package tree from sys.modules."""
+
+    for name in list(modules):
+        if name == prefix or name.startswith('{0}.'.format(prefix)):
+            del modules[name]
+
+
+def bench(name, func, ops, repeat=3, setup=None):
+    """Measure a function.
+
+    :param str name: benchmark name.
+    :param func: function to measure.
+    :param int ops: number of operations executed by func.
+    :param int repeat: number of measures.
+    :param setup: function to call before each measure.
+    :return: name, ops, repeat, best and mean duration by operation in
+        seconds, and total durations of measures.
+    :rtype: dict
+    """
+
+    times = []
+
+    for _ in range(repeat):
+
+        if setup is not None:
+            setup()
+
+        start = default_timer()
+        func()
+        times.append(default_timer() - start)
+
+    return {
+        'name': name,
+        'ops': ops,
+        'repeat': repeat,
+        'best': min(times) / ops,
+        'mean': sum(times) / (ops * repeat),
+        'times': times
+    }
+
+
+def run(
+        depth=3, breadth=3, chain=5, number=1000, repeat=3, threads=4,
+        prefix=PREFIX
+):
+    """Run all benchmarks.
+
+    :param int depth: depth of the package tree.
+    :param int breadth: breadth of the package tree.
+    :param int chain: length of nested class chains.
+    :param int number: number of lookups of warm, deep and scope benchmarks.
+    :param int repeat: number of measures per benchmark.
+    :param int threads: number of threads of the threads benchmark.
+    :param str prefix: root package name of the package tree.
+    :return: benchmark environment, parameters and results.
+    :rtype: dict
+    """
+
+    dirname = mkdtemp()
+    syspath.insert(0, dirname)
+
+    cache = getcache()
+
+    try:
+        leaves = maketree(dirname, depth, breadth, chain, prefix)
+
+        nodes = '.'.join('N{0}'.format(index) for index in range(chain))
+        deeps = ['{0}.{1}.value'.format(leaf, nodes) for leaf in leaves]
+
+        def setupcold():
+            _purge(prefix)
+            clearcache()
+
+        def cold():
+            for leaf in leaves:
+                lookup(leaf)
+
+        def warm():
+            for index in range(number):
+                lookup(leaves[index % len(leaves)])
+
+        def deep():
+            for index in range(number):
+                lookup(deeps[index % len(deeps)], cache=False, fast=True)
+
+        scope = {'value': 1, 'factor': 2}
+
+        def scoped():
+            for _ in range(number):
+                lookup('value * factor', cache=False, scope=scope)
+
+        def setupcoldthreads():
+            setupcold()
+            setcache(SyncCache())
+
+        def setupthreads():  # warm the cache before starting threads
+            setupcoldthreads()
+            cold()
+
+        def contention():
+            workers = [
+                Thread(target=warm) for _ in range(threads)
+            ]
+
+            for worker in workers:
+                worker.start()
+
+            for worker in workers:
+                worker.join()
+
+        results = [
+            bench('cold', cold, len(leaves), repeat, setupcold),
+            bench('warm', warm, number, repeat),
+            bench('deep', deep, number, repeat),
+            bench('scope', scoped, number, repeat),
+            bench(
+                'threads', contention, number * threads, repeat, setupthreads
+            ),
+            bench(
+                'coldthreads', contention, number * threads, repeat,
+                setupcoldthreads
+            )
+        ]
+
+    finally:
+        setcache(cache)
+        syspath.remove(dirname)
+        _purge(prefix)
+        clearcache()
+        rmtree(dirname)
+
+    return {
+        'version': __version__,
+        'python': '{0} {1}'.format(python_implementation(), python_version()),
+        'platform': platform(),
+        'time': time(),
+        'params': {
+            'depth': depth, 'breadth': breadth, 'chain': chain,
+            'number': number, 'repeat': repeat, 'threads': threads
+        },
+        'results': results
+    }
+
+
+def compare(old, new):
+    """Compare best durations of two benchmark runs.
+
+    :param dict old: reference run.
+    :param dict new: run to compare with old.
+    :return: ratio of new and old best durations by benchmark name (greater
+        than 1 if new is slower).
+    :rtype: dict
+    """
+
+    bests = dict((item['name'], item['best']) for item in old['results'])
+
+    return dict(
+        (item['name'], item['best'] / bests[item['name']])
+        for item in new['results']
+        if bests.get(item['name'])
+    )
+
+
+def main(argv=None):
+    """Run benchmarks from command line arguments."""
+
+    parser = OptionParser(
+        usage='%prog [options] | %prog --compare OLD NEW'
+    )
+    parser.add_option('--depth', type='int', default=3)
+    parser.add_option('--breadth', type='int', default=3)
+    parser.add_option('--chain', type='int', default=5)
+    parser.add_option('--number', type='int', default=1000)
+    parser.add_option('--repeat', type='int', default=3)
+    parser.add_option('--threads', type='int', default=4)
+    parser.add_option('-o', '--output', help='JSON file where save results.')
+    parser.add_option(
+        '--compare', action='store_true',
+        help='compare results of two JSON files.'
+    )
+
+    options, args = parser.parse_args(argv)
+
+    if options.compare:
+        if len(args) != 2:
+            parser.error('--compare requires two JSON files.')
+
+        with open(args[0]) as f:
+            old = load(f)
+
+        with open(args[1]) as f:
+            new = load(f)
+
+        for name, ratio in sorted(compare(old, new).items()):
+            print('{0}: {1:.3f}'.format(name, ratio))
+
+    else:
+        result = run(
+            depth=options.depth, breadth=options.breadth,
+            chain=options.chain, number=options.number,
+            repeat=options.repeat, threads=options.threads
+        )
+
+        if options.output:
+            with open(options.output, 'w') as f:
+                dump(result, f, indent=2, sort_keys=True)
+
+        else:
+            dump(result, stdout, indent=2, sort_keys=True)
+            print()
+
+
+if __name__ == '__main__':
+    main()
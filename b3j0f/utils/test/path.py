@@ -25,10 +25,45 @@
 # SOFTWARE.
 # --------------------------------------------------------------------
 
-from unittest import main
+from unittest import main, skipIf
+
+from time import sleep
+
+from threading import Thread
+
+from tempfile import mkdtemp
+
+from shutil import rmtree
+
+from os import utime
+
+from os.path import join
+
+from sys import path as syspath, modules
+
+from six.moves import reload_module
+
+try:
+    import asyncio
+
+except ImportError:
+    asyncio = None
 
 from ..ut import UTCase
-from ..path import lookup, clearcache, incache, getpath, alias
+from ..version import OrderedDict
+from .bench import run, compare, PREFIX
+from .. import path as pathmodule
+from ..path import (
+    lookup, lookup_many, alookup, alookup_many,
+    clearcache, incache, getpath, alias,
+    watchmodules, invalidate, PathIndex,
+    addnamespace, removenamespace, getnamespaces,
+    LatencyHistogram, LookupStats, enablestats, disablestats, getstats,
+    recordpaths, getrecorded, savemanifest, loadmanifest, preload,
+    AliasRegistry, FrozenAliases, getregistry, delregistry,
+    LookupCache, LRUCache, TTLCache, SyncCache, getcache, setcache,
+    LookupScope
+)
 
 
 class LookUpTest(UTCase):
@@ -99,7 +134,9 @@ class LookUpTest(UTCase):
         def f_test():
             """test function."""
 
-        local = lookup('f_test')
+        self.assertRaises(ImportError, lookup, 'f_test', cache=False)
+
+        local = lookup('f_test', cache=False, frame=True)
         self.assertIs(local, f_test)
 
     def test_notfound(self):
@@ -152,6 +189,151 @@ class LookUpTest(UTCase):
 
         self.assertIsNone(result)
 
+        clearcache()
+
+    def test_scope_cache(self):
+        """Test that scoped results are not cached."""
+
+        path = 'testy'
+
+        scope, otherscope = {path: 1}, {path: 2}
+
+        size = len(getcache())
+
+        self.assertEqual(lookup(path, scope=scope), 1)
+        self.assertEqual(lookup(path, scope=otherscope), 2)
+        self.assertEqual(lookup_many([path], scope=scope), ({path: 1}, {}))
+        self.assertFalse(incache(path))
+        self.assertRaises(ImportError, lookup, path)
+
+        # the cache does not keep scopes
+        self.assertEqual(len(getcache()), size)
+
+    def test_lookupscope_cache(self):
+        """Test that results of a LookupScope are cached in the scope."""
+
+        path = 'value * factor'
+
+        scope = LookupScope(value=1, factor=2)
+        otherscope = LookupScope(value=2, factor=2)
+
+        size = len(getcache())
+
+        stats = enablestats()
+
+        try:
+            self.assertEqual(lookup(path, scope=scope), 2)
+            self.assertTrue(incache(path, scope))
+            self.assertFalse(incache(path, otherscope))
+            self.assertFalse(incache(path))
+
+            # a repeated scoped lookup is a cache hit
+            self.assertEqual(lookup(path, scope=scope), 2)
+            self.assertEqual(stats.paths[path]['hits'], 1)
+
+            self.assertEqual(lookup(path, scope=otherscope), 4)
+            self.assertEqual(
+                lookup_many([path], scope=otherscope), ({path: 4}, {})
+            )
+            self.assertEqual(stats.paths[path]['hits'], 2)
+
+        finally:
+            disablestats()
+
+        # the scope cache is cleared when the scope changes
+        scope['factor'] = 3
+        self.assertFalse(incache(path, scope))
+        self.assertEqual(lookup(path, scope=scope), 3)
+
+        # or without cache
+        self.assertEqual(lookup(path, cache=False, scope=otherscope), 4)
+        clearcache(path)
+        self.assertFalse(incache(path, scope))
+        self.assertFalse(incache(path, otherscope))
+
+        # dict scopes are still not cached
+        lookup(path, scope={'value': 1, 'factor': 2})
+        self.assertFalse(incache(path, {'value': 1, 'factor': 2}))
+        self.assertEqual(len(getcache()), size)
+
+    def test_namespace(self):
+        """Test to lookup paths from registered namespaces."""
+
+        path = 'b3j0f_test_namespace'
+
+        namespace = {path: getpath}
+
+        addnamespace(namespace)
+
+        try:
+            self.assertIn(namespace, getnamespaces())
+
+            self.assertIs(lookup(path, cache=False), getpath)
+            self.assertIs(lookup(path, cache=False, fast=True), getpath)
+            self.assertEqual(
+                lookup('{0}.__name__'.format(path), cache=False), 'getpath'
+            )
+            self.assertEqual(
+                lookup_many([path], cache=False), ({path: getpath}, {})
+            )
+            # the scope has priority over namespaces
+            self.assertEqual(
+                lookup(path, cache=False, scope={path: 1}), 1
+            )
+
+        finally:
+            self.assertTrue(removenamespace(namespace))
+
+        self.assertFalse(removenamespace(namespace))
+        self.assertNotIn(namespace, getnamespaces())
+        self.assertRaises(ImportError, lookup, path, cache=False)
+
+    def test_fast(self):
+        """Test the lookup function without evaluating dotted names."""
+
+        def f_test():
+            """test function."""
+
+        self.assertIs(lookup('b3j0f.utils.path.lookup', fast=True), lookup)
+        self.assertIs(lookup('object', fast=True), object)
+        self.assertIs(
+            lookup('f_test', fast=True, cache=False, frame=True), f_test
+        )
+        scope = {'testy': 1}
+        self.assertEqual(lookup('testy', False, scope, fast=True), 1)
+        self.assertEqual(lookup('1 + 1', fast=True), 2)
+        self.assertRaises(ImportError, lookup, 'unexist', fast=True)
+        self.assertRaises(ImportError, lookup, 'not', fast=True)
+        self.assertRaises(ImportError, lookup, 'open', fast=True, safe=True)
+        self.assertRaises(
+            ImportError, lookup, 'b3j0f.utils.unexist', fast=True
+        )
+
+    def test_lazy(self):
+        """Test the lookup function with lazy proxies."""
+
+        path = 'b3j0f.utils.path.getpath'
+
+        proxy = lookup(path, lazy=True)
+
+        self.assertIsNot(proxy, getpath)
+        self.assertIs(lookup(path), proxy)
+        self.assertEqual(proxy(getpath), path)
+        self.assertIs(lookup(path), getpath)
+        self.assertIs(lookup(path, lazy=True), getpath)
+
+        clearcache(path)
+
+    def test_lazy_error(self):
+        """Test to resolve a lazy proxy of a wrong path."""
+
+        proxy = lookup('unexist', lazy=True, cache=False)
+
+        self.assertFalse(incache('unexist'))
+
+        with self.assertRaises(ImportError):
+            proxy()
+
     def test_safe(self):
         """Test the functino lookup with safe."""
 
@@ -168,6 +350,690 @@ class LookUpTest(UTCase):
         self.assertEqual(expr, expr)
 
 
+class LookUpManyTest(UTCase):
+    """Test the function lookup_many."""
+
+    def setUp(self):
+
+        clearcache()
+
+    def tearDown(self):
+
+        clearcache()
+
+    def test_empty(self):
+        """Test to lookup no path."""
+
+        result, errors = lookup_many([])
+
+        self.assertEqual(result, {})
+        self.assertEqual(errors, {})
+
+    def test_paths(self):
+        """Test to lookup packages, modules, functions and builtins."""
+
+        paths = [
+            'b3j0f', 'b3j0f.utils', 'b3j0f.utils.path.lookup',
+            'b3j0f.utils.test.path.LookUpTest.test_method',
+            '{0}.open'.format(open.__module__), 'object'
+        ]
+
+        result, errors = lookup_many(paths)
+
+        self.assertEqual(errors, {})
+
+        for path in paths:
+            self.assertEqual(result[path], lookup(path))
+
+    def test_errors(self):
+        """Test to get errors by path."""
+
+        paths = ['b3j0f.utils.path.unexist', 'unexist', '', 'b3j0f.utils']
+
+        result, errors = lookup_many(paths)
+
+        self.assertEqual(list(result), ['b3j0f.utils'])
+        self.assertEqual(len(errors), 3)
+
+        for error in errors.values():
+            self.assertIsInstance(error, ImportError)
+
+    def test_cache(self):
+        """Test to use the lookup cache."""
+
+        path = 'b3j0f.utils'
+
+        lookup_many([path], cache=False)
+        self.assertFalse(incache(path))
+
+        lookup_many([path])
+        self.assertTrue(incache(path))
+
+    def test_scope(self):
+        """Test to lookup paths and expressions in a scope."""
+
+        scope = {'testy': 1}
+
+        result, errors = lookup_many(['testy', 'testy + 1'], scope=scope)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(result, {'testy': 1, 'testy + 1': 2})
+
+    def test_safe(self):
+        """Test to lookup paths in a safe context."""
+
+        result, errors = lookup_many(['open', 'max'], safe=True)
+
+        self.assertEqual(list(result), ['max'])
+        self.assertEqual(list(errors), ['open'])
+
+
+@skipIf(asyncio is None, 'asyncio is not available')
+class ALookUpTest(UTCase):
+    """Test functions alookup and alookup_many."""
+
+    def setUp(self):
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        class Executor(ThreadPoolExecutor):
+            """Executor which counts submitted calls."""
+
+            calls = 0
+
+            def submit(self, *args, **kwargs):
+
+                Executor.calls += 1
+
+                return super(Executor, self).submit(*args, **kwargs)
+
+        self.executor = Executor(2)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        clearcache()
+
+    def tearDown(self):
+
+        clearcache()
+
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.executor.shutdown()
+
+    def _run(self, future):
+        """Run the loop until future is done."""
+
+        return self.loop.run_until_complete(future)
+
+    def test_cached(self):
+        """Test to resolve a cached path without executor."""
+
+        lookup('b3j0f.utils')
+
+        future = alookup('b3j0f.utils', executor=self.executor)
+
+        self.assertTrue(future.done())
+        self.assertEqual(self._run(future).__name__, 'b3j0f.utils')
+        self.assertEqual(self.executor.calls, 0)
+
+    def test_dedup(self):
+        """Test to resolve once concurrent lookups."""
+
+        futures = [
+            alookup('b3j0f.utils.path.getpath', executor=self.executor)
+            for _ in range(3)
+        ]
+
+        results = self._run(asyncio.gather(*futures))
+
+        self.assertEqual(results, [getpath] * 3)
+        self.assertEqual(self.executor.calls, 1)
+        self.assertTrue(incache('b3j0f.utils.path.getpath'))
+
+    def test_error(self):
+        """Test to resolve a wrong path."""
+
+        self.assertRaises(ImportError, self._run, alookup('unexist'))
+        self.assertRaises(ImportError, self._run, alookup(''))
+
+    def test_many(self):
+        """Test to resolve several paths."""
+
+        lookup('b3j0f')
+
+        pending = alookup('b3j0f.utils.path', executor=self.executor)
+
+        future = alookup_many(
+            ['b3j0f', 'b3j0f.utils.path', 'b3j0f.utils', 'unexist'],
+            executor=self.executor
+        )
+
+        result, errors = self._run(future)
+
+        self.assertEqual(
+            sorted(result), ['b3j0f', 'b3j0f.utils', 'b3j0f.utils.path']
+        )
+        self.assertEqual(list(errors), ['unexist'])
+        self.assertIs(self._run(pending), result['b3j0f.utils.path'])
+        self.assertEqual(self.executor.calls, 2)
+
+    def test_many_empty(self):
+        """Test to resolve no path."""
+
+        self.assertEqual(self._run(alookup_many([])), ({}, {}))
+
+
+class CacheTest(UTCase):
+    """Test lookup cache backends."""
+
+    def setUp(self):
+
+        self.oldcache = setcache()
+
+    def tearDown(self):
+
+        setcache(self.oldcache)
+
+    def test_default(self):
+        """Test the default cache."""
+
+        self.assertIsInstance(getcache(), LookupCache)
+        self.assertIsNone(getcache().maxsize)
+
+    def test_setcache(self):
+        """Test to change the cache backend."""
+
+        cache = LRUCache(maxsize=2)
+
+        setcache(cache)
+
+        lookup('b3j0f')
+
+        self.assertIs(getcache(), cache)
+        self.assertIn('b3j0f', cache)
+
+    def test_stats(self):
+        """Test hits, misses and evictions counters."""
+
+        setcache(LookupCache(maxsize=1))
+
+        lookup('b3j0f')
+        lookup('b3j0f')
+        lookup('b3j0f.utils')
+
+        stats = getcache().stats()
+
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['maxsize'], 1)
+        self.assertFalse(incache('b3j0f'))
+        self.assertTrue(incache('b3j0f.utils'))
+
+    def test_unbounded(self):
+        """Test unbounded caches which do not order entries."""
+
+        for cache in (LookupCache(), LRUCache(maxsize=None)):
+            self.assertNotIsInstance(cache._items, OrderedDict)
+
+            cache['a'] = 1
+            cache['b'] = 2
+            cache['a'] = 3
+
+            self.assertEqual(cache.get('a'), 3)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.stats()['evictions'], 0)
+
+    def test_lru(self):
+        """Test to evict least recently used entries."""
+
+        setcache(LRUCache(maxsize=2))
+
+        lookup('b3j0f')
+        lookup('b3j0f.utils')
+        lookup('b3j0f')
+        lookup('b3j0f.utils.path')
+
+        self.assertTrue(incache('b3j0f'))
+        self.assertFalse(incache('b3j0f.utils'))
+        self.assertTrue(incache('b3j0f.utils.path'))
+        self.assertEqual(getcache().evictions, 1)
+
+    def test_ttl(self):
+        """Test to evict expired entries."""
+
+        setcache(TTLCache(ttl=0.01))
+
+        lookup('b3j0f')
+
+        self.assertTrue(incache('b3j0f'))
+
+        sleep(0.02)
+
+        self.assertFalse(incache('b3j0f'))
+        self.assertEqual(getcache().evictions, 1)
+
+
+class SyncCacheTest(UTCase):
+    """Test the thread safe lookup cache."""
+
+    def setUp(self):
+
+        self.cache = SyncCache(maxsize=2)
+        self.oldcache = setcache(self.cache)
+
+    def tearDown(self):
+
+        setcache(self.oldcache)
+
+    def test_lookup(self):
+        """Test to lookup with a thread safe cache."""
+
+        lookup('b3j0f')
+        lookup('b3j0f')
+
+        self.assertTrue(incache('b3j0f'))
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+        clearcache('b3j0f')
+        self.assertFalse(incache('b3j0f'))
+
+    def test_evictions(self):
+        """Test to evict oldest entries."""
+
+        lookup('b3j0f')
+        lookup('b3j0f.utils')
+        lookup('b3j0f.utils.path')
+
+        self.assertFalse(incache('b3j0f'))
+        self.assertTrue(incache('b3j0f.utils'))
+        self.assertTrue(incache('b3j0f.utils.path'))
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_singleflight(self):
+        """Test to resolve once a path missed by several threads."""
+
+        calls = []
+
+        def resolver():
+            calls.append(None)
+            sleep(0.05)
+            return len(calls)
+
+        results = []
+
+        def resolve():
+            results.append(self.cache.resolve('test', resolver))
+
+        threads = [Thread(target=resolve) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [1] * 8)
+
+    def test_reentrant(self):
+        """Test to resolve a path while resolving it in the same thread."""
+
+        pendings = []
+
+        def resolver():
+            result = self.cache.resolve('test', lambda: 1) + 1
+            pendings.append(dict(self.cache._pending))
+            return result
+
+        self.assertEqual(self.cache.resolve('test', resolver), 2)
+        # the inner resolution keeps the pending entry of the outer one
+        self.assertIn('test', pendings[0])
+        self.assertFalse(self.cache._pending)
+
+    def test_stress(self):
+        """Test concurrent writes from more threads than maxsize."""
+
+        errors = []
+
+        def write(index):
+            try:
+                for count in range(200):
+                    path = 'test{0}'.format((index + count) % 5)
+                    self.cache[path] = count
+                    self.cache.pop('test{0}'.format(count % 5))
+                    self.cache.resolve(path, lambda: count)
+
+                    if not count % 50:
+                        self.cache.clear()
+
+            except Exception as error:
+                errors.append(error)
+
+        threads = [Thread(target=write, args=(index,)) for index in range(16)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertFalse(errors)
+        self.assertLessEqual(len(self.cache), self.cache.maxsize)
+
+        # the cache is still consistent
+        for index in range(3):
+            self.cache['test{0}'.format(index)] = index
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache['test2'], 2)
+
+    def _stress(self, cache):
+        """Read and write concurrently cache entries from several threads.
+
+        :return: errors raised by threads."""
+
+        errors = []
+
+        def access(index):
+            try:
+                for count in range(200):
+                    path = 'test{0}'.format((index + count) % 12)
+                    cache[path] = count
+                    cache.get('test{0}'.format(count % 12))
+                    'test{0}'.format(index % 12) in cache
+                    cache.resolve(path, lambda: count)
+
+            except Exception as error:
+                errors.append(error)
+
+        threads = [Thread(target=access, args=(index,)) for index in range(16)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return errors
+
+    def test_lru(self):
+        """Test to protect a LRU cache."""
+
+        evicted = []
+
+        cache = SyncCache(cache=LRUCache(maxsize=8), onevict=evicted.append)
+
+        self.assertEqual(cache.maxsize, 8)
+        self.assertFalse(self._stress(cache))
+        self.assertLessEqual(len(cache), 8)
+        self.assertEqual(cache.evictions, len(evicted))
+
+        cache.clear()
+
+        for index in range(8):
+            cache['test{0}'.format(index)] = index
+
+        cache.get('test0')  # test1 becomes the least recently used entry
+        cache['test8'] = 8
+
+        self.assertIn('test0', cache)
+        self.assertNotIn('test1', cache)
+        self.assertEqual(evicted[-1], 'test1')
+
+    def test_ttl(self):
+        """Test to protect a TTL cache whose entries expire on reads."""
+
+        cache = SyncCache(cache=TTLCache(ttl=0, maxsize=8))
+
+        self.assertFalse(self._stress(cache))
+        self.assertLessEqual(len(cache), 8)
+
+        cache['test'] = 1
+        sleep(0.01)
+
+        self.assertIsNone(cache.get('test'))
+        self.assertEqual(cache.resolve('test', lambda: 2), 2)
+        self.assertGreater(cache.stats()['evictions'], 0)
+
+    def test_fork(self):
+        """Test to renew the lock in a forked process."""
+
+        lock = self.cache._lock
+
+        self.cache._pid = None  # simulate a fork
+
+        lookup('b3j0f')
+
+        self.assertIsNot(self.cache._lock, lock)
+        self.assertTrue(incache('b3j0f'))
+
+
+class InvalidateTest(UTCase):
+    """Test the invalidation of cache entries by module."""
+
+    def setUp(self):
+
+        self.tmpdir = mkdtemp()
+        syspath.insert(0, self.tmpdir)
+
+        self.modname = 'b3j0f_test_invalidate'
+        self._writemodule(1)
+
+        clearcache()
+        watchmodules()
+
+    def tearDown(self):
+
+        watchmodules(False)
+        clearcache()
+
+        syspath.remove(self.tmpdir)
+        modules.pop(self.modname, None)
+        rmtree(self.tmpdir)
+
+    def _writemodule(self, value):
+        """Write the test module with input value."""
+
+        with open(join(self.tmpdir, '{0}.py'.format(self.modname)), 'w') as f:
+            f.write('value = {0}\n'.format(value))
+
+    def test_reload(self):
+        """Test to invalidate entries of a reloaded module."""
+
+        path = '{0}.value'.format(self.modname)
+
+        self.assertEqual(lookup(path), 1)
+        lookup('b3j0f.utils')
+
+        self._writemodule(22)  # change the source size for python caches
+        reload_module(modules[self.modname])
+
+        self.assertFalse(incache(path))
+        self.assertTrue(incache('b3j0f.utils'))
+        self.assertEqual(lookup(path), 22)
+
+    def test_remove(self):
+        """Test to invalidate entries of a removed module."""
+
+        path = '{0}.value'.format(self.modname)
+
+        self.assertEqual(lookup(path), 1)
+
+        self._writemodule(22)
+        del modules[self.modname]
+
+        self.assertEqual(lookup(path), 22)
+
+    def test_invalidate(self):
+        """Test to invalidate explicitly entries of a module."""
+
+        path = '{0}.value'.format(self.modname)
+
+        lookup_many([path, self.modname, 'b3j0f.utils'])
+
+        self.assertEqual(invalidate(self.modname), set([path, self.modname]))
+        self.assertFalse(incache(path))
+        self.assertTrue(incache('b3j0f.utils'))
+
+    def test_invalidate_removed(self):
+        """Test to invalidate entries of removed modules."""
+
+        path = '{0}.value'.format(self.modname)
+
+        lookup(path)
+        del modules[self.modname]
+
+        self.assertEqual(invalidate(), set([path]))
+        self.assertFalse(incache(path))
+
+    def test_evictions(self):
+        """Test to forget tracked paths of evicted entries."""
+
+        oldcache = setcache(LRUCache(maxsize=2))
+
+        try:
+            for path in (
+                    'b3j0f', 'b3j0f.utils', 'b3j0f.utils.path',
+                    'b3j0f.utils.path.lookup', 'b3j0f.utils.runtime',
+                    '{0}.value'.format(self.modname)
+            ):
+                lookup(path)
+
+            pathmodules = getattr(pathmodule, '__PATH_MODULES')
+            modulepaths = getattr(pathmodule, '__MODULE_PATHS')
+
+            self.assertEqual(len(getcache()), 2)
+            self.assertEqual(
+                sorted(pathmodules),
+                ['b3j0f.utils.runtime', '{0}.value'.format(self.modname)]
+            )
+            self.assertEqual(
+                sum(len(paths) for paths in modulepaths.values()), 2
+            )
+
+        finally:
+            setcache(oldcache)
+
+    def test_unwatch(self):
+        """Test to disable the invalidation."""
+
+        watchmodules(False)
+
+        path = '{0}.value'.format(self.modname)
+
+        lookup(path)
+        reload_module(modules[self.modname])
+
+        self.assertTrue(incache(path))
+
+
+class PathIndexTest(UTCase):
+    """Test the persistent path index."""
+
+    def setUp(self):
+
+        self.tmpdir = mkdtemp()
+        self.filename = join(self.tmpdir, 'paths.db')
+        self.index = PathIndex(self.filename)
+
+        syspath.insert(0, self.tmpdir)
+        self.modname = 'b3j0f_test_pathindex'
+        self.source = join(self.tmpdir, '{0}.py'.format(self.modname))
+
+        with open(self.source, 'w') as f:
+            f.write('value = 1\n')
+
+        clearcache()
+
+    def tearDown(self):
+
+        self.index.close()
+        clearcache()
+
+        syspath.remove(self.tmpdir)
+        modules.pop(self.modname, None)
+        rmtree(self.tmpdir)
+
+    def test_add(self):
+        """Test to index paths."""
+
+        paths = ['b3j0f.utils.path.lookup', 'b3j0f.utils', 'object', 'unexist']
+
+        errors = self.index.add(paths)
+
+        self.assertEqual(sorted(errors), ['object', 'unexist'])
+        self.assertEqual(len(self.index), 2)
+        self.assertIn('b3j0f.utils.path.lookup', self.index)
+        self.assertEqual(
+            self.index.get(['b3j0f.utils.path.lookup'])[
+                'b3j0f.utils.path.lookup'
+            ][:2],
+            ('b3j0f.utils.path', ['lookup'])
+        )
+
+        self.index.remove(['b3j0f.utils'])
+        self.assertEqual(len(self.index), 1)
+
+        self.index.remove()
+        self.assertEqual(len(self.index), 0)
+
+    def test_persistence(self):
+        """Test to reuse an index from another connection."""
+
+        self.index.add(['b3j0f.utils.path.lookup'])
+        self.index.close()
+
+        self.index = PathIndex(self.filename)
+
+        self.assertIn('b3j0f.utils.path.lookup', self.index)
+
+    def test_validate(self):
+        """Test to validate paths after modifying a source file."""
+
+        path = '{0}.value'.format(self.modname)
+
+        self.index.add([path, 'b3j0f.utils'])
+
+        self.assertEqual(
+            self.index.validate([path, 'b3j0f.utils', 'object']),
+            ([path, 'b3j0f.utils'], ['object'])
+        )
+
+        utime(self.source, (0, 0))
+
+        self.assertEqual(
+            self.index.validate(), (['b3j0f.utils'], [path])
+        )
+
+    def test_lookup_many(self):
+        """Test to resolve paths with the index."""
+
+        path = '{0}.value'.format(self.modname)
+        paths = [path, 'b3j0f.utils.path.lookup', 'object', 'unexist']
+
+        result, errors = self.index.lookup_many(paths)
+
+        self.assertEqual(list(errors), ['unexist'])
+        self.assertEqual(result[path], 1)
+        self.assertIs(result['b3j0f.utils.path.lookup'], lookup)
+        self.assertIs(result['object'], object)
+        self.assertIn(path, self.index)
+        self.assertTrue(incache(path))
+
+        clearcache()
+        del modules[self.modname]
+
+        result, errors = self.index.lookup_many(paths, cache=False)
+
+        self.assertEqual(list(errors), ['unexist'])
+        self.assertEqual(result[path], 1)
+        self.assertFalse(incache(path))
+
+
 class GetPathTest(UTCase):
     """Test the function path."""
 
@@ -188,6 +1054,45 @@ class GetPathTest(UTCase):
         pre = '__main__' if __name__ == '__main__' else 'b3j0f.utils.test.path'
         self.assertEqual(cls_path, '{0}.GetPathTest'.format(pre))
 
+    def test_method(self):
+        """Test getpath method."""
+
+        self.assertEqual(
+            getpath(LookupCache.get), 'b3j0f.utils.path.LookupCache.get'
+        )
+
+    def test_nested(self):
+        """Test getpath nested class resolved with lookup."""
+
+        path = 'b3j0f.utils.test.path.GetPathTest.Nested'
+
+        self.assertEqual(getpath(lookup(path)), path)
+
+    class Nested(object):
+        """Nested class."""
+
+    def test_alias(self):
+        """Test getpath local function registered with alias."""
+
+        @alias('b3j0f_test_getpath')
+        def test():
+            """Local function."""
+
+        self.assertEqual(getpath(test), 'b3j0f_test_getpath')
+
+        clearcache('b3j0f_test_getpath')
+
+    def test_nameless(self):
+        """Test getpath element without name."""
+
+        self.assertRaises(AttributeError, getpath, self)
+
+        alias('b3j0f_test_getpath')(self)
+
+        self.assertEqual(getpath(self), 'b3j0f_test_getpath')
+
+        clearcache('b3j0f_test_getpath')
+
 
 class LookUpGetPathTest(UTCase):
     """Test the function lookup."""
@@ -220,15 +1125,25 @@ class AliasTest(UTCase):
 
         self.aliasname = 'test'
 
+    def tearDown(self):
+
+        getregistry().unregister(self.aliasname)
+        delregistry('tenant')
+
     def _assertalias(self, element):
         """Assert input element is a right alias."""
 
-        self.assertTrue(incache(self.aliasname))
+        self.assertIn(self.aliasname, getregistry())
+        self.assertFalse(incache(self.aliasname))
 
         aliasedelement = lookup(self.aliasname)
 
         self.assertIs(element, aliasedelement)
 
+        clearcache()
+
+        self.assertIs(lookup(self.aliasname), element)
+
     def test_variable(self):
         """Test to make an alias from a variable."""
 
@@ -256,5 +1171,393 @@ class AliasTest(UTCase):
 
         self._assertalias(test)
 
+    def test_registry(self):
+        """Test to make an alias in a named registry."""
+
+        alias(self.aliasname, 'tenant')(1)
+
+        self.assertNotIn(self.aliasname, getregistry())
+        self.assertIn(self.aliasname, getregistry('tenant'))
+        self.assertEqual(
+            lookup(self.aliasname, False, aliases=['tenant']), 1
+        )
+
+    def test_order(self):
+        """Test the resolution order of registries."""
+
+        alias(self.aliasname)(1)
+        alias(self.aliasname, 'tenant')(2)
+
+        self.assertEqual(lookup(self.aliasname), 1)
+        self.assertEqual(
+            lookup(self.aliasname, aliases=['tenant', 'default']), 2
+        )
+        self.assertEqual(
+            lookup(self.aliasname, aliases=[getregistry(), 'tenant']), 1
+        )
+
+        result, _ = lookup_many([self.aliasname], aliases=['tenant'])
+
+        self.assertEqual(result[self.aliasname], 2)
+
+
+class AliasRegistryTest(UTCase):
+    """Test the class AliasRegistry."""
+
+    def setUp(self):
+
+        self.registry = AliasRegistry('test')
+
+    def test_update(self):
+        """Test to register several aliases."""
+
+        self.registry.update({'a': 1, 'b': 2})
+
+        self.assertEqual(len(self.registry), 2)
+        self.assertEqual(self.registry['a'], 1)
+        self.assertEqual(self.registry.get('c', 3), 3)
+        self.assertEqual(sorted(self.registry), ['a', 'b'])
+
+        self.assertEqual(self.registry.unregister('a'), 1)
+        self.assertNotIn('a', self.registry)
+
+        self.registry.clear()
+        self.assertEqual(len(self.registry), 0)
+
+    def test_snapshot(self):
+        """Test frozen snapshots."""
+
+        self.registry.register('a', 1)
+
+        snapshot = self.registry.snapshot()
+
+        self.assertIsInstance(snapshot, FrozenAliases)
+        self.assertIs(snapshot, self.registry.snapshot())
+        self.assertRaises(TypeError, snapshot.__setitem__, 'b', 2)
+        self.assertRaises(TypeError, snapshot.update, {'b': 2})
+
+        self.registry.register('b', 2)
+
+        self.assertNotIn('b', snapshot)
+        self.assertIn('b', self.registry.snapshot())
+
+    def test_load(self):
+        """Test to register an entry point group without entry points."""
+
+        names = self.registry.load('b3j0f.utils.test.unexist')
+
+        self.assertEqual(names, [])
+        self.assertEqual(len(self.registry), 0)
+
+    def test_load_lazy(self):
+        """Test to register entry points without importing them."""
+
+        tmpdir = mkdtemp()
+        modname = 'b3j0f_test_entrypoint'
+
+        with open(join(tmpdir, '{0}.py'.format(modname)), 'w') as f:
+            f.write('value = 1\n')
+
+        class EntryPoint(object):
+            """Entry point which imports the test module."""
+
+            name = 'entry'
+
+            def load(self):
+                return lookup(modname)
+
+        entrypoints = pathmodule._entrypoints
+        pathmodule._entrypoints = lambda group: [EntryPoint()]
+        syspath.insert(0, tmpdir)
+
+        try:
+            names = self.registry.load('b3j0f.utils.test', lazy=True)
+
+            self.assertEqual(names, ['entry'])
+            self.assertEqual(getpath(self.registry['entry']), 'entry')
+            self.assertNotIn(modname, modules)
+
+            self.assertEqual(self.registry['entry'].value, 1)
+            self.assertIn(modname, modules)
+
+        finally:
+            pathmodule._entrypoints = entrypoints
+            syspath.remove(tmpdir)
+            modules.pop(modname, None)
+            rmtree(tmpdir)
+
+
+class LatencyHistogramTest(UTCase):
+    """Test the class LatencyHistogram."""
+
+    def test_add(self):
+        """Test to add durations."""
+
+        histogram = LatencyHistogram([0.1, 1])
+
+        self.assertEqual(histogram.quantile(0.5), 0)
+
+        for duration in (0.05, 0.1, 0.5, 2):
+            histogram.add(duration)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.max, 2)
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.75), 1)
+        self.assertEqual(histogram.quantile(1), 2)
+
+        stats = histogram.stats()
+
+        self.assertEqual(stats['buckets'], [(0.1, 2), (1, 1), (None, 1)])
+        self.assertAlmostEqual(stats['mean'], 2.65 / 4)
+
+        histogram.clear()
+
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(histogram.counts, [0, 0, 0])
+
+
+class LookupStatsTest(UTCase):
+    """Test lookup instrumentation."""
+
+    def setUp(self):
+
+        clearcache()
+
+        self.events = []
+        self.stats = enablestats()
+        self.stats.subscribe(
+            lambda *event: self.events.append(event)
+        )
+
+    def tearDown(self):
+
+        disablestats()
+        clearcache()
+
+    def test_enable(self):
+        """Test to enable and disable instrumentation."""
+
+        self.assertIs(getstats(), self.stats)
+
+        stats = LookupStats()
+
+        self.assertIs(enablestats(stats), stats)
+        self.assertIs(getstats(), stats)
+        self.assertIs(disablestats(), stats)
+        self.assertIsNone(getstats())
+
+        lookup('b3j0f.utils')
+
+        self.assertFalse(stats.paths)
+
+    def test_lookup(self):
+        """Test counters of lookups."""
+
+        path = 'b3j0f.utils.path.getpath'
+
+        lookup(path)
+        lookup(path)
+        self.assertRaises(ImportError, lookup, 'b3j0f.utils.unexist')
+
+        counters = self.stats.paths[path]
+
+        self.assertEqual(counters['hits'], 1)
+        self.assertEqual(counters['misses'], 1)
+        self.assertEqual(counters['errors'], 0)
+        self.assertGreater(counters['time'], 0)
+        self.assertEqual(self.stats.paths['b3j0f.utils.unexist']['errors'], 1)
+
+        self.assertEqual(
+            [event[:2] for event in self.events],
+            [
+                (path, 'miss'), (path, 'hit'),
+                ('b3j0f.utils.unexist', 'error')
+            ]
+        )
+
+        report = self.stats.report()
+
+        self.assertEqual(report['hits'], 1)
+        self.assertEqual(report['misses'], 1)
+        self.assertEqual(report['errors'], 1)
+        self.assertAlmostEqual(report['ratio'], 1 / 3.)
+        self.assertEqual(report['histograms']['lookup']['count'], 2)
+        self.assertEqual(len(report['top']), 2)
+
+    def test_phases(self):
+        """Test durations by phase."""
+
+        lookup('b3j0f.utils.path.getpath', fast=True)
+        lookup('b3j0f.utils.path', cache=False)
+
+        histograms = self.stats.histograms
+
+        self.assertTrue(histograms['getattr'].count)
+        self.assertTrue(histograms['import'].count)
+        self.assertTrue(histograms['eval'].count)
+
+        _, status, duration, phases = self.events[0]
+
+        self.assertEqual(status, 'miss')
+        self.assertEqual(
+            sorted(phases), ['eval', 'getattr', 'import']
+        )
+        self.assertGreaterEqual(duration, sum(phases.values()))
+
+    def test_lookup_many(self):
+        """Test counters of lookup_many."""
+
+        lookup_many(['b3j0f.utils', 'b3j0f.utils.unexist'])
+        lookup_many(['b3j0f.utils'])
+
+        self.assertEqual(self.stats.paths['b3j0f.utils']['misses'], 1)
+        self.assertEqual(self.stats.paths['b3j0f.utils']['hits'], 1)
+        self.assertEqual(self.stats.paths['b3j0f.utils.unexist']['errors'], 1)
+
+    def test_top(self):
+        """Test the slowest paths report."""
+
+        def slow():
+            sleep(0.01)
+            return 1
+
+        self.stats.measure('slow', slow)
+        self.stats.measure('fast', lambda: 1)
+
+        top = self.stats.top(1)
+
+        self.assertEqual(len(top), 1)
+        self.assertEqual(top[0][0], 'slow')
+        self.assertEqual(self.stats.top(key='misses')[0][1]['misses'], 1)
+
+    def test_subscribe(self):
+        """Test subscriber errors and unsubscription."""
+
+        def error(*_):
+            raise Exception()
+
+        self.stats.subscribe(error)
+
+        self.stats.hit('path')
+
+        self.assertEqual(self.stats.callbackerrors, 1)
+        self.assertEqual(len(self.events), 1)
+
+        self.assertTrue(self.stats.unsubscribe(error))
+        self.assertFalse(self.stats.unsubscribe(error))
+
+
+class PreloadTest(UTCase):
+    """Test the recording and the preloading of paths."""
+
+    def setUp(self):
+
+        clearcache()
+
+        self.tmpdir = mkdtemp()
+
+    def tearDown(self):
+
+        recordpaths(False)
+        clearcache()
+        rmtree(self.tmpdir)
+
+    def test_record(self):
+        """Test to record resolved paths."""
+
+        self.assertEqual(recordpaths(), [])
+
+        lookup('b3j0f.utils.path')
+        lookup('b3j0f.utils.path')
+        self.assertIs(lookup('b3j0f.utils.path.lookup'), lookup)
+        lookup_many(['b3j0f.utils', 'b3j0f.utils.unexist'])
+        lookup('testy', scope={'testy': 1})
+        self.assertRaises(ImportError, lookup, 'b3j0f.utils.unexist')
+
+        paths = ['b3j0f.utils.path', 'b3j0f.utils.path.lookup', 'b3j0f.utils']
+
+        self.assertEqual(getrecorded(), paths)
+        self.assertEqual(recordpaths(False), paths)
+        self.assertEqual(getrecorded(), [])
+
+        lookup('b3j0f')
+
+        self.assertEqual(getrecorded(), [])
+
+    def test_manifest(self):
+        """Test to save and load a manifest."""
+
+        filename = join(self.tmpdir, 'paths.txt')
+
+        recordpaths()
+        lookup('b3j0f.utils')
+        savemanifest(filename)
+
+        self.assertEqual(loadmanifest(filename), ['b3j0f.utils'])
+
+        with open(filename, 'a') as f:
+            f.write('\n# comment\nb3j0f.utils.path\n')
+
+        self.assertEqual(
+            loadmanifest(filename), ['b3j0f.utils', 'b3j0f.utils.path']
+        )
+
+        savemanifest(filename, ['b3j0f'])
+
+        self.assertEqual(loadmanifest(filename), ['b3j0f'])
+
+    def test_preload(self):
+        """Test to preload paths."""
+
+        paths = [
+            'b3j0f.utils.path.lookup', 'b3j0f.utils.unexist', 'json.dumps',
+            'unittest.TestCase', 'os.path.join'
+        ]
+
+        for threads in (1, 3):
+            clearcache()
+
+            errors = preload(paths, threads=threads)
+
+            self.assertEqual(list(errors), ['b3j0f.utils.unexist'])
+            self.assertIsInstance(errors['b3j0f.utils.unexist'], ImportError)
+
+            for path in paths[:1] + paths[2:]:
+                self.assertTrue(incache(path))
+
+        clearcache()
+
+        filename = join(self.tmpdir, 'paths.txt')
+        savemanifest(filename, paths)
+
+        self.assertEqual(list(preload(filename)), ['b3j0f.utils.unexist'])
+        self.assertEqual(preload(['b3j0f'], cache=False), {})
+        self.assertFalse(incache('b3j0f'))
+
+
+class BenchTest(UTCase):
+    """Test that lookup benchmarks run."""
+
+    def test_run(self):
+        """Test to run benchmarks on a small package tree."""
+
+        result = run(
+            depth=1, breadth=2, chain=2, number=10, repeat=1, threads=2
+        )
+
+        self.assertEqual(
+            [item['name'] for item in result['results']],
+            ['cold', 'warm', 'deep', 'scope', 'threads', 'coldthreads']
+        )
+        self.assertNotIn(PREFIX, modules)
+        self.assertFalse(incache(PREFIX))
+
+        ratios = compare(result, result)
+
+        self.assertEqual(set(ratios.values()), set([1]))
+
+
 if __name__ == '__main__':
     main()
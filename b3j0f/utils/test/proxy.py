@@ -27,11 +27,12 @@
 
 from unittest import main
 
-from inspect import getargspec, isbuiltin, getmembers, isroutine
+from inspect import isbuiltin, getmembers, isroutine
 
 from b3j0f.utils.ut import UTCase
 from b3j0f.utils.proxy import (
-    get_proxy, proxify_routine, proxify_elt, proxified_elt, is_proxy
+    get_proxy, proxify_routine, proxify_elt, proxified_elt, is_proxy,
+    LazyProxy, getargspec
 )
 
 
@@ -241,5 +242,56 @@ class ProxyEltTest(UTCase):
         self.assertEqual(proxy, testproxy)
 
 
+class LazyProxyTest(UTCase):
+    """Test the LazyProxy class."""
+
+    def setUp(self):
+
+        self.calls = 0
+
+    def _resolver(self):
+        """Resolve a list and count calls."""
+
+        self.calls += 1
+
+        return [1, 2]
+
+    def test_lazy(self):
+        """Test to resolve the element at its first use only."""
+
+        proxy = LazyProxy(self._resolver)
+
+        self.assertEqual(self.calls, 0)
+        self.assertIn('LazyProxy', repr(proxy))
+
+        self.assertEqual(len(proxy), 2)
+        self.assertEqual(proxy, [1, 2])
+        self.assertEqual(self.calls, 1)
+
+    def test_delegation(self):
+        """Test to delegate attributes and operators."""
+
+        proxy = LazyProxy(self._resolver)
+
+        proxy.append(3)
+        proxy[0] = 0
+
+        self.assertEqual(list(proxy), [0, 2, 3])
+        self.assertIn(3, proxy)
+        self.assertTrue(proxy)
+        self.assertIsInstance(proxy, list)
+        self.assertEqual(repr(proxy), '[0, 2, 3]')
+        self.assertEqual(self.calls, 1)
+
+    def test_call(self):
+        """Test to call a lazy proxy."""
+
+        proxy = LazyProxy(lambda: min)
+
+        self.assertEqual(proxy([1, 2]), 1)
+        self.assertIs(proxified_elt(proxy), min)
+        self.assertTrue(is_proxy(proxy))
+
+
 if __name__ == '__main__':
     main()
@@ -25,18 +25,117 @@
 # SOFTWARE.
 # --------------------------------------------------------------------
 
-from unittest import main
+from unittest import main, skipIf
+
+from sys import (
+    gettrace, settrace, exc_info, version_info, modules, path as syspath
+)
+
+from os import mkdir
+
+from os.path import join
+
+from tempfile import mkdtemp
+
+from shutil import rmtree
+
+from threading import Thread
+
+from time import sleep
+
+from gc import collect
+
+from warnings import catch_warnings, simplefilter
+
+from dis import findlinestarts
+
+import ast
+
+try:
+    import asyncio
+
+except ImportError:
+    asyncio = None
+
+from types import ModuleType
+
+from pickle import dumps, loads
+
+from six import exec_
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+try:  # python >= 3.3
+    from unittest.mock import patch
+
+except ImportError:
+    try:
+        from mock import patch
+
+    except ImportError:
+        patch = None
 
 from ..ut import UTCase
 
+from .. import runtime
 from ..runtime import (
-    SAFE_BUILTINS, safe_eval, safe_exec,
-    make_constants, bind_all
+    SAFE_BUILTINS, Sandbox, getsandbox, safe_eval, safe_exec, safe_compile,
+    SAFE_NODES, UnsafeSourceError, safe_eval_many, safe_eval_columns,
+    safe_exec_process,
+    ResourceLimitError, LineLimitError, TimeLimitError, MemoryLimitError,
+    make_constants, bind_all, checkguards, unguard, DEOPTIMIZE,
+    profile_bind_all,
+    singleton_per_scope, asingleton_per_scope, close_scope, add_disposer,
+    remove_disposer, SINGLETONS_PER_SCOPES, analyze_constants,
+    analyze_bind_all
 )
 
 import random
 
 
+def _opnames(func):
+    """Get names of opcodes of a function."""
+
+    from dis import opname
+
+    return set(
+        opname[instruction.opcode]
+        for instruction in runtime._instructions(func.__code__)
+    )
+
+
+def _executed(func, *args):
+    """Count opcodes executed by a function call (python >= 3.7)."""
+
+    result = [0]
+
+    def trace(frame, event, arg):
+        if frame.f_code is not func.__code__:
+            return None
+
+        frame.f_trace_opcodes = True
+
+        if event == 'opcode':
+            result[0] += 1
+
+        return trace
+
+    oldtrace = gettrace()
+    settrace(trace)
+
+    try:
+        func(*args)
+
+    finally:
+        settrace(oldtrace)
+
+    return result[0]
+
+
 class SafeTestCase(UTCase):
     """Test the function about safe coding."""
 
@@ -126,6 +225,453 @@ class SafeTestCase(UTCase):
         self.assertIn('res', properties)
         self.assertIs(properties['res'], max)
 
+    def test_eval_globals_unchanged(self):
+        """Test that safe eval does not modify globals."""
+
+        properties = {'a': 1}
+
+        self.assertEqual(safe_eval('a + 1', properties), 2)
+        self.assertEqual(properties, {'a': 1})
+
+    def test_safe_exec_builtins(self):
+        """Test that safe exec does not modify globals builtins."""
+
+        properties = {'__builtins__': 1}
+        safe_exec('res = max', properties)
+        self.assertEqual(properties['__builtins__'], 1)
+        self.assertIs(properties['res'], max)
+
+        properties = {}
+        safe_exec('res = max', properties)
+        self.assertNotIn('__builtins__', properties)
+
+        safe_exec('res = max')
+        self.assertEqual(list(SAFE_BUILTINS), ['__builtins__'])
+
+    def test_safe_exec_function(self):
+        """Test that functions defined by safe exec stay sandboxed."""
+
+        properties = {'a': 1}
+        safe_exec(
+            'def f():\n    return a, max\ndef g():\n    open', properties
+        )
+
+        self.assertEqual(properties['f'](), (1, max))
+        self.assertRaises(NameError, properties['g'])
+
+    def test_eval_layers(self):
+        """Test safe eval with globals read from nested scopes."""
+
+        self.assertEqual(
+            safe_eval('[a * x for x in b]', {'a': 2}, {'b': [1, 2]}), [2, 4]
+        )
+        self.assertEqual(safe_eval('a', {'a': 2}, {'a': 3}), 3)
+
+    def test_compile(self):
+        """Test safe compile function."""
+
+        code = safe_compile('a * b > 2 and max([a, b]) in (2, 3)')
+
+        self.assertIs(
+            safe_compile('a * b > 2 and max([a, b]) in (2, 3)'), code
+        )
+        self.assertTrue(safe_eval(code, {'a': 1, 'b': 3}))
+        self.assertFalse(safe_eval(code, {'a': 1, 'b': 1}))
+        self.assertEqual(
+            safe_eval(safe_compile('sum(x for x in items)'), {'items': [1]}),
+            1
+        )
+        self.assertRaises(
+            NameError, safe_eval, safe_compile('open("file")')
+        )
+
+    def test_compile_error(self):
+        """Test safe compile function with forbidden sources."""
+
+        for source in (
+                'lambda: 1', '().__class__', '__import__("os")',
+                'a.__dict__', 'a._private'
+        ):
+            self.assertRaises(UnsafeSourceError, safe_compile, source)
+
+        self.assertRaises(SyntaxError, safe_compile, 'a = 1')
+
+    def test_compile_nodes(self):
+        """Test safe compile function with specific node types."""
+
+        self.assertRaises(
+            UnsafeSourceError, safe_compile, 'a + 1', set()
+        )
+
+        # the code cached with default node types is not returned
+        safe_compile('max(a)')
+
+        nodes = set(SAFE_NODES)
+        nodes.remove(ast.Call)
+
+        self.assertRaises(UnsafeSourceError, safe_compile, 'max(a)', nodes)
+
+    def test_compile_introspection(self):
+        """Test that validated code can not use introspection builtins."""
+
+        code = safe_compile(
+            "getattr(getattr(getattr((), '_'+'_class__'), '_'+'_base__'),"
+            " '_'+'_subclasses__')()"
+        )
+
+        self.assertRaises(NameError, safe_eval, code)
+        self.assertRaises(NameError, safe_exec, code)
+
+        result, error = list(safe_eval_many('type(a)', [{'a': 1}]))[0]
+
+        self.assertIsNone(result)
+        self.assertIsInstance(error, NameError)
+
+        # records may define introspection names
+        self.assertEqual(
+            safe_eval(safe_compile('type'), {'type': 'book'}), 'book'
+        )
+        # a given sandbox keeps its builtins
+        self.assertIs(
+            safe_eval(safe_compile('type(a)'), {'a': 1}, sandbox=getsandbox()),
+            int
+        )
+
+    def test_compile_format(self):
+        """Test that validated code can not use string formatting methods."""
+
+        for source in (
+                "'{0.__init__.__globals__[SECRET]}'.format(x)",
+                "'{x.__class__}'.format_map(vars())",
+                "str.format('{0.__class__}', x)"
+        ):
+            self.assertRaises(UnsafeSourceError, safe_compile, source)
+
+        code = safe_compile("format(x, '')")
+
+        self.assertRaises(NameError, safe_eval, code, {'x': 1})
+
+    def test_compile_cache(self):
+        """Test the size of the code cache."""
+
+        size = runtime.SAFE_CODES_SIZE
+        runtime.SAFE_CODES_SIZE = 2
+
+        try:
+            for index in range(4):
+                safe_compile(str(index))
+
+            self.assertEqual(len(runtime._SAFE_CODES), 2)
+
+        finally:
+            runtime.SAFE_CODES_SIZE = size
+
+
+class SandboxTest(UTCase):
+    """Test sandboxes."""
+
+    def test_profile(self):
+
+        sandbox = getsandbox(deny=['max'])
+
+        self.assertIsInstance(sandbox, Sandbox)
+        self.assertIs(getsandbox(deny=('max',)), sandbox)
+        self.assertIsNot(getsandbox(), sandbox)
+        self.assertNotIn('max', sandbox.builtins)
+        self.assertIn('min', sandbox.builtins)
+        self.assertNotIn('open', sandbox.builtins)
+
+    def test_allow(self):
+
+        sandbox = getsandbox(allow=['len', 'print', 'unknown'])
+
+        self.assertEqual(sorted(sandbox.builtins), ['len', 'print'])
+
+    def test_eval(self):
+
+        sandbox = getsandbox(deny=['max'])
+
+        self.assertEqual(safe_eval('min(1, 2)', sandbox=sandbox), 1)
+        self.assertRaises(NameError, safe_eval, 'max', sandbox=sandbox)
+        self.assertRaises(
+            NameError, safe_exec, 'res = max(1, 2)', sandbox=sandbox
+        )
+
+    def test_import(self):
+        """Test that imports fail without __import__."""
+
+        self.assertRaises(ImportError, safe_exec, 'import os', {})
+        self.assertRaises(ImportError, safe_exec, 'from os import path', {})
+        self.assertRaises(
+            ImportError, safe_exec, 'import os', {'a': 1}, {'b': 2}
+        )
+        self.assertRaises(NameError, safe_eval, '__import__("os")')
+        self.assertRaises(
+            ImportError, exec_, 'import os', dict(SAFE_BUILTINS)
+        )
+
+    @skipIf(version_info < (3, 3), 'builtins are not frozen')
+    def test_frozen(self):
+
+        def setitem():
+            getsandbox().builtins['open'] = open
+
+        self.assertRaises(TypeError, setitem)
+
+    def test_namespaces(self):
+
+        properties = {'a': 1}
+        _locals = {'b': 2}
+
+        namespace, namespacelocals = getsandbox().namespaces(
+            properties, _locals
+        )
+
+        self.assertIs(type(namespace['__builtins__']), dict)
+        self.assertEqual(namespace['__builtins__'], getsandbox().builtins)
+        self.assertEqual(namespace['a'], 1)
+        self.assertEqual(namespacelocals['b'], 2)
+
+
+class SafeEvalManyTest(UTCase):
+    """Test the evaluation of expressions on several records."""
+
+    def setUp(self):
+
+        self.records = [
+            {'a': 1, 'b': 2}, {'a': 1}, {'a': 3, 'b': 4}
+        ]
+
+    def _assertresults(self, results):
+
+        self.assertEqual(results[0], (3, None))
+        self.assertIsNone(results[1][0])
+        self.assertIsInstance(results[1][1], NameError)
+        self.assertEqual(results[2], (7, None))
+
+    def test_records(self):
+        """Test to evaluate records."""
+
+        results = safe_eval_many('a + b', iter(self.records))
+
+        self.assertEqual(next(results), (3, None))
+
+        self._assertresults([(3, None)] + list(results))
+
+    def test_globals(self):
+        """Test to evaluate records with globals."""
+
+        results = list(safe_eval_many('a + c', self.records, {'c': 1}))
+
+        self.assertEqual(results, [(2, None), (2, None), (4, None)])
+
+    def test_processes(self):
+        """Test to evaluate records in processes."""
+
+        results = list(
+            safe_eval_many('a + b', self.records, processes=2, chunksize=2)
+        )
+
+        self._assertresults(results)
+
+    def test_sandbox(self):
+        """Test to evaluate records with a sandbox."""
+
+        sandbox = getsandbox(deny=['abs'])
+
+        results = list(
+            safe_eval_many(
+                'abs(a) + c', self.records, {'c': 1}, sandbox=sandbox
+            )
+        )
+
+        for result, error in results:
+            self.assertIsNone(result)
+            self.assertIsInstance(error, NameError)
+
+        results = list(
+            safe_eval_many(
+                'len(str(a))', self.records, processes=2, chunksize=2,
+                sandbox=getsandbox(allow=['len', 'str'])
+            )
+        )
+
+        self.assertEqual(results, [(1, None)] * 3)
+
+        result, errors = safe_eval_columns(
+            'abs(a)', {'a': [1, -2]}, {'abs': abs}, sandbox=sandbox
+        )
+
+        self.assertEqual(errors, {})
+        self.assertEqual(list(result), [1, 2])
+
+        if numpy is None:  # errors by record
+            result, errors = safe_eval_columns(
+                'abs(a)', {'a': [1, -2]}, sandbox=sandbox
+            )
+
+            self.assertEqual(sorted(errors), [0, 1])
+            self.assertIsInstance(errors[0], NameError)
+
+        else:  # raised by the evaluation on arrays
+            self.assertRaises(
+                NameError, safe_eval_columns, 'abs(a)', {'a': [1, -2]},
+                sandbox=sandbox
+            )
+
+    def test_unsafe(self):
+        """Test to evaluate an unsafe expression."""
+
+        self.assertRaises(
+            UnsafeSourceError, safe_eval_many, 'a.__class__', self.records
+        )
+
+    def test_columns(self):
+        """Test to evaluate columns."""
+
+        result, errors = safe_eval_columns(
+            'a * b', {'a': [1, 2, 3], 'b': [4, 5, 6]}
+        )
+
+        self.assertEqual(list(result), [4, 10, 18])
+        self.assertEqual(errors, {})
+
+    def test_columns_errors(self):
+        """Test to evaluate columns with record errors."""
+
+        result, errors = safe_eval_columns(
+            'a // b', {'a': [1, 2, 3], 'b': [1, 0, 3]}
+        )
+
+        self.assertEqual(list(errors), [1])
+        self.assertEqual(result[0], 1)
+        self.assertEqual(result[2], 1)
+
+    @skipIf(numpy is None, 'numpy is not available')
+    def test_columns_numpy(self):
+        """Test to evaluate columns with numpy arithmetic errors."""
+
+        result, errors = safe_eval_columns(
+            'a * b', {'a': [2 ** 62, 1], 'b': [4, 2]}
+        )
+
+        self.assertEqual(list(result), [2 ** 64, 2])
+        self.assertEqual(errors, {})
+
+        result, errors = safe_eval_columns(
+            'a / b', {'a': [1., 2.], 'b': [0., 2.]}
+        )
+
+        self.assertEqual(list(errors), [0])
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+        self.assertEqual(result[1], 1.)
+
+        self.assertRaises(NameError, safe_eval_columns, 'a + c', {'a': [1]})
+
+    def test_columns_empty(self):
+        """Test to evaluate empty columns."""
+
+        result, errors = safe_eval_columns('1', {})
+
+        self.assertEqual(list(result), [])
+        self.assertEqual(errors, {})
+
+
+class SafeExecLimitTest(UTCase):
+    """Test safe executions with resource limits."""
+
+    def test_lines(self):
+        """Test a limit of executed lines."""
+
+        trace = gettrace()
+
+        properties = {}
+        safe_exec('a = 1\nb = 2', properties, lines=2)
+        self.assertEqual(properties['b'], 2)
+
+        self.assertRaises(
+            LineLimitError, safe_exec, 'a = 1\nb = 2\nc = 3', lines=2
+        )
+        self.assertIs(gettrace(), trace)
+
+    def test_lines_catch(self):
+        """Test that a limit error is not caught with Exception."""
+
+        source = 'while True:\n    try:\n        a = 1\n' \
+            '    except Exception:\n        pass'
+
+        self.assertRaises(LineLimitError, safe_exec, source, lines=10)
+
+    def test_lines_function(self):
+        """Test that lines of called functions are counted."""
+
+        source = 'def f():\n    while True:\n        pass\nf()'
+
+        self.assertRaises(LineLimitError, safe_exec, source, lines=100)
+
+    def test_timeout(self):
+        """Test a limit of duration."""
+
+        try:
+            safe_exec('while True:\n    pass', timeout=0.05)
+
+        except TimeLimitError as ex:
+            self.assertEqual(ex.limit, 0.05)
+            self.assertGreater(ex.used, 0.05)
+
+        else:
+            self.fail('TimeLimitError not raised')
+
+    def test_error(self):
+        """Test limit error attributes and pickling."""
+
+        error = loads(dumps(LineLimitError(2, 3)))
+
+        self.assertIsInstance(error, ResourceLimitError)
+        self.assertEqual(error.resource, 'lines')
+        self.assertEqual(error.limit, 2)
+        self.assertEqual(error.used, 3)
+        self.assertEqual(str(error), 'lines limit 2 exceeded (3)')
+
+
+class SafeExecProcessTest(UTCase):
+    """Test safe executions in a child process."""
+
+    def test_result(self):
+        """Test to get objects defined in a child process."""
+
+        result = safe_exec_process(
+            'b = a + 1\nc = lambda: 1', {'a': 1}, timeout=5
+        )
+
+        self.assertEqual(result, {'a': 1, 'b': 2})
+
+    def test_error(self):
+        """Test to get an error from a child process."""
+
+        self.assertRaises(NameError, safe_exec_process, 'a = open')
+        self.assertRaises(
+            LineLimitError, safe_exec_process, 'while True:\n    pass',
+            lines=10
+        )
+
+    def test_timeout(self):
+        """Test to kill a child process after a timeout."""
+
+        self.assertRaises(
+            TimeLimitError, safe_exec_process, 'while True:\n    pass',
+            timeout=0.2
+        )
+
+    @skipIf(runtime.resource is None, 'resource module not available')
+    def test_memory(self):
+        """Test to limit the memory of a child process."""
+
+        self.assertRaises(
+            MemoryLimitError, safe_exec_process, 'a = " " * (1 << 32)',
+            timeout=10, memory=1 << 30
+        )
+
 
 class MakeConstants(UTCase):
 
@@ -175,13 +721,300 @@ class MakeConstants(UTCase):
             "new folded constant:{0}".format(random.random)
         ]
 
-        self.assertEqual(self.output, verbose_message)
+        # the order and the duplication of instructions depend on the python
+        # version
+        self.assertEqual(set(self.output), set(verbose_message))
 
     def test_function(self):
 
         make_constants(
             verbose=self.verbose, stoplist=self.stoplist)(self.sample())
 
+    def test_call(self):
+        """Test to call optimized functions."""
+
+        random.seed(0)
+        expected = self.sample()(list(range(10)), 5)
+
+        sample = make_constants()(self.sample())
+        random.seed(0)
+        self.assertEqual(sample(list(range(10)), 5), expected)
+        self.assertRaises(ValueError, sample, [], 1)
+
+        def func(items):
+            """Function with loops, exceptions and attribute chains."""
+
+            result = []
+
+            for item in items:
+                try:
+                    result.append(int(item))
+
+                except ValueError:
+                    result.append(isinstance(item, (str, bytes)))
+
+                else:
+                    result.append(random.random.__name__)
+
+            while len(result) < 10:
+                result.append(len(result))
+
+            return tuple(result)
+
+        optimized = make_constants()(func)
+
+        self.assertIsNot(optimized, func)
+        self.assertEqual(optimized(['1', 'a']), func(['1', 'a']))
+        self.assertNotIn('LOAD_GLOBAL', _opnames(optimized))
+
+    def test_compact(self):
+        """Test that optimized code is not longer than the original code, and
+        keeps line numbers and exception handlers."""
+
+        def func(items):
+            """Function with a loop and an exception handler."""
+
+            result = 0
+
+            for item in items:
+                try:
+                    result += item
+
+                except TypeError:
+                    result += random.random.__name__.count('r')
+
+            return result
+
+        optimized = make_constants()(func)
+
+        code, optimizedcode = func.__code__, optimized.__code__
+
+        self.assertLess(len(optimizedcode.co_code), len(code.co_code))
+        self.assertLess(
+            len(runtime._instructions(optimizedcode)),
+            len(runtime._instructions(code))
+        )
+        self.assertEqual(
+            [line for _, line in findlinestarts(optimizedcode)],
+            [line for _, line in findlinestarts(code)]
+        )
+        self.assertEqual(optimized([1, 'ab']), func([1, 'ab']))
+
+        if version_info >= (3, 7):
+            self.assertLess(
+                _executed(optimized, [1, 'ab']), _executed(func, [1, 'ab'])
+            )
+
+        try:
+            optimized(None)
+
+        except TypeError:
+            self.assertEqual(
+                exc_info()[2].tb_next.tb_lineno,
+                code.co_firstlineno + 5  # line of the loop
+            )
+
+        else:
+            self.fail('TypeError not raised')
+
+    def test_methods(self):
+        """Test to fold method loads of module attribute chains."""
+
+        namespace = {}
+
+        exec(
+            'import os, re, struct, sys\n'
+            'def func(lines):\n'
+            '    result = []\n'
+            '    for line in lines:\n'
+            '        name = os.path.join("a", line.strip())\n'
+            '        size = struct.unpack("<H", b"\\x01\\x00")[0]\n'
+            '        match = re.compile("[a-z]+").match(name)\n'
+            '        result.append((name, size, match.group(), sys.stdout))\n'
+            '    return result\n',
+            namespace
+        )
+
+        func = namespace['func']
+
+        output = []
+
+        optimized = make_constants(verbose=output.append)(func)
+
+        lines = [' b ', 'c']
+
+        self.assertEqual(optimized(lines), func(lines))
+        self.assertNotIn('LOAD_GLOBAL', _opnames(optimized))
+        self.assertLess(
+            len(optimized.__code__.co_code), len(func.__code__.co_code)
+        )
+
+        if version_info >= (3, 7):
+            self.assertLess(
+                _executed(optimized, lines), _executed(func, lines)
+            )
+
+        folded = set(
+            message.split(':', 1)[1] for message in output
+            if message.startswith('new folded constant:')
+        )
+
+        for value in (
+                namespace['os'].path.join, namespace['struct'].unpack,
+                namespace['re'].compile
+        ):
+            self.assertIn(str(value), folded)
+
+        self.assertNotIn(str(namespace['sys'].stdout), folded)
+
+        report = analyze_constants(func)
+
+        self.assertEqual(report['skipped'], {'sys.stdout': 'mutable'})
+        self.assertEqual(
+            sorted(report['attributes']),
+            ['os.path.join', 're.compile', 'struct.unpack']
+        )
+
+    def test_methods_stoplist(self):
+
+        report = analyze_constants(self.sample(), stoplist=['random.random'])
+
+        self.assertEqual(report['skipped'], {'random.random': 'stoplist'})
+        self.assertEqual(report['attributes'], [])
+
+    def test_nested(self):
+
+        namespace = {'factor': 2, 'offset': 1}
+
+        exec(
+            'def func(values):\n'
+            '    inner = lambda value: value * factor\n'
+            '    def add(value):\n'
+            '        return value + offset\n'
+            '    return [add(inner(value)) for value in values]\n',
+            namespace
+        )
+
+        optimized = make_constants()(namespace['func'])
+
+        self.assertEqual(runtime._loadglobals(optimized.__code__), 0)
+
+        namespace['factor'] = 3
+
+        self.assertEqual(optimized([0, 1, 2]), [1, 3, 5])
+
+    def test_store_global(self):
+
+        namespace = {'count': 0, 'total': 1}
+
+        exec(
+            'def func():\n'
+            '    global count\n'
+            '    count = total + 1\n'
+            '    return count + len(str(count))\n',
+            namespace
+        )
+
+        optimized = make_constants()(namespace['func'])
+
+        self.assertIsNot(optimized, namespace['func'])
+        self.assertEqual(runtime._loadglobals(optimized.__code__), 2)
+        self.assertEqual(optimized(), 3)
+        self.assertEqual(namespace['count'], 2)
+
+    def test_extended_arg(self):
+
+        names = ['g{0}'.format(index) for index in range(300)]
+
+        namespace = dict((name, index) for index, name in enumerate(names))
+
+        exec(
+            'def func():\n    return [{0}]\n'.format(', '.join(names)),
+            namespace
+        )
+
+        func = namespace['func']
+
+        if runtime.WORDCODE:
+            self.assertTrue(
+                any(
+                    instruction.extended
+                    for instruction in runtime._instructions(func.__code__)
+                )
+            )
+
+        optimized = make_constants()(func)
+
+        self.assertEqual(optimized(), list(range(300)))
+        self.assertEqual(runtime._loadglobals(optimized.__code__), 0)
+
+    def test_extended_consts(self):
+        """Test to bind globals of a function with more than 256 constants
+        and jumps over extended instructions."""
+
+        names = ['g{0}'.format(index) for index in range(100)]
+
+        namespace = dict((name, index) for index, name in enumerate(names))
+        namespace['offset'] = 1
+
+        # globals of the first branch are bound to constants with an index
+        # greater than 255, which pushes its end beyond a jump argument of 255
+        exec(
+            'def func(items, suffix=""):\n'
+            '    if items:\n'
+            '        values = [{1}]\n'
+            '    else:\n'
+            '        values = []\n'
+            '    consts = [{0}]\n'
+            '    result = 0\n'
+            '    for item in items:\n'
+            '        try:\n'
+            '            if item:\n'
+            '                result += len(consts) + abs(item) + offset\n'
+            '            else:\n'
+            '                result += item + None\n'
+            '        except TypeError:\n'
+            '            result -= offset\n'
+            '    return result + sum(values)\n'.format(
+                ', '.join(
+                    "'c{0}' + suffix".format(index) for index in range(300)
+                ),
+                ', '.join(names)
+            ),
+            namespace
+        )
+
+        func = namespace['func']
+
+        self.assertGreater(len(func.__code__.co_consts), 256)
+
+        optimized = make_constants()(func)
+
+        self.assertIsNot(optimized, func)
+        self.assertEqual(runtime._loadglobals(optimized.__code__), 0)
+        self.assertEqual(optimized([-2, 0, 3]), func([-2, 0, 3]))
+        self.assertEqual(optimized([-2, 0, 3]), 5556)
+        self.assertEqual(optimized([]), 0)
+
+    @skipIf(version_info < (3,), 'keyword-only arguments are not supported')
+    def test_kwdefaults(self):
+        """Test to keep keyword-only defaults and qualified names."""
+
+        scope = {'random': random}
+
+        exec(
+            'def func(*args, k=2):\n'
+            '    return random.random.__name__ * k\n',
+            scope
+        )
+
+        func = scope['func']
+        optimized = make_constants()(func)
+
+        self.assertIsNot(optimized, func)
+        self.assertEqual(optimized(), 'randomrandom')
+        self.assertEqual(optimized.__qualname__, func.__qualname__)
+
     def test_class(self):
 
         class A(object):
@@ -195,5 +1028,587 @@ class MakeConstants(UTCase):
         self._test_verbose()
 
 
+class GuardTest(UTCase):
+    """Test guarded make_constants."""
+
+    def setUp(self):
+
+        self.module = ModuleType(str('b3j0f_guard'))
+        modules[self.module.__name__] = self.module
+
+        exec(
+            'import os\n'
+            'VALUE = 1\n'
+            'def get():\n'
+            '    return VALUE\n'
+            'def cwd():\n'
+            '    return os.getcwd()\n'
+            'def join(*names):\n'
+            '    return os.path.join(*names)\n',
+            vars(self.module)
+        )
+
+    def tearDown(self):
+
+        unguard()
+
+        del modules[self.module.__name__]
+
+    def test_unguarded(self):
+
+        optimized = make_constants()(self.module.get)
+
+        self.module.VALUE = 2
+
+        self.assertEqual(optimized(), 1)
+
+    def test_setattr(self):
+
+        optimized = make_constants(guard=True)(self.module.get)
+
+        self.assertEqual(optimized(), 1)
+        self.assertNotIn('LOAD_GLOBAL', _opnames(optimized))
+
+        self.module.VALUE = 2
+        checkguards()  # required before python 3.5
+
+        self.assertEqual(optimized(), 2)
+        self.assertNotIn('LOAD_GLOBAL', _opnames(optimized))
+
+    @skipIf(version_info < (3, 5), 'module __class__ is not assignable')
+    def test_setattr_auto(self):
+
+        optimized = make_constants(guard=True)(self.module.get)
+
+        self.module.VALUE = 2
+
+        self.assertEqual(optimized(), 2)
+        self.assertEqual(checkguards(), 0)
+
+    def test_globals(self):
+
+        optimized = make_constants(guard=True)(self.module.get)
+
+        vars(self.module)['VALUE'] = 2
+
+        self.assertEqual(optimized(), 1)
+        self.assertEqual(checkguards(), 1)
+        self.assertEqual(optimized(), 2)
+        self.assertEqual(checkguards(), 0)
+
+    def test_delete(self):
+
+        optimized = make_constants(guard=True)(self.module.get)
+
+        del self.module.VALUE
+        checkguards()
+
+        self.assertRaises(NameError, optimized)
+
+    def test_deoptimize(self):
+
+        get = self.module.get
+        optimized = make_constants(guard=DEOPTIMIZE)(get)
+
+        self.module.VALUE = 2
+        checkguards()
+
+        self.assertIs(optimized.__code__, get.__code__)
+        self.assertEqual(optimized(), 2)
+
+    def test_bind_all(self):
+
+        bind_all(self.module, guard=True)
+
+        optimized = self.module.get
+
+        self.module.VALUE = 2
+        checkguards()
+
+        self.assertEqual(optimized(), 2)
+
+    def test_chain(self):
+        """Test to update functions where a folded chain is rebound."""
+
+        optimized = make_constants(guard=True)(self.module.cwd)
+
+        os = self.module.os
+        getcwd = os.getcwd
+
+        self.assertNotIn('LOAD_GLOBAL', _opnames(optimized))
+
+        os.getcwd = lambda: 'patched'
+
+        try:
+            checkguards()  # required before python 3.5
+            self.assertEqual(optimized(), 'patched')
+
+        finally:
+            os.getcwd = getcwd
+
+        checkguards()
+        self.assertEqual(optimized(), getcwd())
+
+    @skipIf(version_info < (3, 5), 'module __class__ is not assignable')
+    def test_chain_auto(self):
+
+        optimized = make_constants(guard=True)(self.module.cwd)
+
+        os = self.module.os
+        getcwd = os.getcwd
+
+        os.getcwd = lambda: 'patched'
+
+        try:
+            self.assertEqual(optimized(), 'patched')
+
+        finally:
+            os.getcwd = getcwd
+
+        self.assertEqual(optimized(), getcwd())
+        self.assertEqual(checkguards(), 0)
+
+    @skipIf(patch is None, 'mock is not available')
+    def test_method_mock(self):
+        """Test to patch a folded method with mock."""
+
+        optimized = make_constants(guard=True)(self.module.join)
+
+        expected = self.module.os.path.join('a', 'b')
+
+        self.assertNotIn('LOAD_GLOBAL', _opnames(optimized))
+
+        with patch('os.path.join', return_value='patched'):
+            checkguards()  # required before python 3.5
+            self.assertEqual(optimized('a', 'b'), 'patched')
+
+        checkguards()
+        self.assertEqual(optimized('a', 'b'), expected)
+
+    @skipIf(version_info < (3, 5), 'module __class__ is not assignable')
+    def test_unguard(self):
+        """Test to remove guards and restore module classes."""
+
+        optimized = make_constants(guard=True)(self.module.cwd)
+        get = make_constants(guard=True)(self.module.get)
+
+        os = self.module.os
+
+        self.assertIsNot(type(self.module), ModuleType)
+        self.assertIsNot(type(os), ModuleType)
+
+        self.assertEqual(unguard(optimized), 1)
+        self.assertIs(type(os), ModuleType)
+        self.assertIsNot(type(self.module), ModuleType)
+
+        self.assertEqual(unguard(), 1)
+        self.assertIs(type(self.module), ModuleType)
+
+        self.module.VALUE = 2
+
+        self.assertEqual(get(), 1)
+        self.assertEqual(checkguards(), 0)
+
+    @skipIf(version_info < (3, 5), 'module __class__ is not assignable')
+    def test_subclass(self):
+        """Test to rebind globals of a guarded module with a subclass."""
+
+        optimized = make_constants(guard=True)(self.module.get)
+
+        class SubModule(type(self.module)):
+
+            __slots__ = ()
+
+        self.module.__class__ = SubModule
+        self.module.VALUE = 2
+
+        self.assertEqual(optimized(), 2)
+
+    def test_wrong_guard(self):
+
+        self.assertRaises(
+            ValueError, make_constants(guard='wrong'), self.module.get
+        )
+
+
+class AnalyzeTest(UTCase):
+    """Test analyze_constants and analyze_bind_all."""
+
+    def setUp(self):
+
+        self.module = ModuleType(str('b3j0f_analyze'))
+        modules[self.module.__name__] = self.module
+
+        exec(
+            'import math\n'
+            'COUNT = 0\n'
+            'LIMIT = 10\n'
+            'def sample(values):\n'
+            '    global COUNT\n'
+            '    COUNT += 1\n'
+            '    return [math.pi + LIMIT + len(values) + unknown\n'
+            '            for _ in values]\n'
+            'def reset():\n'
+            '    global LIMIT\n'
+            '    LIMIT = LIMIT - 1\n'
+            'class A(object):\n'
+            '    def get(self):\n'
+            '        return LIMIT\n',
+            vars(self.module)
+        )
+
+    def tearDown(self):
+
+        del modules[self.module.__name__]
+
+    def test_analyze(self):
+
+        code = self.module.sample.__code__
+
+        report = analyze_constants(self.module.sample)
+
+        self.assertIs(self.module.sample.__code__, code)
+        self.assertEqual(report['name'], 'sample')
+        self.assertEqual(report['globals'], ['LIMIT', 'len', 'math'])
+        self.assertEqual(report['attributes'], ['math.pi'])
+        self.assertEqual(
+            report['skipped'], {'COUNT': 'stored', 'unknown': 'undefined'}
+        )
+        self.assertEqual(report['eliminated'], 5)
+        self.assertEqual(report['risky'], ['LIMIT'])
+
+    def test_builtin_only(self):
+
+        report = analyze_constants(self.module.sample, builtin_only=True)
+
+        self.assertEqual(report['globals'], ['len'])
+        self.assertEqual(report['skipped']['math'], 'builtin_only')
+        self.assertEqual(report['skipped']['COUNT'], 'stored')
+
+    def test_stoplist(self):
+
+        report = analyze_constants(self.module.sample, stoplist=['len'])
+
+        self.assertEqual(report['skipped']['len'], 'stoplist')
+
+    def test_bind_all(self):
+
+        reports = dict(
+            (report['name'], report)
+            for report in analyze_bind_all(self.module)
+        )
+
+        self.assertEqual(
+            sorted(reports), [
+                'b3j0f_analyze.A.get', 'b3j0f_analyze.reset',
+                'b3j0f_analyze.sample'
+            ]
+        )
+        self.assertEqual(reports['b3j0f_analyze.A.get']['risky'], ['LIMIT'])
+        self.assertEqual(
+            reports['b3j0f_analyze.reset']['skipped'], {'LIMIT': 'stored'}
+        )
+        self.assertEqual(reports['b3j0f_analyze.reset']['eliminated'], 0)
+
+
+class ProfileBindAllTest(UTCase):
+    """Test the profile_bind_all function."""
+
+    def setUp(self):
+
+        self.tmpdir = mkdtemp()
+        syspath.insert(0, self.tmpdir)
+
+        self.modname = 'b3j0f_test_profile'
+        path = join(self.tmpdir, self.modname)
+        mkdir(path)
+
+        with open(join(path, '__init__.py'), 'w') as f:
+            f.write('')
+
+        mkdir(join(path, 'sub'))
+
+        with open(join(path, 'sub', '__init__.py'), 'w') as f:
+            f.write('')
+
+        with open(join(path, 'sub', 'hot.py'), 'w') as f:
+            f.write(
+                'FACTOR = 2\n'
+                'def hot(count):\n'
+                '    result = 0\n'
+                '    for index in range(count):\n'
+                '        result += abs(index) * FACTOR\n'
+                '    return result\n'
+                'def cold():\n'
+                '    return len(str(FACTOR))\n'
+                'class Hot(object):\n'
+                '    def hot(self):\n'
+                '        return hot(1000)\n'
+            )
+
+    def tearDown(self):
+
+        syspath.remove(self.tmpdir)
+
+        for name in list(modules):
+            if name.startswith(self.modname):
+                del modules[name]
+
+        rmtree(self.tmpdir)
+
+    def sampler(self, workload, codes, interval):
+        """Execute a workload and give two samples to the hot function."""
+
+        workload()
+
+        hot = modules['{0}.sub.hot'.format(self.modname)]
+
+        return {hot.hot.__code__: 2}
+
+    def workload(self):
+        """Execute the hot method."""
+
+        hot = modules['{0}.sub.hot'.format(self.modname)]
+
+        for _ in range(100):
+            hot.Hot().hot()
+
+    def test_profile(self):
+        """Test to optimize sampled functions."""
+
+        from importlib import import_module
+
+        package = import_module(self.modname)
+
+        report = profile_bind_all(package, self.workload, sampler=self.sampler)
+
+        hot = modules['{0}.sub.hot'.format(self.modname)]
+
+        functions = dict(
+            (function['name'], function) for function in report['functions']
+        )
+
+        self.assertIn('{0}.sub.hot.hot'.format(self.modname), functions)
+        self.assertNotIn('{0}.sub.hot.cold'.format(self.modname), functions)
+
+        function = functions['{0}.sub.hot.hot'.format(self.modname)]
+        self.assertEqual(function['loadglobals'], 3)
+        self.assertEqual(function['eliminated'], 3)
+        self.assertEqual(function['samples'], 2)
+
+        self.assertNotIn('LOAD_GLOBAL', _opnames(hot.hot))
+        self.assertIn('LOAD_GLOBAL', _opnames(hot.cold))
+        self.assertEqual(hot.hot(10), 90)
+
+        self.assertEqual(report['samples'], 2)
+        self.assertGreater(report['speedup'], 0)
+
+    def test_no_samples(self):
+        """Test to warn when no sample is collected."""
+
+        from importlib import import_module
+
+        package = import_module(self.modname)
+
+        with catch_warnings(record=True) as warnings:
+            simplefilter('always')
+
+            report = profile_bind_all(
+                package, self.workload, sampler=lambda *args: {}
+            )
+
+        self.assertEqual(len(warnings), 1)
+        self.assertIs(warnings[0].category, RuntimeWarning)
+        self.assertEqual(report['functions'], [])
+        self.assertEqual(report['samples'], 0)
+
+    def test_sample(self):
+        """Test to sample a workload with the sampling profiler."""
+
+        def workload():
+            sleep(0.1)
+
+        samples = runtime._sample(workload, [workload.__code__], 0.001)
+
+        self.assertEqual(list(samples), [workload.__code__])
+        self.assertGreater(samples[workload.__code__], 0)
+
+
+class SingletonPerScopeTest(UTCase):
+    """Test the scoped singleton registry."""
+
+    class Scope(object):
+        """Weakly referenceable scope."""
+
+    class Pool(object):
+        """Singleton class which counts instanciations."""
+
+        count = 0
+
+        def __init__(self, size=1):
+
+            type(self).count += 1
+            self.size = size
+            sleep(0.01)
+
+    def setUp(self):
+
+        self.Pool.count = 0
+        self.disposed = []
+        add_disposer(self.Pool, self.disposed.append)
+
+    def tearDown(self):
+
+        remove_disposer(self.Pool, self.disposed.append)
+        close_scope(self)
+
+    def test_singleton(self):
+
+        pool = singleton_per_scope(self.Pool, self, size=2)
+
+        self.assertEqual(pool.size, 2)
+        self.assertIs(singleton_per_scope(self.Pool, self), pool)
+        self.assertIsNot(singleton_per_scope(self.Pool, 'other'), pool)
+        self.assertEqual(close_scope('other'), 1)
+
+    def test_renew(self):
+
+        pool = singleton_per_scope(self.Pool, self)
+        newpool = singleton_per_scope(self.Pool, self, True)
+
+        self.assertIsNot(newpool, pool)
+        self.assertEqual(self.disposed, [pool])
+
+    def test_threads(self):
+
+        pools = []
+
+        def target():
+            pools.append(singleton_per_scope(self.Pool, self))
+
+        threads = [Thread(target=target) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.Pool.count, 1)
+        self.assertEqual(len(set(map(id, pools))), 1)
+
+    def test_close_scope(self):
+
+        pool = singleton_per_scope(self.Pool, self)
+
+        self.assertEqual(close_scope(self), 1)
+        self.assertEqual(self.disposed, [pool])
+        self.assertNotIn(self, SINGLETONS_PER_SCOPES)
+        self.assertEqual(close_scope(self), 0)
+
+    def test_disposer_error(self):
+
+        def hook(pool):
+            raise ValueError()
+
+        add_disposer(object, hook)
+
+        try:
+            pool = singleton_per_scope(self.Pool, self)
+
+            self.assertRaises(ValueError, close_scope, self)
+            self.assertEqual(self.disposed, [pool])
+
+        finally:
+            self.assertTrue(remove_disposer(object, hook))
+
+        self.assertFalse(remove_disposer(object, hook))
+
+    def test_weak(self):
+
+        scope = self.Scope()
+
+        pool = singleton_per_scope(self.Pool, scope, _weak=True)
+
+        self.assertIs(singleton_per_scope(self.Pool, scope, _weak=True), pool)
+        self.assertEqual(self.Pool.count, 1)
+
+        count = len(SINGLETONS_PER_SCOPES)
+
+        del scope
+        collect()
+
+        self.assertEqual(self.disposed, [pool])
+        self.assertEqual(len(SINGLETONS_PER_SCOPES), count - 1)
+
+    def test_weak_collect_locked(self):
+        """Test to collect a weak scope while singletons are locked."""
+
+        scope = self.Scope()
+
+        pool = singleton_per_scope(self.Pool, scope, _weak=True)
+
+        def collectscope():
+            with runtime._SINGLETONS_LOCK:
+                del self.scope
+                collect()
+
+        self.scope = scope
+        del scope
+
+        thread = Thread(target=collectscope)
+        thread.daemon = True
+        thread.start()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.disposed, [pool])
+
+    def test_weak_close_scope(self):
+
+        scope = self.Scope()
+
+        pool = singleton_per_scope(self.Pool, scope, _weak=True)
+
+        self.assertEqual(close_scope(scope), 1)
+        self.assertEqual(self.disposed, [pool])
+
+    @skipIf(asyncio is None, 'asyncio is not available')
+    def test_async(self):
+
+        loop = asyncio.new_event_loop()
+
+        def factory():
+            self.Pool.count += 1
+            future = loop.create_future()
+            loop.call_later(0.01, future.set_result, self.Pool(2))
+            return future
+
+        try:
+            asyncio.set_event_loop(loop)
+
+            pools = loop.run_until_complete(
+                asyncio.gather(
+                    asingleton_per_scope(factory, self),
+                    asingleton_per_scope(factory, self)
+                )
+            )
+
+            self.assertIs(pools[0], pools[1])
+            self.assertEqual(pools[0].size, 2)
+            self.assertEqual(self.Pool.count, 2)  # factory and Pool
+            self.assertIs(singleton_per_scope(factory, self), pools[0])
+
+            pool = loop.run_until_complete(
+                asingleton_per_scope(self.Pool, self, size=3)
+            )
+
+            self.assertEqual(pool.size, 3)
+
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
 if __name__ == '__main__':
     main()